@@ -0,0 +1,94 @@
+"""
+Micro-benchmark of the state vector packing in Quadcopter.rhs_equation.
+
+Compares the current in place implementation against the previous implementation that
+packed the state vectors with chained np.append calls. For each one the time per call and
+the number of bytes of temporary arrays allocated per call are printed.
+
+Run it from the root of the repository with::
+
+    python benchmarks/state_packing.py
+"""
+
+import sys
+import os
+import timeit
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scaling_potato.quadcopter import Quadcopter
+
+
+__author__ = "Aaron M. de Windt"
+
+
+def legacy_omega2qdot(omega, quat, K=1.0):
+    p = omega[0]
+    q = omega[1]
+    r = omega[2]
+
+    e = K * (1-(quat[0] * quat[0] + quat[1] * quat[1] + quat[2] * quat[2] + quat[3] * quat[3]))
+
+    return 0.5*np.array([[e*quat[0] - p*quat[1] - q*quat[2] - r*quat[3]],
+                         [p*quat[0] + e*quat[1] + r*quat[2] - q*quat[3]],
+                         [q*quat[0] - r*quat[1] + e*quat[2] + p*quat[3]],
+                         [r*quat[0] + q*quat[1] - p*quat[2] + e*quat[3]]])
+
+
+def legacy_rhs_equation(qc, t, y):
+    """
+    The rhs_equation as it was before the state was stored in a preallocated buffer.
+    """
+    x = y[:3]
+    v_i = y[3:6]
+    q = y[6:10]
+    omega = y[10:]
+
+    state_vector = np.append([], v_i)
+    state_vector = np.append(state_vector, qc.a_i)
+    state_vector = np.append(state_vector, legacy_omega2qdot(omega, q))
+    state_vector = np.append(state_vector, qc.omega_dot)
+    return state_vector
+
+
+def allocated_bytes_per_call(func, n=1000):
+    """
+    Sum of the peak traced memory of n calls, divided by n.
+    """
+    func()
+    total = 0
+    tracemalloc.start()
+    for _ in range(n):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return total / float(n)
+
+
+def main():
+    qc = Quadcopter([0, 0, 0])
+    qc.a_i = [1., 2., 3.]
+    qc.omega_dot = [.1, .2, .3]
+    y = np.array(qc.state_vector)
+
+    np.testing.assert_allclose(legacy_rhs_equation(qc, 0., y), qc.rhs_equation(0., y))
+
+    cases = [
+        ("legacy np.append", lambda: legacy_rhs_equation(qc, 0., y)),
+        ("preallocated", lambda: qc.rhs_equation(0., y)),
+    ]
+
+    n = 100000
+    print("{:20} {:>12} {:>16}".format("rhs_equation", "us/call", "bytes/call"))
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=n, repeat=3)) / n
+        print("{:20} {:12.3f} {:16.1f}".format(name, seconds * 1e6, allocated_bytes_per_call(func)))
+
+
+if __name__ == "__main__":
+    main()
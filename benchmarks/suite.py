@@ -0,0 +1,277 @@
+"""
+Benchmark suite of the physics, control, rendering and readback hot paths.
+
+Every case reports the best time per operation of a number of repeats. The results are
+written as JSON and can be compared against a baseline saved earlier on the same machine. A
+case that got slower than the baseline by more than the tolerance is a regression, and the
+suite then exits with a non zero status.
+
+Run it from the root of the repository with::
+
+    python benchmarks/suite.py --save-baseline benchmarks/baseline.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --output results.json
+
+The readback cases need an offscreen graphics buffer. They are skipped when Panda3d can't open
+one, any other error in a case is raised. A case of the baseline that is missing from the
+results, because it was skipped or removed, fails the comparison like a regression.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scaling_potato.fleet import QuadcopterFleet
+from scaling_potato.headless import offscreen_base
+from scaling_potato.pid_control import PIDControl
+from scaling_potato.quadcopter import Quadcopter
+
+
+__author__ = "Aaron M. de Windt"
+
+
+VERSION = 1
+
+FLEET_SIZES = (1, 10, 100, 1000)
+READBACK_SIZES = ((256, 256), (640, 480), (1280, 720))
+
+
+class CaseSkipped(Exception):
+    """
+    Raised by a case that can't run on this machine.
+    """
+
+
+def best_time(func, number, repeat):
+    """
+    Best time per call of ``repeat`` runs of ``number`` calls each.
+
+    :rtype: float
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def bench_quadcopter_step(repeat):
+    qc = Quadcopter([0, 0, 0])
+    qc.a_i = [1., 0., 0.]
+    qc.omega_dot = [0.1, 0., 0.]
+    qc.step(0.)
+    steps = iter(range(1, 10 ** 9))
+    return best_time(lambda: qc.step(next(steps) * 1e-3), 2000, repeat), "step"
+
+
+def bench_rhs_equation(repeat):
+    qc = Quadcopter([0, 0, 0])
+    qc.a_i = [1., 2., 3.]
+    qc.omega_dot = [.1, .2, .3]
+    y = np.array(qc.state_vector)
+    return best_time(lambda: qc.rhs_equation(0., y), 20000, repeat), "call"
+
+
+def bench_pid_step(repeat):
+    pid = PIDControl(20.0, 10.0, 1.0)
+    pid.command = np.array([0., 1., 0.])
+    value = np.array([0.1, 0.2, 0.3])
+    steps = iter(range(1, 10 ** 9))
+    return best_time(lambda: pid.step(next(steps) * 1e-3, value), 20000, repeat), "step"
+
+
+def fleet_case(n):
+    def bench_fleet(repeat):
+        fleet = QuadcopterFleet(np.zeros((n, 3)))
+        v_command = np.tile([0., 1., 0.], (n, 1))
+        omega_command = np.zeros((n, 3))
+        steps = iter(range(10 ** 9))
+
+        def step():
+            time = next(steps) * 1e-3
+            fleet.step(time)
+            fleet.v_control(time, v_command)
+            fleet.omega_control(time, omega_command)
+
+        number = max(20, 2000 // n)
+        return best_time(step, number, repeat), "fleet step"
+    return bench_fleet
+
+
+def readback_case(x_size, y_size):
+    def bench_readback(repeat):
+        from scaling_potato.readback import CameraReadback
+
+        try:
+            base = offscreen_base()
+            buffer = base.win.makeTextureBuffer("benchmark_{}x{}".format(x_size, y_size),
+                                                x_size, y_size)
+        except Exception as e:
+            raise CaseSkipped("no offscreen buffer: {}".format(e))
+        if buffer is None:
+            raise CaseSkipped("no offscreen buffer")
+        base.makeCamera(buffer)
+        camera = CameraReadback(buffer)
+        camera.subscribe(lambda frame: None)
+        frames = iter(range(10 ** 9))
+
+        def frame():
+            frame_number = next(frames)
+            base.graphicsEngine.renderFrame()
+            camera.update(frame_number, frame_number / 60.)
+
+        try:
+            # Trigger the first copy, so every measured frame delivers an image.
+            frame()
+            return best_time(frame, 20, repeat), "frame"
+        finally:
+            base.graphicsEngine.removeWindow(buffer)
+    return bench_readback
+
+
+def cases():
+    """
+    All benchmark cases, as a list of (name, function) tuples. The functions take the number of
+    repeats and return the time per operation and the name of the operation.
+
+    :rtype: list
+    """
+    all_cases = [
+        ("quadcopter_step", bench_quadcopter_step),
+        ("rhs_equation", bench_rhs_equation),
+        ("pid_step", bench_pid_step),
+    ]
+    all_cases += [("fleet_step_{}".format(n), fleet_case(n)) for n in FLEET_SIZES]
+    all_cases += [("readback_{}x{}".format(x_size, y_size), readback_case(x_size, y_size))
+                  for x_size, y_size in READBACK_SIZES]
+    return all_cases
+
+
+def selected(name, names):
+    """
+    Whether a case is selected by the substrings of the names of the cases to run.
+
+    :rtype: bool
+    """
+    return not names or any(part in name for part in names)
+
+
+def run(names=None, repeat=5):
+    """
+    Runs the benchmark cases.
+
+    :param list names: Substrings of the names of the cases to run, None to run all of them.
+    :param int repeat: Number of repeats of every case, the best one is reported.
+    :return: Results, with the time per operation in seconds of every case.
+    :rtype: dict
+    """
+    results = {}
+    skipped = {}
+    for name, func in cases():
+        if not selected(name, names):
+            continue
+        try:
+            seconds, unit = func(repeat)
+        except CaseSkipped as e:
+            print("{:20} skipped: {}".format(name, e))
+            skipped[name] = str(e)
+            continue
+        results[name] = {"seconds": seconds, "unit": unit}
+        print("{:20} {:12.3f} us/{}".format(name, seconds * 1e6, unit))
+
+    return {
+        "version": VERSION,
+        "time": time.time(),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+        },
+        "names": list(names or []),
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compares results against a baseline.
+
+    :param dict results: Results of :func:`run`.
+    :param dict baseline: Results of an earlier run.
+    :param float tolerance: Allowed relative slowdown.
+    :return: Names of the cases that got slower than allowed or are missing from the results,
+             and the report as text.
+    :rtype: tuple
+    """
+    regressions = []
+    lines = ["{:20} {:>12} {:>12} {:>8}".format("case", "baseline us", "current us", "ratio")]
+    for name in sorted(baseline["results"]):
+        if not selected(name, results.get("names")):
+            continue
+        previous = baseline["results"][name]["seconds"]
+        if name not in results["results"]:
+            regressions.append(name)
+            reason = results.get("skipped", {}).get(name, "not run")
+            lines.append("{:20} {:12.3f} {:>12} {:>8}  MISSING ({})".format(
+                name, previous * 1e6, "-", "-", reason))
+            continue
+        current = results["results"][name]["seconds"]
+        ratio = current / previous
+        regressed = ratio > 1 + tolerance
+        if regressed:
+            regressions.append(name)
+        lines.append("{:20} {:12.3f} {:12.3f} {:8.2f}{}".format(
+            name, previous * 1e6, current * 1e6, ratio, "  REGRESSION" if regressed else ""))
+    return regressions, "\n".join(lines)
+
+
+def save(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("cases", nargs="*", help="Substrings of the names of the cases to run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeats of every case.")
+    parser.add_argument("--output", help="JSON file the results are written to.")
+    parser.add_argument("--baseline", help="JSON file with the results to compare against.")
+    parser.add_argument("--save-baseline", help="JSON file the results are saved to as the "
+                                                "new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown compared to the baseline.")
+    args = parser.parse_args(argv)
+
+    results = run(args.cases, args.repeat)
+    if args.output:
+        save(args.output, results)
+    if args.save_baseline:
+        save(args.save_baseline, results)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("version") != VERSION:
+            print("The baseline is from another version of the suite, run it again with "
+                  "--save-baseline.")
+            return 2
+        regressions, report = compare(results, baseline, args.tolerance)
+        print()
+        print(report)
+        if regressions:
+            print()
+            print("{} regression(s) or missing case(s): {}".format(len(regressions),
+                                                                    ", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+import sys
+
+from scaling_potato.cli import main
+
+
+__author__ = "Aaron M. de Windt"
+
+
+sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Loading and sharing of the models used in the scene.
+
+Parsing ``.egg`` models is slow, so they are converted once into binary ``.bam`` files kept in
+a :class:`BamCache`. The cached files are named after the hash of the source file and the
+Panda3d version, so a changed model or Panda3d upgrade is converted again, and every other
+launch loads the ``.bam`` file without parsing the egg. Within a process a
+:class:`ModelCache`, shared by all vehicles through :func:`shared_model_cache`, loads every
+model only once.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from panda3d.core import BamFile, BamWriter, Filename, PandaSystem, getModelPath
+
+
+__author__ = "Aaron M. de Windt"
+
+
+def default_cache_path():
+    """
+    Directory of the asset cache, ``$SCALING_POTATO_CACHE`` or ``~/.cache/scaling_potato``.
+
+    :rtype: str
+    """
+    root = os.environ.get("SCALING_POTATO_CACHE")
+    if root is None:
+        root = os.path.join(os.path.expanduser("~"), ".cache", "scaling_potato")
+    return os.path.join(root, "models")
+
+
+def resolve_model(path):
+    """
+    Absolute path of a model on the model path.
+
+    :rtype: str
+    """
+    filename = Filename(path)
+    if not filename.resolveFilename(getModelPath().getValue()):
+        raise IOError("Model '{}' not found on the model path.".format(path))
+    return filename.toOsSpecific()
+
+
+class BamCache(object):
+    """
+    Directory with the ``.bam`` conversions of model files.
+
+    :param str path: Directory of the cache, it's created if needed. By default
+                     :func:`default_cache_path`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_path()
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self.n_converted = 0
+        self.n_hits = 0
+
+    def key(self, source):
+        """
+        Hash of the contents of a source file and the Panda3d version.
+
+        :param str source: Path of the source file.
+        :rtype: str
+        """
+        h = hashlib.sha256()
+        h.update(PandaSystem.getVersionString().encode("ascii"))
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def bam_path(self, source):
+        name = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.path, "{}-{}.bam".format(name, self.key(source)[:32]))
+
+    def load(self, loader, path):
+        """
+        Loads a model from its cached conversion, converting it first if needed.
+
+        :param direct.showbase.Loader.Loader loader: Loader of the ShowBase.
+        :param str path: Path of the model, searched on the model path.
+        :rtype: panda3d.core.NodePath
+        """
+        source = resolve_model(path)
+        if source.endswith(".bam"):
+            return loader.loadModel(source)
+
+        bam_path = self.bam_path(source)
+        if os.path.exists(bam_path):
+            self.n_hits += 1
+            return loader.loadModel(Filename.fromOsSpecific(bam_path), noCache=True)
+
+        model = loader.loadModel(Filename.fromOsSpecific(source), noCache=True)
+        self.write(model, bam_path)
+        self.n_converted += 1
+        return model
+
+    def write(self, model, bam_path):
+        # Written to a temporary file first, so concurrent launches never load a partial file.
+        fd, tmp_path = tempfile.mkstemp(suffix=".bam", dir=self.path)
+        os.close(fd)
+        bam = BamFile()
+        if not bam.openWrite(Filename.fromOsSpecific(tmp_path)):
+            raise IOError("Can't write '{}'.".format(tmp_path))
+        # Textures are referenced by their full path, the cache is not next to the models.
+        bam.getWriter().setFileTextureMode(BamWriter.BTMFullpath)
+        bam.writeObject(model.node())
+        bam.close()
+        os.replace(tmp_path, bam_path)
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith(".bam"):
+                os.remove(os.path.join(self.path, name))
+
+
+def shared_model_cache(pbase):
+    """
+    The model cache of a ShowBase, created on the first request and shared by everything
+    loading models into its scene.
+
+    :param direct.showbase.ShowBase.ShowBase pbase: Main Panda3d ShowBase.
+    :rtype: ModelCache
+    """
+    cache = getattr(pbase, "model_cache", None)
+    if cache is None:
+        cache = pbase.model_cache = ModelCache(pbase.loader)
+    return cache
+
+
+class ModelCache(object):
+    """
+    Loads every model once and hands out copies or instances of it.
+
+    The cached models are not part of any scene graph. :meth:`copy` gives a node that can be
+    changed independently and :meth:`instance` one that shares its geometry and state with
+    every other instance.
+
+    :param direct.showbase.Loader.Loader loader: Loader of the ShowBase.
+    :param BamCache bam_cache: Optional cache the models are loaded through.
+    """
+
+    def __init__(self, loader, bam_cache=None):
+        self.loader = loader
+        self.bam_cache = bam_cache
+        self.models = {}
+
+    def __contains__(self, path):
+        return path in self.models
+
+    def get(self, path):
+        """
+        The cached model, loaded on the first request.
+
+        :param str path: Path of the model.
+        :rtype: panda3d.core.NodePath
+        """
+        model = self.models.get(path)
+        if model is None:
+            if self.bam_cache is not None:
+                model = self.bam_cache.load(self.loader, path)
+            else:
+                model = self.loader.loadModel(path)
+            self.models[path] = model
+        return model
+
+    def add(self, path, model):
+        """
+        Adds a model that was loaded or created elsewhere, e.g. procedural geometry.
+
+        :param str path: Name the model is cached under.
+        :param panda3d.core.NodePath model: The model.
+        """
+        self.models[path] = model
+
+    def copy(self, path, parent):
+        """
+        Copy of a model attached to the parent.
+
+        :rtype: panda3d.core.NodePath
+        """
+        return self.get(path).copyTo(parent)
+
+    def instance(self, path, parent):
+        """
+        Instance of a model attached to the parent.
+
+        :rtype: panda3d.core.NodePath
+        """
+        return self.get(path).instanceTo(parent)
+
+    def clear(self):
+        self.models.clear()
@@ -0,0 +1,202 @@
+from math import ceil, sqrt
+
+from panda3d.core import FrameBufferProperties
+
+from scaling_potato.readback import ReadbackFrame
+
+
+__author__ = "Aaron M. de Windt"
+
+
+class AtlasTile(object):
+    """
+    Camera rendering into one tile of a :class:`CameraAtlas`.
+
+    The tile can be subscribed to like a :class:`scaling_potato.readback.CameraReadback`. The
+    frames delivered to its subscribers share the atlas texture, their image is the slice of the
+    atlas image holding this tile.
+
+    :param CameraAtlas atlas: Atlas the tile is part of.
+    :param int index: Index of the tile in the atlas.
+    :param panda3d.core.NodePath camera: Camera rendering into the tile.
+    """
+
+    def __init__(self, atlas, index, camera):
+        self.atlas = atlas
+        self.index = index
+        self.camera = camera
+        self.subscribers = []
+        self.latest = None
+        self.n_delivered = 0
+
+    @property
+    def active(self):
+        return len(self.subscribers) > 0
+
+    @property
+    def display_region(self):
+        return self.camera.node().getDisplayRegion(0)
+
+    def subscribe(self, callback, once=False):
+        """
+        Adds a callback that's called with a :class:`scaling_potato.readback.ReadbackFrame` for
+        every frame read back.
+
+        :param callback: Callable taking a single ReadbackFrame argument.
+        :param bool once: If True the callback is removed after the first frame.
+        """
+        self.subscribers.append((callback, once))
+        self.atlas.update_subscription()
+
+    def unsubscribe(self, callback):
+        self.subscribers = [(c, once) for c, once in self.subscribers if c != callback]
+        self.atlas.update_subscription()
+
+    def deliver(self, frame):
+        self.latest = frame
+        self.n_delivered += 1
+        subscribers = self.subscribers
+        self.subscribers = [(callback, once) for callback, once in subscribers if not once]
+        for callback, once in subscribers:
+            callback(frame)
+
+
+class CameraAtlas(object):
+    """
+    Renders the cameras of many vehicles into the tiles of a single offscreen buffer.
+
+    Every camera gets its own display region in one large texture buffer, so all of them are
+    rendered into one render target and read back with a single copy per frame. The readback
+    only runs while at least one of the tiles has subscribers. The images of the tiles are
+    views sliced out of the atlas image, so they are not copied either.
+
+    The tiles are laid out row by row, starting at the top left corner of the image.
+
+    :param direct.showbase.ShowBase.ShowBase pbase: Main Panda3d ShowBase.
+    :param int n_tiles: Maximum number of cameras in the atlas.
+    :param tuple tile_size: Size (x, y) of a tile in pixels.
+    :param int columns: Number of tiles per row, by default the atlas is about square.
+    :param scaling_potato.readback.ReadbackPipeline readback: Optional pipeline the atlas is read
+                                                              back with.
+    :param float rate: Maximum number of frames read back per second, None for every frame.
+    :param panda3d.core.FrameBufferProperties fb_prop: Properties of the atlas buffer, by
+                                                       default 8 bit RGB.
+    """
+
+    def __init__(self, pbase, n_tiles, tile_size=(256, 256), columns=None, readback=None,
+                 rate=None, fb_prop=None):
+        self.pbase = pbase
+        self.n_tiles = n_tiles
+        self.tile_size = tuple(tile_size)
+        self.columns = columns or int(ceil(sqrt(n_tiles)))
+        self.rows = int(ceil(n_tiles / float(self.columns)))
+        self.tiles = []
+
+        if fb_prop is None:
+            fb_prop = FrameBufferProperties()
+            fb_prop.setRgbColor(True)
+            fb_prop.setRgbaBits(8, 8, 8, 0)
+
+        self.buffer = pbase.win.makeTextureBuffer("camera_atlas",
+                                                  self.columns * self.tile_size[0],
+                                                  self.rows * self.tile_size[1],
+                                                  fbp=fb_prop)
+        # The display regions of the tiles clear themselves, so the buffer doesn't need to.
+        self.buffer.setClearColorActive(False)
+        self.buffer.setClearDepthActive(False)
+
+        self.pipeline = readback
+        self.readback = None
+        self.__subscribed = False
+        if readback is not None:
+            self.readback = readback.add_camera(self.buffer, rate)
+
+    def tile_bounds(self, index):
+        """
+        Display region of a tile as (left, right, bottom, top) fractions of the buffer.
+        """
+        row, column = divmod(index, self.columns)
+        return (column / float(self.columns), (column + 1) / float(self.columns),
+                1 - (row + 1) / float(self.rows), 1 - row / float(self.rows))
+
+    def tile_slice(self, index):
+        """
+        Rows and columns of a tile in the atlas image, with the rows ordered top to bottom.
+
+        :rtype: tuple
+        """
+        row, column = divmod(index, self.columns)
+        x_size, y_size = self.tile_size
+        return (slice(row * y_size, (row + 1) * y_size),
+                slice(column * x_size, (column + 1) * x_size))
+
+    def add_camera(self, parent, name="atlas_camera", clear_color=(0, 0, 0, 1)):
+        """
+        Creates a camera rendering into the next free tile.
+
+        :param panda3d.core.NodePath parent: Node the camera is attached to.
+        :param str name: Name of the camera node.
+        :param tuple clear_color: Colour the tile is cleared with every frame.
+        :rtype: AtlasTile
+        """
+        index = len(self.tiles)
+        if index >= self.n_tiles:
+            raise ValueError("The camera atlas is full, it has room for {} cameras.".format(self.n_tiles))
+
+        camera = self.pbase.makeCamera(self.buffer, displayRegion=self.tile_bounds(index),
+                                       aspectRatio=self.tile_size[0] / float(self.tile_size[1]),
+                                       clearDepth=1, clearColor=clear_color, camName=name)
+        camera.reparentTo(parent)
+
+        tile = AtlasTile(self, index, camera)
+        self.tiles.append(tile)
+        return tile
+
+    def tile_images(self, image):
+        """
+        Views of the tiles in an atlas image, without copying it.
+
+        :param numpy_array image: Atlas image with the rows ordered top to bottom.
+        :rtype: list
+        """
+        return [image[self.tile_slice(tile.index)] for tile in self.tiles]
+
+    def update_subscription(self):
+        """
+        Only reads the atlas back while at least one of the tiles has subscribers.
+        """
+        if self.readback is None:
+            return
+
+        active = any(tile.active for tile in self.tiles)
+        if active and not self.__subscribed:
+            self.readback.subscribe(self.deliver)
+        elif not active and self.__subscribed:
+            self.readback.unsubscribe(self.deliver)
+        self.__subscribed = active
+
+    def deliver(self, frame):
+        """
+        Splits an atlas frame delivered by the readback into the frames of the tiles.
+
+        :param scaling_potato.readback.ReadbackFrame frame: Frame with the atlas image.
+        """
+        for tile in self.tiles:
+            if tile.active:
+                tile.deliver(ReadbackFrame(tile, frame.texture, frame.image[self.tile_slice(tile.index)],
+                                           frame.frame_number, frame.time))
+        self.update_subscription()
+
+    def remove(self):
+        """
+        Removes the atlas buffer and its cameras.
+        """
+        if self.readback is not None:
+            self.readback.unsubscribe(self.deliver)
+            self.pipeline.remove_camera(self.readback)
+            self.readback = None
+            self.__subscribed = False
+        for tile in self.tiles:
+            tile.camera.removeNode()
+        self.tiles = []
+        self.pbase.graphicsEngine.removeWindow(self.buffer)
@@ -0,0 +1,279 @@
+"""
+Disk backed cache of simulation results.
+
+Results are stored under the hash of everything that determines them, e.g. the initial state,
+the controller gains, the integrator settings and the command stream, so identical simulations
+are only run once, even across processes and CI runs sharing the cache directory. The cache is
+bounded in size, the least recently used results are evicted first.
+"""
+
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+
+__author__ = "Aaron M. de Windt"
+
+
+# Changing the version invalidates all cached results, bump it when the simulation changes.
+CACHE_VERSION = 1
+
+
+def _update_hash(h, value):
+    """
+    Feeds a canonical representation of the value into the hash.
+    """
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        h.update("ndarray:{}:{}:".format(value.dtype.str, value.shape).encode("ascii"))
+        h.update(value.tobytes())
+    elif isinstance(value, dict):
+        h.update("dict:{}:".format(len(value)).encode("ascii"))
+        for key in sorted(value, key=repr):
+            _update_hash(h, key)
+            _update_hash(h, value[key])
+    elif isinstance(value, (list, tuple)):
+        h.update("{}:{}:".format(type(value).__name__, len(value)).encode("ascii"))
+        for item in value:
+            _update_hash(h, item)
+    elif value is None or isinstance(value, (bool, int, float, str, bytes, np.generic)):
+        h.update("{}:{!r};".format(type(value).__name__, value).encode("utf-8"))
+    elif hasattr(value, "__dict__"):
+        # Plain objects like command profiles are hashed by their class and attributes.
+        h.update("object:{}.{}:".format(type(value).__module__, type(value).__name__).encode("utf-8"))
+        _update_hash(h, vars(value))
+    else:
+        raise TypeError("Can't hash values of type {}.".format(type(value).__name__))
+
+
+def config_hash(*parts):
+    """
+    Content hash of a simulation configuration.
+
+    The parts can be NumPy arrays, numbers, strings, None and lists, tuples and dictionaries of
+    them, as well as plain objects, which are hashed by their class and attributes.
+
+    :rtype: str
+    """
+    h = hashlib.sha256()
+    _update_hash(h, CACHE_VERSION)
+    _update_hash(h, parts)
+    return h.hexdigest()
+
+
+def integrator_settings(integrator):
+    """
+    Settings of a ``scipy.integrate.ode`` integrator or a native
+    :class:`scaling_potato.scaling_potato_c.QuadcopterIntegrator` that influence its results.
+
+    :rtype: dict
+    """
+    if _is_native_integrator(integrator):
+        return {"name": "native", "method": integrator.method, "adaptive": integrator.adaptive,
+                "dt": integrator.dt, "rtol": integrator.rtol, "atol": integrator.atol,
+                "max_steps": integrator.max_steps, "K": integrator.K}
+    return _scipy_integrator_settings(integrator)
+
+
+def _is_native_integrator(integrator):
+    try:
+        from scaling_potato.scaling_potato_c import QuadcopterIntegrator
+    except ImportError:
+        # Without the extension there are no native integrators.
+        return False
+    return isinstance(integrator, QuadcopterIntegrator)
+
+
+def _scipy_integrator_settings(ode):
+    """
+    Settings of the solver of a ``scipy.integrate.ode``. SciPy doesn't expose the solver, this
+    is the only place its private ``_integrator`` attribute is read.
+    """
+    solver = ode._integrator
+    settings = {"name": type(solver).__name__}
+    for name in ("rtol", "atol", "nsteps", "max_step", "first_step", "safety", "ifactor",
+                 "dfactor", "beta", "min_step", "order", "method", "with_jacobian"):
+        value = getattr(solver, name, None)
+        if isinstance(value, (bool, int, float, str)):
+            settings[name] = value
+    return settings
+
+
+def quadcopter_config(quadcopter):
+    """
+    Configuration of a quadcopter, for use in a cache key.
+
+    :param scaling_potato.quadcopter.Quadcopter quadcopter: The quadcopter.
+    :rtype: dict
+    """
+    return {
+        "state": quadcopter.state_vector.copy(),
+        "v_gains": (quadcopter.v_pid.k_p, quadcopter.v_pid.k_i, quadcopter.v_pid.k_d),
+        "omega_gains": (quadcopter.omega_pid.k_p, quadcopter.omega_pid.k_i,
+                        quadcopter.omega_pid.k_d),
+        "integrator": integrator_settings(quadcopter.native_integrator or quadcopter.integrator),
+    }
+
+
+class SimulationCache(object):
+    """
+    Content addressed cache of simulation results on disk.
+
+    A result is a dictionary of NumPy arrays, stored as an ``.npz`` file named after its key.
+    Reading a result marks it as recently used by updating its modification time. When the total
+    size exceeds ``max_size`` the least recently used results are removed.
+
+    The directory is only scanned by the first :meth:`put`, after that the results and their
+    total size are tracked in memory, so storing a result doesn't touch the other files. Results
+    stored by other processes sharing the directory are counted the next time it's scanned,
+    e.g. by :meth:`evict`.
+
+    :param str path: Directory of the cache, it's created if needed.
+    :param int max_size: Maximum total size of the cached results in bytes.
+    """
+
+    def __init__(self, path, max_size=1 << 30):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Sizes of the results by path, least recently used first, None until scanned.
+        self.__index = None
+        self.__size = 0
+
+    def file_path(self, key):
+        return os.path.join(self.path, key[:2], key + ".npz")
+
+    def entries(self):
+        """
+        All cached results as (last use, size, path) tuples, least recently used first.
+
+        :rtype: list
+        """
+        entries = []
+        for directory, _, files in os.walk(self.path):
+            for name in files:
+                if not name.endswith(".npz"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # Evicted by another process.
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    @property
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def __len__(self):
+        return len(self.entries())
+
+    def __contains__(self, key):
+        return os.path.exists(self.file_path(key))
+
+    def get(self, key):
+        """
+        Cached result, or None if it's not in the cache.
+
+        :param str key: Key of the result, see :func:`config_hash`.
+        :rtype: dict
+        """
+        path = self.file_path(key)
+        try:
+            with np.load(path) as data:
+                result = {name: data[name] for name in data.files}
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        if self.__index is not None and path in self.__index:
+            self.__index[path] = self.__index.pop(path)
+        return result
+
+    def put(self, key, result):
+        """
+        Stores a result and evicts the least recently used results if the cache is too large.
+
+        :param str key: Key of the result, see :func:`config_hash`.
+        :param dict result: Dictionary mapping names to NumPy arrays.
+        """
+        path = self.file_path(key)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Created by another process in the meantime.
+                pass
+
+        # Written to a temporary file first, so readers never see a partial result.
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **result)
+            size = f.tell()
+        os.replace(tmp_path, path)
+
+        if self.__index is None:
+            self.__scan()
+        else:
+            self.__size += size - self.__index.pop(path, 0)
+            self.__index[path] = size
+        if self.__size > self.max_size:
+            self.__evict()
+
+    def get_or_run(self, key, run):
+        """
+        Returns the cached result, or runs the simulation and caches its result.
+
+        :param str key: Key of the result, see :func:`config_hash`.
+        :param run: Callable without arguments returning the result as a dictionary of arrays.
+        :rtype: dict
+        """
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        result = run()
+        self.put(key, result)
+        return result
+
+    def __scan(self):
+        self.__index = OrderedDict((path, size) for _, size, path in self.entries())
+        self.__size = sum(self.__index.values())
+
+    def evict(self):
+        """
+        Scans the directory and removes the least recently used results until the cache fits in
+        ``max_size``.
+        """
+        self.__scan()
+        self.__evict()
+
+    def __evict(self):
+        while self.__size > self.max_size and self.__index:
+            path, size = self.__index.popitem(last=False)
+            try:
+                os.remove(path)
+            except OSError:
+                # Evicted by another process.
+                pass
+            self.__size -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.__index = OrderedDict()
+        self.__size = 0
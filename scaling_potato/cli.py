@@ -0,0 +1,201 @@
+"""
+Command line interface, run with ``python -m scaling_potato``.
+
+There is a command per mode:
+
+- ``interactive`` opens the :class:`scaling_potato.world.World` window.
+- ``headless`` flies a single quadcopter without rendering, with zero commands or a recorded
+  command stream, and optionally records its telemetry.
+- ``batch`` runs a sweep over controller gains and initial positions on a process pool, see
+  :mod:`scaling_potato.sweep`.
+
+Every command imports what it needs when it runs, so Panda3d, SciPy and the OpenCV extension
+are only loaded by the modes that use them.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+
+__author__ = "Aaron M. de Windt"
+
+
+PACKAGE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_axis(text):
+    """
+    Parses a ``name=value,value,...`` sweep axis.
+
+    :rtype: tuple
+    """
+    name, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError("Expected name=value,value,... but got '{}'.".format(text))
+    return name, [float(value) for value in values.split(",")]
+
+
+def random_distributions(axes):
+    """
+    Distributions of the --random cases. The axes of the float gains are uniform distributions
+    between their smallest and largest value, the other axes, like the integer profile, are
+    choices from their values.
+
+    :param list axes: (name, values) tuples of :func:`parse_axis`.
+    :rtype: dict
+    """
+    from scaling_potato.sweep import Uniform, case_dtype
+
+    distributions = {}
+    for name, values in axes:
+        if name in case_dtype.names and case_dtype[name].kind == "f" and \
+                case_dtype[name].shape == ():
+            distributions[name] = Uniform(min(values), max(values))
+        else:
+            distributions[name] = values
+    return distributions
+
+
+def native_integrator(name, dt):
+    """
+    Native integrator for the --integrator option, None for SciPy's.
+    """
+    if name == "scipy":
+        return None
+    from scaling_potato.scaling_potato_c import QuadcopterIntegrator
+    if name == "rk4":
+        return QuadcopterIntegrator("rk4", False, dt / 4)
+    return QuadcopterIntegrator("dopri5", True)
+
+
+def run_interactive(args):
+    from panda3d.core import getModelPath, Filename
+    # The models and fonts are looked up relative to the package.
+    getModelPath().appendDirectory(Filename.fromOsSpecific(PACKAGE_PATH))
+
+    from scaling_potato.world import World, default_pilons
+    app = World(args.course or default_pilons, physics_rate=args.physics_rate,
+                render_rate=args.render_rate, telemetry_path=args.telemetry,
+                commands_path=args.record_commands, profile=args.profile,
+                profile_path=args.profile_path)
+    app.run()
+    return 0
+
+
+def run_headless(args):
+    from scaling_potato.headless import HeadlessRunner
+    from scaling_potato.quadcopter import Quadcopter
+
+    recorder = None
+    if args.telemetry is not None:
+        from scaling_potato.telemetry import TelemetryRecorder, quadcopter_columns
+        recorder = TelemetryRecorder(args.telemetry, quadcopter_columns())
+
+    if args.commands is not None:
+        from scaling_potato.command_stream import CommandStream
+        stream = CommandStream.load(args.commands)
+        quadcopter = Quadcopter(stream.init_x,
+                                native_integrator=native_integrator(args.integrator, stream.dt))
+        runner = HeadlessRunner([quadcopter], dt=stream.dt, command_source=stream,
+                                recorder=recorder)
+        duration = stream.duration if args.duration is None else args.duration
+    else:
+        quadcopter = Quadcopter(args.init_x,
+                                native_integrator=native_integrator(args.integrator, args.dt))
+        runner = HeadlessRunner([quadcopter], dt=args.dt, recorder=recorder)
+        duration = 10. if args.duration is None else args.duration
+
+    try:
+        runner.run(duration)
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+    print("Simulated {:.3f} s in {} steps, {:.1f}x real time.".format(
+        runner.time, runner.n_steps, runner.real_time_factor))
+    print("Final position: {}".format(" ".join("{:.4f}".format(v) for v in quadcopter.x)))
+    return 0
+
+
+def run_batch(args):
+    from scaling_potato import sweep
+
+    if args.random:
+        cases = sweep.random_cases(args.random, seed=args.seed,
+                                   **random_distributions(args.axis))
+    else:
+        cases = sweep.grid(**dict(args.axis))
+
+    cache = None
+    if args.cache is not None:
+        from scaling_potato.cache import SimulationCache
+        cache = SimulationCache(args.cache)
+
+    results = sweep.run_sweep(cases, duration=args.duration, dt=args.dt,
+                              processes=args.processes, batch_size=args.batch_size, cache=cache)
+    if args.output is not None:
+        sweep.save_results(args.output, results)
+    print("Ran {} cases.".format(len(results)))
+    if cache is not None:
+        print("Cache hits: {}, misses: {}.".format(cache.hits, cache.misses))
+    return 0
+
+
+def parser():
+    main_parser = argparse.ArgumentParser(prog="python -m scaling_potato",
+                                          description="Quadcopter simulation.")
+    commands = main_parser.add_subparsers(dest="command")
+    commands.required = True
+
+    interactive = commands.add_parser("interactive", help="Fly a quadcopter in a window.")
+    interactive.add_argument("--course", help="Course file, see scaling_potato.course.")
+    interactive.add_argument("--physics-rate", type=float, default=1000.)
+    interactive.add_argument("--render-rate", type=float, default=60.)
+    interactive.add_argument("--telemetry", help="Directory the telemetry is recorded to.")
+    interactive.add_argument("--record-commands", help="File the commands are saved to on exit.")
+    interactive.add_argument("--profile", action="store_true",
+                             help="Start with the frame profiler enabled.")
+    interactive.add_argument("--profile-path", help="JSON or CSV file of the profiler dumps.")
+    interactive.set_defaults(run=run_interactive)
+
+    headless = commands.add_parser("headless", help="Fly a quadcopter without rendering.")
+    headless.add_argument("--commands", help="Recorded command stream to replay.")
+    headless.add_argument("--duration", type=float,
+                          help="Simulated time, by default 10 s or the length of the stream.")
+    headless.add_argument("--dt", type=float, default=0.01, help="Time step.")
+    headless.add_argument("--init-x", type=float, nargs=3, default=[0., 0., 0.],
+                          help="Initial position.")
+    headless.add_argument("--integrator", choices=("scipy", "rk4", "dopri5"), default="scipy",
+                          help="Integrator, rk4 and dopri5 are the native ones.")
+    headless.add_argument("--telemetry", help="Directory the telemetry is recorded to.")
+    headless.set_defaults(run=run_headless)
+
+    batch = commands.add_parser("batch", help="Run a sweep of cases on a process pool.")
+    batch.add_argument("--axis", type=parse_axis, action="append", default=[],
+                       metavar="NAME=VALUES",
+                       help="Values of a case field, e.g. v_k_p=10,20,40. With --random the "
+                            "smallest and largest value of a gain are the bounds of a uniform "
+                            "distribution, the values of the other fields are choices.")
+    batch.add_argument("--random", type=int, help="Number of random cases instead of a grid.")
+    batch.add_argument("--seed", type=int)
+    batch.add_argument("--duration", type=float, default=5.)
+    batch.add_argument("--dt", type=float, default=0.01)
+    batch.add_argument("--processes", type=int, help="Worker processes, 1 to run in-process.")
+    batch.add_argument("--batch-size", type=int, default=128)
+    batch.add_argument("--cache", help="Directory of the simulation cache.")
+    batch.add_argument("--output", help="CSV file the results are written to.")
+    batch.set_defaults(run=run_batch)
+
+    return main_parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
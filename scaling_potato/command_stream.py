@@ -0,0 +1,194 @@
+"""
+Recording and replay of the velocity and rotational rate command streams.
+
+A run on the fixed rate physics loop is fully determined by the initial state, the time step
+and the commands given at every step. :class:`CommandRecorder` captures the commands of an
+interactive run, after which :func:`replay` runs the same flight headless, as fast as the cpu
+allows, with bit-identical results.
+"""
+
+import numpy as np
+
+from scaling_potato.cache import config_hash, quadcopter_config
+from scaling_potato.headless import HeadlessRunner
+from scaling_potato.quadcopter import Quadcopter
+
+
+__author__ = "Aaron M. de Windt"
+
+
+class CommandRecorder(object):
+    """
+    Records the commands given at every physics step.
+
+    :param float dt: Time step of the physics loop.
+    :param list init_x: Initial position of the quadcopter.
+    :param int capacity: Number of steps space is preallocated for, it's doubled when full.
+    """
+
+    def __init__(self, dt, init_x, capacity=4096):
+        self.dt = dt
+        self.init_x = np.array(init_x, dtype=np.float64)
+        self.length = 0
+        self.time = np.zeros((capacity,))
+        self.v_command = np.zeros((capacity, 3))
+        self.omega_command = np.zeros((capacity, 3))
+
+    def __len__(self):
+        return self.length
+
+    def record(self, time, v_command, omega_command):
+        """
+        Records the commands given at a physics step.
+
+        :param float time: Simulation time of the step.
+        :param numpy_array v_command: Velocity command.
+        :param numpy_array omega_command: Rotational rate command.
+        """
+        i = self.length
+        if i == len(self.time):
+            self.time = np.concatenate((self.time, np.zeros_like(self.time)))
+            self.v_command = np.concatenate((self.v_command, np.zeros_like(self.v_command)))
+            self.omega_command = np.concatenate((self.omega_command, np.zeros_like(self.omega_command)))
+        self.time[i] = time
+        self.v_command[i] = v_command
+        self.omega_command[i] = omega_command
+        self.length = i + 1
+
+    def stream(self):
+        """
+        The recorded commands as a stream.
+
+        :rtype: CommandStream
+        """
+        n = self.length
+        return CommandStream(self.dt, self.init_x, self.time[:n].copy(), self.v_command[:n].copy(),
+                             self.omega_command[:n].copy())
+
+    def save(self, path):
+        """
+        Saves the recorded commands to a ``.npz`` file.
+        """
+        self.stream().save(path)
+
+
+class CommandStream(object):
+    """
+    Timestamped command stream, which can be used as the command source of a
+    :class:`scaling_potato.headless.HeadlessRunner`.
+
+    The commands are held until the time of the next recorded step, so the stream can also be
+    sampled at times that were not recorded.
+
+    :param float dt: Time step of the physics loop the stream was recorded with.
+    :param numpy_array init_x: Initial position of the quadcopter.
+    :param numpy_array time: Time of each step.
+    :param numpy_array v_command: (n, 3) velocity commands.
+    :param numpy_array omega_command: (n, 3) rotational rate commands.
+    """
+
+    def __init__(self, dt, init_x, time, v_command, omega_command):
+        self.dt = dt
+        self.init_x = init_x
+        self.time = time
+        self.v_command = v_command
+        self.omega_command = omega_command
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def duration(self):
+        return len(self.time) * self.dt
+
+    def index(self, time):
+        """
+        Index of the last step recorded at or before the given time.
+
+        :rtype: int
+        """
+        return int(np.searchsorted(self.time, time, side="right")) - 1
+
+    def __call__(self, time, quadcopter=None):
+        i = self.index(time)
+        if i < 0:
+            return np.zeros((3,)), np.zeros((3,))
+        return self.v_command[i], self.omega_command[i]
+
+    def save(self, path):
+        np.savez(path, dt=self.dt, init_x=self.init_x, time=self.time, v_command=self.v_command,
+                 omega_command=self.omega_command)
+
+    @staticmethod
+    def load(path):
+        """
+        Loads a stream saved with :meth:`save`.
+
+        :rtype: CommandStream
+        """
+        with np.load(path) as data:
+            return CommandStream(float(data["dt"]), data["init_x"], data["time"],
+                                 data["v_command"], data["omega_command"])
+
+
+def replay(stream, quadcopter=None, recorder=None, callback=None):
+    """
+    Replays a command stream headless, as fast as possible.
+
+    :param CommandStream stream: Stream to replay, or the path of a saved stream.
+    :param scaling_potato.quadcopter.Quadcopter quadcopter: Quadcopter to fly, by default a new
+                                                            one at the recorded initial position.
+    :param scaling_potato.telemetry.TelemetryRecorder recorder: Optional telemetry recorder.
+    :param callback: Optional callable called with the runner after every step.
+    :return: The runner used for the replay.
+    :rtype: scaling_potato.headless.HeadlessRunner
+    """
+    if not isinstance(stream, CommandStream):
+        stream = CommandStream.load(stream)
+    if quadcopter is None:
+        quadcopter = Quadcopter(stream.init_x)
+
+    runner = HeadlessRunner([quadcopter], dt=stream.dt, command_source=stream, recorder=recorder)
+    runner.run(stream.duration, callback)
+    return runner
+
+
+def replay_trajectory(stream, quadcopter=None, cache=None):
+    """
+    Replays a command stream and returns the trajectory. With a cache, the trajectory is only
+    simulated if the same quadcopter configuration and stream were not replayed before.
+
+    :param CommandStream stream: Stream to replay, or the path of a saved stream.
+    :param scaling_potato.quadcopter.Quadcopter quadcopter: Quadcopter to fly, by default a new
+                                                            one at the recorded initial position.
+    :param scaling_potato.cache.SimulationCache cache: Optional cache of the trajectories.
+    :return: Dictionary with the time, state and error of every step.
+    :rtype: dict
+    """
+    if not isinstance(stream, CommandStream):
+        stream = CommandStream.load(stream)
+    if quadcopter is None:
+        quadcopter = Quadcopter(stream.init_x)
+
+    def run():
+        n_steps = int(round(stream.duration / stream.dt))
+        trajectory = {
+            "time": np.zeros((n_steps,)),
+            "state": np.zeros((n_steps, 13)),
+            "error": np.zeros((n_steps, 3)),
+        }
+
+        def record(runner):
+            i = runner.n_steps - 1
+            trajectory["time"][i] = i * runner.dt
+            trajectory["state"][i] = quadcopter.state_vector
+            trajectory["error"][i] = quadcopter.error
+
+        replay(stream, quadcopter, callback=record)
+        return trajectory
+
+    if cache is None:
+        return run()
+
+    key = config_hash("replay_trajectory", quadcopter_config(quadcopter), stream)
+    return cache.get_or_run(key, run)
@@ -0,0 +1,194 @@
+"""
+Courses of pylons.
+
+A course is a structured array with the :data:`course_dtype` fields, the RGBA colour and the
+(x, y) position of every pylon. Courses are stored as ``.npy`` files, or as ``.csv`` files with
+a ``color,x,y`` header and hexadecimal colours for editing them by hand.
+
+The :class:`CourseRenderer` draws a course with a few draw calls, however many pylons it has.
+The pylons are copied into the cells of a grid and the geometry of every cell is flattened
+into a single mesh, so the number of draw calls depends on the area of the course instead of
+on the number of pylons, while the cells can still be culled.
+"""
+
+import numpy as np
+
+
+__author__ = "Aaron M. de Windt"
+
+
+course_dtype = np.dtype([
+    ("color", np.uint8, (4,)),
+    ("x", np.float64),
+    ("y", np.float64),
+])
+
+# Pylons with a transparent colour keep the colour of the model.
+MODEL_COLOR = (0, 0, 0, 0)
+
+
+def make_course(x, y, color=MODEL_COLOR):
+    """
+    Creates a course.
+
+    :param numpy_array x: (N,) x positions of the pylons.
+    :param numpy_array y: (N,) y positions of the pylons.
+    :param color: RGBA colour in [0, 255] of all pylons, or an (N, 4) array with a colour per
+                  pylon.
+    :return: Structured array with :data:`course_dtype`.
+    :rtype: numpy_array
+    """
+    x = np.asarray(x, dtype=np.float64)
+    course = np.zeros(x.shape, dtype=course_dtype)
+    course["x"] = x
+    course["y"] = y
+    course["color"] = color
+    return course
+
+
+def _color(color):
+    """
+    RGB or RGBA colour in [0, 1] to RGBA in [0, 255].
+    """
+    if color is None:
+        return MODEL_COLOR
+    color = tuple(color)
+    if len(color) == 3:
+        color += (1.,)
+    return tuple(int(round(255 * min(max(c, 0.), 1.))) for c in color)
+
+
+def course_from_pilons(pilons):
+    """
+    Converts a list with the colour and (x, y) position of each pylon to a course. The colours
+    are RGB or RGBA tuples in [0, 1] like in Panda3d, or None for the colour of the model.
+
+    :rtype: numpy_array
+    """
+    course = np.zeros((len(pilons),), dtype=course_dtype)
+    for i, (color, position) in enumerate(pilons):
+        course[i] = (_color(color), position[0], position[1])
+    return course
+
+
+def as_course(pilons):
+    """
+    Course from a course array, a path of a course file or a list of (colour, position) pairs.
+
+    :rtype: numpy_array
+    """
+    if pilons is None:
+        return np.zeros((0,), dtype=course_dtype)
+    if isinstance(pilons, np.ndarray) and pilons.dtype == course_dtype:
+        return pilons
+    if isinstance(pilons, str):
+        return load_course(pilons)
+    return course_from_pilons(pilons)
+
+
+def save_course(path, course):
+    if path.endswith(".csv"):
+        with open(path, "w") as f:
+            f.write("color,x,y\n")
+            for color, x, y in course.tolist():
+                f.write("#{:02x}{:02x}{:02x}{:02x},{!r},{!r}\n".format(*(tuple(color) + (x, y))))
+    else:
+        np.save(path, course)
+
+
+def load_course(path):
+    """
+    Loads a course saved by :func:`save_course`.
+
+    :rtype: numpy_array
+    """
+    if not path.endswith(".csv"):
+        course = np.load(path)
+        if course.dtype != course_dtype:
+            raise ValueError("'{}' is not a course file.".format(path))
+        return course
+
+    # The colours start with a "#", so there are no comments.
+    rows = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="ascii",
+                         comments=None, ndmin=1)
+    course = np.zeros((len(rows),), dtype=course_dtype)
+    course["x"] = rows["x"]
+    course["y"] = rows["y"]
+    for i, color in enumerate(rows["color"]):
+        color = color.lstrip("#")
+        course["color"][i] = [int(color[j:j + 2], 16) for j in range(0, 8, 2)]
+    return course
+
+
+class CourseRenderer(object):
+    """
+    Draws the pylons of a course with one flattened mesh per grid cell.
+
+    :param panda3d.core.NodePath parent: Node the course is attached to, e.g. render.
+    :param numpy_array course: Structured array with :data:`course_dtype`.
+    :param panda3d.core.NodePath model: Model of a pylon, see
+                                        :class:`scaling_potato.assets.ModelCache`.
+    :param float cell_size: Size of the grid cells in meters.
+    :param bool flatten: If False every pylon keeps its own node, for debugging.
+    """
+
+    def __init__(self, parent, course, model, cell_size=50., flatten=True):
+        self.course = course
+        self.model = model
+        self.cell_size = cell_size
+        self.flatten = flatten
+        self.node_path = parent.attachNewNode("course")
+        self.cells = {}
+        self.build()
+
+    def cell_indices(self):
+        """
+        Grid cell of every pylon.
+
+        :return: (N, 2) integer array.
+        :rtype: numpy_array
+        """
+        positions = np.column_stack((self.course["x"], self.course["y"]))
+        return np.floor(positions / self.cell_size).astype(np.int64)
+
+    def build(self):
+        """
+        (Re)creates the nodes of all pylons, call it after changing the course.
+        """
+        for cell in self.cells.values():
+            cell.removeNode()
+        self.cells = {}
+        if len(self.course) == 0:
+            return
+
+        cells = self.cell_indices()
+        keys, inverse, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+        # Indices of the pylons sorted by cell.
+        order = np.argsort(inverse.ravel(), kind="stable")
+        ends = np.cumsum(counts)
+        x = self.course["x"].tolist()
+        y = self.course["y"].tolist()
+        colors = (self.course["color"] / 255.).tolist()
+        for key, start, end in zip(keys.tolist(), ends - counts, ends):
+            cell = self.node_path.attachNewNode("cell_{}_{}".format(*key))
+            for i in order[start:end].tolist():
+                pylon = self.model.copyTo(cell)
+                pylon.setPos(x[i], y[i], 0)
+                if colors[i][3] > 0:
+                    pylon.setColor(*colors[i])
+            if self.flatten:
+                # Bakes the transforms and colours into the vertices and merges the geometry.
+                cell.flattenStrong()
+            self.cells[tuple(key)] = cell
+
+    @property
+    def n_geoms(self):
+        """
+        Number of Geoms, which is about the number of draw calls of the course.
+        """
+        return sum(node.node().getNumGeoms()
+                   for node in self.node_path.findAllMatches("**/+GeomNode"))
+
+    def remove(self):
+        self.node_path.removeNode()
+        self.cells = {}
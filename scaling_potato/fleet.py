@@ -0,0 +1,247 @@
+import numpy as np
+from scaling_potato.pid_control import PIDBank
+from scaling_potato.transforms import RotationCache, to_body, to_inertial
+
+
+__author__ = "Aaron M. de Windt"
+
+
+class QuadcopterFleet(object):
+    """
+    Object handling the dynamics of a fleet of quadcopters in a single struct-of-arrays state.
+
+    The state of all vehicles is stored in one contiguous (N, 13) array with the columns
+    ``[x(3), v_i(3), q(4), omega(3)]``. All vehicles are advanced by a single integrator that
+    evaluates the right hand side for the whole fleet at once, so the cost of the Python
+    callback is paid once per integrator stage instead of once per vehicle.
+
+    :param init_x: (N, 3) array with the initial positions of the quadcopters.
+    :param direct.showbase.ShowBase.ShowBase pbase: Main Panda3d ShowBase. If None the fleet
+                                                    is simulated without any scene graph nodes.
+    :param str model: Path of the model loaded for each quadcopter.
+    :param scaling_potato.scaling_potato_c.QuadcopterIntegrator native_integrator: Optional
+        native integrator used instead of SciPy's dopri5 to integrate the states.
+    """
+
+    state_size = 13
+
+    def __init__(self, init_x, pbase=None, model="models/plane.egg", native_integrator=None):
+        init_x = np.atleast_2d(np.asarray(init_x, dtype=np.float64))
+        self.n = init_x.shape[0]
+
+        self.state = np.zeros((self.n, self.state_size))
+        self.state[:, 0:3] = init_x
+        self.state[:, 6] = 1.
+        self.state_dot = np.zeros((self.n, self.state_size))
+
+        self.a_i = np.zeros((self.n, 3))
+        self.omega_dot = np.zeros((self.n, 3))
+
+        self.time = None
+        self.__rotation = RotationCache()
+
+        self.v_pid = PIDBank(self.n, 3, 20.0, 10.0, 0.0)
+        self.omega_pid = PIDBank(self.n, 3, 5.0, 0.0, 0.0)
+        self.__v_control_time = None
+        self.__omega_control_time = None
+
+        # SciPy is only imported when it integrates the state, see the integrator property.
+        self.__integrator = None
+        self.native_integrator = native_integrator
+
+        self.pbase = pbase
+        self.node_paths = []
+        self.models = []
+
+        if pbase is not None:
+            from scaling_potato.assets import shared_model_cache
+
+            models = shared_model_cache(pbase)
+            for i in range(self.n):
+                node_path = pbase.render.attachNewNode("Quadcopter_{}".format(i))
+                model_node = models.copy(model, node_path)
+                model_node.setH(90)
+                self.node_paths.append(node_path)
+                self.models.append(model_node)
+            self.sync_node_paths()
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def integrator(self):
+        """
+        SciPy's dopri5 integrator, created on first use so simulations with a native integrator
+        never import SciPy.
+        """
+        if self.__integrator is None:
+            from scipy.integrate import ode
+
+            # Explicit runge-kutta method of order (4)5 due to Dormand & Prince
+            self.__integrator = ode(self.rhs_equation).set_integrator('dopri5')
+        return self.__integrator
+
+    @property
+    def x(self):
+        return self.state[:, 0:3]
+
+    @x.setter
+    def x(self, value):
+        self.state[:, 0:3] = value
+
+    @property
+    def v_i(self):
+        return self.state[:, 3:6]
+
+    @v_i.setter
+    def v_i(self, value):
+        self.state[:, 3:6] = value
+
+    @property
+    def q(self):
+        return self.state[:, 6:10]
+
+    @q.setter
+    def q(self, value):
+        self.state[:, 6:10] = value
+
+    @property
+    def omega(self):
+        return self.state[:, 10:13]
+
+    @omega.setter
+    def omega(self, value):
+        self.state[:, 10:13] = value
+
+    @property
+    def error(self):
+        return self.v_pid.prev_error
+
+    @property
+    def tmat_ib(self):
+        """
+        (N, 3, 3) array with the transformation matrices from the body to the inertial frame.
+        It's cached and only recomputed when the quaternions change.
+        """
+        return self.__rotation.tmat_ib(self.q)
+
+    @property
+    def hpr(self):
+        """
+        (N, 3) array with the heading, pitch and roll of all vehicles in degrees.
+        """
+        return self.__rotation.hpr(self.q)
+
+    @property
+    def v_b(self):
+        return to_body(self.tmat_ib, self.v_i)
+
+    @v_b.setter
+    def v_b(self, value):
+        to_inertial(self.tmat_ib, value, out=self.v_i)
+
+    @property
+    def a_b(self):
+        return to_body(self.tmat_ib, self.a_i)
+
+    @a_b.setter
+    def a_b(self, value):
+        to_inertial(self.tmat_ib, value, out=self.a_i)
+
+    def v_control(self, time, v_command):
+        """
+        Steps the velocity controllers of all vehicles.
+
+        :param float time: Simulation time.
+        :param numpy_array v_command: (N, 3) or (3,) array with the body velocity commands.
+        """
+        dt = 0. if self.__v_control_time is None else time - self.__v_control_time
+        self.__v_control_time = time
+        self.v_pid.command[:] = v_command
+        self.a_b = self.v_pid.step(dt, self.v_b)
+
+    def omega_control(self, time, omega_command):
+        """
+        Steps the rotational rate controllers of all vehicles.
+
+        :param float time: Simulation time.
+        :param numpy_array omega_command: (N, 3) or (3,) array with the rotational rate commands.
+        """
+        dt = 0. if self.__omega_control_time is None else time - self.__omega_control_time
+        self.__omega_control_time = time
+        self.omega_pid.command[:] = omega_command
+        self.omega_pid.step(dt, self.omega, out=self.omega_dot)
+
+    def step(self, time):
+        """
+        Advances the whole fleet to the given time.
+
+        The scene graph is not touched, call :meth:`sync_node_paths` before rendering.
+
+        :param float time: Simulation time to integrate to.
+        """
+        if self.native_integrator is not None:
+            # Integrates the states in place, with the inputs held constant.
+            if self.time is not None:
+                self.native_integrator.integrate(self.state, self.a_i, self.omega_dot, self.time,
+                                                 time)
+            self.time = time
+        elif self.time is None:
+            self.integrator.set_initial_value(self.state.ravel(), time)
+            self.time = time
+        else:
+            self.integrator.integrate(time)
+            self.time = self.integrator.t
+            self.state[:] = self.integrator.y.reshape(self.n, self.state_size)
+
+    def rhs_equation(self, t, y):
+        y = y.reshape(self.n, self.state_size)
+        y_dot = self.state_dot
+        y_dot[:, 0:3] = y[:, 3:6]
+        y_dot[:, 3:6] = self.a_i
+        omega2qdot_batch(y[:, 10:13], y[:, 6:10], out=y_dot[:, 6:10])
+        y_dot[:, 10:13] = self.omega_dot
+        return y_dot.ravel()
+
+    def sync_node_paths(self):
+        """
+        Copies the positions and attitudes of all vehicles to their node paths in one pass.
+        """
+        if not self.node_paths:
+            return
+
+        for node_path, x, q in zip(self.node_paths, self.x.tolist(), self.q.tolist()):
+            node_path.setPosQuat(tuple(x), tuple(q))
+
+
+def omega2qdot_batch(omega, quat, K=1.0, out=None):
+    """Converts the rotational rates of many vehicles to quaternion rates.
+
+    :param omega: (N, 3) array with the rotational rates.
+    :type omega: numpy_array
+    :param quat: (N, 4) array with the quaternions.
+    :type quat: numpy_array
+    :param out: Optional (N, 4) array the quaternion rates are written into.
+    :type out: numpy_array
+    :return: (N, 4) array with the quaternion rates.
+    :rtype: numpy_array
+    """
+    if out is None:
+        out = np.empty(quat.shape)
+
+    p = omega[:, 0]
+    q = omega[:, 1]
+    r = omega[:, 2]
+    q0 = quat[:, 0]
+    q1 = quat[:, 1]
+    q2 = quat[:, 2]
+    q3 = quat[:, 3]
+
+    e = K * (1 - (q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3))
+
+    out[:, 0] = 0.5 * (e * q0 - p * q1 - q * q2 - r * q3)
+    out[:, 1] = 0.5 * (p * q0 + e * q1 + r * q2 - q * q3)
+    out[:, 2] = 0.5 * (q * q0 - r * q1 + e * q2 + p * q3)
+    out[:, 3] = 0.5 * (r * q0 + q * q1 - p * q2 + e * q3)
+
+    return out
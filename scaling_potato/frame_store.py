@@ -0,0 +1,281 @@
+"""
+Recording of camera frames to disk.
+
+A recording consists of three files in one directory:
+
+- ``frames.bin`` with the frames, either raw or each compressed on its own with zlib.
+- ``frames.idx`` with one :data:`index_dtype` record per frame, holding the frame number, the
+  simulation time and the byte offset and size of the frame in ``frames.bin``.
+- ``frames.json`` with the shape and data type of the frames and the compression used.
+
+The index allows jumping to any frame without reading or decoding the frames before it. Raw
+recordings are memory mapped by the reader, so their frames are not copied at all.
+"""
+
+import json
+import os
+import threading
+import zlib
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import numpy as np
+
+
+__author__ = "Aaron M. de Windt"
+
+
+DATA_FILE = "frames.bin"
+INDEX_FILE = "frames.idx"
+META_FILE = "frames.json"
+VERSION = 1
+
+index_dtype = np.dtype([
+    ("frame_number", np.int64),
+    ("time", np.float64),
+    ("offset", np.uint64),
+    ("size", np.uint64),
+])
+
+
+class FrameRecorder(object):
+    """
+    Records camera frames on a background thread.
+
+    :meth:`record` only copies the frame into a bounded queue, the frames are compressed and
+    written by the background thread. If the thread falls behind the frame is dropped instead of
+    waiting for it. An exception in the background thread, e.g. a full disk, stops the recording
+    and is raised again by the next call to :meth:`record` or :meth:`close`. The recorder can be
+    subscribed directly to a
+    :class:`scaling_potato.readback.CameraReadback` or :class:`scaling_potato.atlas.AtlasTile`.
+
+    :param str path: Directory the recording is written to, it's created if needed.
+    :param str compression: "zlib" for lossless compression, None to store the frames raw.
+    :param int level: Zlib compression level, 1 is the fastest.
+    :param int max_queue_size: Number of frames that may wait for the background thread.
+    """
+
+    def __init__(self, path, compression="zlib", level=1, max_queue_size=16):
+        if compression not in ("zlib", None):
+            raise ValueError("Unknown compression '{}'.".format(compression))
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self.path = path
+        self.compression = compression
+        self.level = level
+        self.shape = None
+        self.dtype = None
+
+        self.n_recorded = 0
+        self.n_dropped = 0
+        self.n_written = 0
+
+        self.__data_file = open(os.path.join(path, DATA_FILE), "wb")
+        self.__index_file = open(os.path.join(path, INDEX_FILE), "wb")
+        self.__offset = 0
+
+        self.__queue = queue.Queue(max_queue_size)
+        self.__exception = None
+        self.__thread = threading.Thread(target=self.__worker, name="frame_recorder")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __call__(self, frame):
+        self.record(frame.image, frame.frame_number, frame.time)
+
+    def record(self, image, frame_number, time):
+        """
+        Queues a copy of a frame for recording.
+
+        :param numpy_array image: The frame, all frames must have the same shape and data type.
+        :param int frame_number: Number of the frame.
+        :param float time: Simulation time of the frame.
+        :return: False if the frame was dropped because the background thread fell behind.
+        :rtype: bool
+        """
+        if self.__exception is not None:
+            raise self.__exception
+        if self.shape is None:
+            self.shape = image.shape
+            self.dtype = image.dtype
+            self.__write_meta()
+        elif image.shape != self.shape or image.dtype != self.dtype:
+            raise ValueError("All frames in a recording must have the same shape and data type.")
+
+        try:
+            self.__queue.put_nowait((np.array(image, order="C", copy=True), frame_number, time))
+        except queue.Full:
+            self.n_dropped += 1
+            return False
+        self.n_recorded += 1
+        return True
+
+    def close(self):
+        """
+        Writes the queued frames and closes the files.
+
+        :raises Exception: The exception that stopped the background thread, if any.
+        """
+        if self.__thread is None:
+            return
+        # A stopped thread doesn't empty the queue anymore.
+        while self.__thread.is_alive():
+            try:
+                self.__queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self.__thread.join()
+        self.__thread = None
+        self.__data_file.close()
+        self.__index_file.close()
+        if self.__exception is not None:
+            raise self.__exception
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __worker(self):
+        try:
+            self.__write_frames()
+        except Exception as e:
+            self.__exception = e
+
+    def __write_frames(self):
+        entry = np.zeros((), dtype=index_dtype)
+        while True:
+            job = self.__queue.get()
+            if job is None:
+                return
+            image, frame_number, time = job
+
+            if self.compression is None:
+                data = image.data
+                size = image.nbytes
+            else:
+                data = zlib.compress(image.data, self.level)
+                size = len(data)
+            self.__data_file.write(data)
+            # The frame is flushed before its index entry is written, so readers of a recording
+            # in progress never find an entry without its frame.
+            self.__data_file.flush()
+
+            entry["frame_number"] = frame_number
+            entry["time"] = time
+            entry["offset"] = self.__offset
+            entry["size"] = size
+            self.__index_file.write(entry.tobytes())
+            self.__index_file.flush()
+            self.__offset += size
+            self.n_written += 1
+
+    def __write_meta(self):
+        meta = {
+            "version": VERSION,
+            "shape": list(self.shape),
+            "dtype": self.dtype.str,
+            "compression": self.compression,
+        }
+        with open(os.path.join(self.path, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+
+
+class FrameReader(object):
+    """
+    Random access to the frames of a recording.
+
+    :param str path: Directory the recording was written to.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta["version"] != VERSION:
+            raise ValueError("Unsupported frame recording version {}.".format(meta["version"]))
+
+        self.shape = tuple(meta["shape"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.compression = meta["compression"]
+        self.frame_size = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        self.__data = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Reloads the index, to pick up the frames written since the reader was opened.
+        """
+        index_path = os.path.join(self.path, INDEX_FILE)
+        n_frames = os.path.getsize(index_path) // index_dtype.itemsize
+        self.index = np.fromfile(index_path, dtype=index_dtype, count=n_frames)
+
+        if self.compression is None:
+            self.__data = None
+            if n_frames:
+                self.__data = np.memmap(os.path.join(self.path, DATA_FILE), dtype=self.dtype,
+                                        mode="r", shape=(n_frames,) + self.shape)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def frame_numbers(self):
+        return self.index["frame_number"]
+
+    @property
+    def times(self):
+        return self.index["time"]
+
+    def __getitem__(self, i):
+        """
+        Frame at position i in the recording. Raw frames are read-only views on the memory mapped
+        file, compressed frames are decoded from a single read.
+
+        :rtype: numpy_array
+        """
+        entry = self.index[i]
+        if self.compression is None:
+            return self.__data[i]
+
+        with open(os.path.join(self.path, DATA_FILE), "rb") as f:
+            f.seek(int(entry["offset"]))
+            data = f.read(int(entry["size"]))
+        image = np.frombuffer(zlib.decompress(data), dtype=self.dtype)
+        return image.reshape(self.shape)
+
+    def find(self, frame_number):
+        """
+        Position of a frame in the recording, assuming frame numbers increase.
+
+        :param int frame_number: Number of the frame.
+        :raises KeyError: If the frame was not recorded.
+        :rtype: int
+        """
+        i = int(np.searchsorted(self.frame_numbers, frame_number))
+        if i == len(self) or self.frame_numbers[i] != frame_number:
+            raise KeyError("Frame {} is not in the recording.".format(frame_number))
+        return i
+
+    def frame(self, frame_number):
+        """
+        Frame with the given frame number.
+
+        :rtype: numpy_array
+        """
+        return self[self.find(frame_number)]
+
+    def at_time(self, time):
+        """
+        Position of the last frame recorded at or before the given time, or -1 if there's none.
+
+        :rtype: int
+        """
+        return int(np.searchsorted(self.times, time, side="right")) - 1
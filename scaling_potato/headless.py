@@ -0,0 +1,122 @@
+import time as wall_clock
+
+import numpy as np
+
+
+__author__ = "Aaron M. de Windt"
+
+
+def offscreen_base():
+    """
+    The global ShowBase, created with an offscreen window on the first call, for rendering
+    without a display, e.g. in tests and benchmarks.
+
+    :rtype: direct.showbase.ShowBase.ShowBase
+    """
+    try:
+        import builtins
+    except ImportError:
+        import __builtin__ as builtins
+
+    if getattr(builtins, "base", None) is None:
+        from panda3d.core import loadPrcFileData
+        loadPrcFileData("", "audio-library-name null")
+        from direct.showbase.ShowBase import ShowBase
+        ShowBase(windowType="offscreen")
+    return builtins.base
+
+
+def zero_commands(time, quadcopter):
+    """
+    Command source that keeps the quadcopter at rest.
+    """
+    return np.zeros((3,)), np.zeros((3,))
+
+
+class HeadlessRunner(object):
+    """
+    Runs quadcopters and their controllers on a synthetic clock, as fast as the cpu allows.
+
+    Each step does the same as :meth:`scaling_potato.world.World.main_loop`, the quadcopters are
+    integrated to the current time after which the velocity and rotational rate controllers are
+    run with the commands for that time. The clock advances by a fixed ``dt`` every step instead
+    of following the wall clock.
+
+    :param list quadcopters: List of :class:`scaling_potato.quadcopter.Quadcopter` objects.
+    :param float dt: Time step of the synthetic clock.
+    :param command_source: Callable with the signature ``command_source(time, quadcopter)``
+                           returning the velocity and rotational rate commands as a tuple.
+    :param direct.showbase.ShowBase.ShowBase pbase: Optional ShowBase, if given a frame is
+                                                    rendered every ``render_interval`` steps.
+    :param int render_interval: Number of steps between rendered frames.
+    :param scaling_potato.telemetry.TelemetryRecorder recorder: Optional recorder the state,
+                                                                commands and controller outputs
+                                                                are recorded with every step.
+    """
+
+    def __init__(self, quadcopters, dt=0.01, command_source=None, pbase=None, render_interval=1,
+                 recorder=None):
+        self.quadcopters = list(quadcopters)
+        self.dt = dt
+        self.command_source = command_source or zero_commands
+        self.pbase = pbase
+        self.render_interval = render_interval
+        self.recorder = recorder
+        self.v_commands = [None] * len(self.quadcopters)
+        self.omega_commands = [None] * len(self.quadcopters)
+
+        self.time = 0.
+        self.n_steps = 0
+        self.wall_time = 0.
+
+    @property
+    def real_time_factor(self):
+        """
+        Simulated seconds per wall clock second spent in :meth:`run`.
+        """
+        if self.wall_time == 0:
+            return float("nan")
+        return self.time / self.wall_time
+
+    def step(self):
+        """
+        Runs a single step and advances the synthetic clock.
+        """
+        time = self.time
+        for i, quadcopter in enumerate(self.quadcopters):
+            quadcopter.step(time)
+            v_command, omega_command = self.command_source(time, quadcopter)
+            quadcopter.v_control(time, v_command)
+            quadcopter.omega_control(time, omega_command)
+            self.v_commands[i] = v_command
+            self.omega_commands[i] = omega_command
+
+        if self.recorder is not None:
+            self.recorder.record_quadcopters(time, self.quadcopters, self.v_commands,
+                                             self.omega_commands)
+
+        if self.pbase is not None and self.n_steps % self.render_interval == 0:
+            for quadcopter in self.quadcopters:
+                quadcopter.sync_node_path()
+            self.pbase.graphicsEngine.renderFrame()
+
+        self.n_steps += 1
+        self.time = self.n_steps * self.dt
+
+    def run(self, duration, callback=None):
+        """
+        Runs the simulation for the given amount of simulated time.
+
+        :param float duration: Simulated time in seconds.
+        :param callback: Optional callable called with the runner after every step.
+        :return: The simulation time at the end of the run.
+        :rtype: float
+        """
+        end_step = self.n_steps + int(round(duration / self.dt))
+        start = wall_clock.perf_counter()
+        while self.n_steps < end_step:
+            self.step()
+            if callback is not None:
+                callback(self)
+        self.wall_time += wall_clock.perf_counter() - start
+        return self.time
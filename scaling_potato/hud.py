@@ -0,0 +1,143 @@
+"""
+Heads up display of the quadcopter state.
+
+The HUD is refreshed at its own rate, independent of the frame rate. Every refresh the
+displayed values are copied into a single snapshot array, rounded to the displayed precision
+in one operation and compared against the values on screen. Only the lines with a changed
+value are formatted and have their text replaced, so text geometry is only generated for
+values that actually changed.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+__author__ = "Aaron M. de Windt"
+
+
+# Quadcopter attributes shown on the HUD and the number of values of each.
+QUADCOPTER_FIELDS = OrderedDict([
+    ("x", 3),
+    ("v_i", 3),
+    ("a_i", 3),
+    ("v_b", 3),
+    ("a_b", 3),
+    ("roll", 1),
+    ("pitch", 1),
+    ("yaw", 1),
+    ("omega", 3),
+    ("omega_dot", 3),
+    ("error", 3),
+])
+
+
+class QuadcopterHud(object):
+    """
+    Lines of text with the state of a quadcopter, one per field.
+
+    :param scaling_potato.quadcopter.Quadcopter quadcopter: The quadcopter.
+    :param make_text: Callable taking the index and name of a field and returning the text node
+                      of its line, e.g. an ``OnscreenText``. Only its ``setText`` method is used.
+    :param collections.OrderedDict fields: Attributes of the quadcopter to show and the number
+                                           of values of each.
+    :param float rate: Maximum number of refreshes per second, None to refresh on every update.
+    :param int precision: Number of decimals shown.
+    :param int width: Width of every number.
+    """
+
+    def __init__(self, quadcopter, make_text, fields=None, rate=10., precision=4, width=10):
+        self.quadcopter = quadcopter
+        self.fields = fields or QUADCOPTER_FIELDS
+        self.rate = rate
+        self.precision = precision
+        self.number_format = "%{}.{}f".format(width, precision)
+
+        self.slices = OrderedDict()
+        size = 0
+        for name, n in self.fields.items():
+            self.slices[name] = slice(size, size + n)
+            size += n
+        # Field of every value, to find the fields with a changed value.
+        self.__field_index = np.repeat(np.arange(len(self.fields)), list(self.fields.values()))
+
+        self.snapshot = np.zeros((size,))
+        # Values on screen, every line is set on the first refresh.
+        self.displayed = np.full((size,), np.nan)
+        self.__shown = np.zeros((len(self.fields),), dtype=bool)
+
+        self.text_nodes = OrderedDict(
+            (name, make_text(i, name)) for i, name in enumerate(self.fields))
+
+        self.last_refresh = None
+        self.n_refreshes = 0
+        self.n_set_text = 0
+
+    def take_snapshot(self):
+        """
+        Copies the displayed quadcopter attributes into :attr:`snapshot`. Attributes that are
+        None, like the error before the first control step, are nan.
+
+        :rtype: numpy_array
+        """
+        for name, field_slice in self.slices.items():
+            value = getattr(self.quadcopter, name)
+            self.snapshot[field_slice] = np.nan if value is None else value
+        return self.snapshot
+
+    def update(self, time):
+        """
+        Refreshes the HUD if the time since the last refresh is at least ``1 / rate``.
+
+        :param float time: Wall clock or frame time in seconds.
+        :return: True if the HUD was refreshed.
+        :rtype: bool
+        """
+        if self.rate is not None and self.last_refresh is not None and \
+                time - self.last_refresh < 1. / self.rate:
+            return False
+        self.last_refresh = time
+        self.refresh()
+        return True
+
+    def refresh(self):
+        """
+        Takes a snapshot and replaces the text of the lines whose displayed value changed.
+
+        :return: Names of the fields whose text was replaced.
+        :rtype: list
+        """
+        self.n_refreshes += 1
+        # Adding zero turns -0.0 into 0.0, so values around zero don't flicker between signs.
+        rounded = np.round(self.take_snapshot(), self.precision) + 0.
+
+        # Nan is displayed the same as nan.
+        changed = ~((rounded == self.displayed) | (np.isnan(rounded) & np.isnan(self.displayed)))
+        field_changed = ~self.__shown
+        field_changed[self.__field_index[changed]] = True
+        if not field_changed.any():
+            return []
+
+        self.displayed[:] = rounded
+        self.__shown[:] = True
+
+        # All numbers of the changed fields are formatted in a single call.
+        fields = np.flatnonzero(field_changed)
+        strings = np.char.mod(self.number_format, rounded[field_changed[self.__field_index]])
+
+        names = list(self.slices)
+        updated = []
+        i = 0
+        for field in fields:
+            name = names[field]
+            n = self.fields[name]
+            numbers = strings[i:i + n]
+            i += n
+            if n == 1:
+                value = numbers[0]
+            else:
+                value = "[{}]".format(" ".join(numbers))
+            self.text_nodes[name].setText("{:10} {}".format(name, value))
+            self.n_set_text += 1
+            updated.append(name)
+        return updated
@@ -21,7 +21,7 @@ class PIDControl:
             self.output = np.zeros((length,))
             self.integral = np.zeros((length,))
             self.derivative = np.zeros((length,))
-            self.prev_error = value - self.command
+            self.prev_error = self.command - value
             self.time = time
         else:
             error = self.command - value
@@ -33,3 +33,111 @@ class PIDControl:
             self.prev_error = error
 
             self.output = error * self.k_p + self.integral * self.k_i + self.derivative * self.k_d
+
+
+class PIDBank:
+    """
+    Bank of M PID controllers with K axes each, stepped in a single NumPy operation.
+
+    All state is kept in preallocated (M, K) arrays. The gains may be given as scalars, one
+    value per controller (M,) or one value per controller and axis (M, K). Like
+    :class:`PIDControl` the first step only initializes the error and gives a zero output.
+
+    :param int m: Number of controllers.
+    :param int k: Number of axes of each controller.
+    :param k_p: Proportional gains.
+    :param k_i: Integral gains.
+    :param k_d: Derivative gains.
+    :param integral_limit: Optional limit on the absolute value of the integral, given in the
+                           same shapes as the gains.
+    :param derivative_tau: Optional time constant of the first order low pass filter applied to
+                           the derivative, given in the same shapes as the gains.
+    """
+
+    def __init__(self, m, k, k_p, k_i, k_d, integral_limit=None, derivative_tau=None):
+        self.m = m
+        self.k = k
+        self.k_p = self.__expand(k_p)
+        self.k_i = self.__expand(k_i)
+        self.k_d = self.__expand(k_d)
+        self.integral_limit = None if integral_limit is None else self.__expand(integral_limit)
+        self.derivative_tau = None if derivative_tau is None else self.__expand(derivative_tau)
+
+        self.command = np.zeros((m, k))
+        self.output = np.zeros((m, k))
+        self.integral = np.zeros((m, k))
+        self.derivative = np.zeros((m, k))
+        self.prev_error = np.zeros((m, k))
+        self.initialized = False
+
+        self.__error = np.empty((m, k))
+        self.__tmp = np.empty((m, k))
+        self.__dt = np.empty((m, 1))
+
+    def __expand(self, value):
+        value = np.asarray(value, dtype=np.float64)
+        if value.ndim == 1 and value.shape[0] == self.m:
+            value = value[:, np.newaxis]
+        return np.ascontiguousarray(np.broadcast_to(value, (self.m, self.k)))
+
+    def reset(self):
+        self.output[:] = 0
+        self.integral[:] = 0
+        self.derivative[:] = 0
+        self.prev_error[:] = 0
+        self.initialized = False
+
+    def step(self, dt, value, out=None):
+        """
+        Steps all controllers.
+
+        :param dt: Time step, either a scalar or one value per controller (M,).
+        :param numpy_array value: (M, K) array with the measured values.
+        :param numpy_array out: Optional (M, K) array the output is written into. By default the
+                                output is written into :attr:`output`.
+        :return: The (M, K) output array.
+        :rtype: numpy_array
+        """
+        if out is None:
+            out = self.output
+
+        error = self.__error
+        np.subtract(self.command, value, out=error)
+
+        if not self.initialized:
+            self.prev_error[:] = error
+            self.initialized = True
+            out[:] = 0
+            return out
+
+        dt_col = self.__dt
+        dt_col[:, 0] = dt
+        tmp = self.__tmp
+
+        # Trapezoidal integration of the error.
+        np.add(self.prev_error, error, out=tmp)
+        tmp *= dt_col
+        tmp *= 0.5
+        self.integral += tmp
+        if self.integral_limit is not None:
+            np.clip(self.integral, -self.integral_limit, self.integral_limit, out=self.integral)
+
+        np.subtract(error, self.prev_error, out=tmp)
+        tmp /= dt_col
+        if self.derivative_tau is None:
+            self.derivative[:] = tmp
+        else:
+            # First order low pass filter, derivative += (raw - derivative) * dt / (tau + dt)
+            tmp -= self.derivative
+            tmp *= dt_col
+            tmp /= self.derivative_tau + dt_col
+            self.derivative += tmp
+
+        self.prev_error[:] = error
+
+        np.multiply(error, self.k_p, out=out)
+        np.multiply(self.integral, self.k_i, out=tmp)
+        out += tmp
+        np.multiply(self.derivative, self.k_d, out=tmp)
+        out += tmp
+        return out
@@ -0,0 +1,381 @@
+"""
+Per phase timing of the frames.
+
+A :class:`FrameProfiler` times phases of a frame, like the integration, the controllers, the
+HUD, rendering and the texture readback, and keeps the last durations of every phase in a ring
+buffer. The phases are timed by wrapping methods of the instrumented objects. The wrappers are
+only installed while the profiler is enabled, so a disabled profiler costs nothing.
+"""
+
+from collections import OrderedDict
+import csv
+import json
+import os
+import tempfile
+import time as _time
+
+import numpy as np
+
+try:
+    from time import perf_counter
+except ImportError:
+    perf_counter = _time.time
+
+
+__author__ = "Aaron M. de Windt"
+
+
+STAT_NAMES = ("count", "mean", "p50", "p99", "max")
+
+
+class PhaseTimings(object):
+    """
+    Ring buffer with the last durations of a phase.
+
+    :param int capacity: Number of durations kept.
+    """
+
+    def __init__(self, capacity=1024):
+        self.samples = np.zeros((capacity,))
+        self.capacity = capacity
+        # Total number of durations added, including the ones overwritten.
+        self.count = 0
+
+    def add(self, duration):
+        self.samples[self.count % self.capacity] = duration
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    @property
+    def values(self):
+        """
+        The durations in the buffer, in no particular order.
+
+        :rtype: numpy_array
+        """
+        return self.samples[:min(self.count, self.capacity)]
+
+    def percentile(self, q):
+        """
+        Percentile of the durations in the buffer, nan if it's empty.
+
+        :param float q: Percentile in [0, 100].
+        :rtype: float
+        """
+        values = self.values
+        if len(values) == 0:
+            return np.nan
+        return float(np.percentile(values, q))
+
+    def histogram(self, bins=20, range=None):
+        """
+        Histogram of the durations in the buffer, see ``numpy.histogram``.
+
+        :return: Counts and bin edges.
+        :rtype: tuple
+        """
+        return np.histogram(self.values, bins=bins, range=range)
+
+    def stats(self):
+        """
+        Number of durations added and the mean, median, 99th percentile and maximum of the ones
+        in the buffer, in seconds.
+
+        :rtype: dict
+        """
+        values = self.values
+        if len(values) == 0:
+            return {"count": self.count, "mean": np.nan, "p50": np.nan, "p99": np.nan,
+                    "max": np.nan}
+        p50, p99 = np.percentile(values, [50, 99])
+        return {"count": self.count, "mean": float(values.mean()), "p50": float(p50),
+                "p99": float(p99), "max": float(values.max())}
+
+
+class FrameProfiler(object):
+    """
+    Times the phases of the frames.
+
+    Methods are added to a phase with :meth:`instrument`. While the profiler is enabled they are
+    replaced on their object by a wrapper that records how long every call takes. Phases that
+    are not a method call, like rendering, can be timed with :meth:`begin` and :meth:`end` or
+    with :meth:`record`.
+
+    When attached to a ShowBase with :meth:`attach`, the profiler also times the render task
+    and the whole frame, and refreshes the overlay and writes the periodic dumps while enabled.
+
+    :param int capacity: Number of durations kept per phase.
+    :param bool enabled: If True the profiler starts enabled.
+    """
+
+    def __init__(self, capacity=1024, enabled=False):
+        self.capacity = capacity
+        self.phases = OrderedDict()
+        self.__instrumented = []
+        self.__starts = {}
+        self.__enabled = False
+
+        self.pbase = None
+        self.overlay = None
+        self.dump_path = None
+        self.dump_interval = None
+        self.__last_dump = None
+        self.__last_frame = None
+        self.__tasks = []
+
+        if enabled:
+            self.enable()
+
+    @property
+    def enabled(self):
+        return self.__enabled
+
+    def phase(self, name):
+        """
+        Timings of a phase, created if needed.
+
+        :rtype: PhaseTimings
+        """
+        timings = self.phases.get(name)
+        if timings is None:
+            timings = self.phases[name] = PhaseTimings(self.capacity)
+        return timings
+
+    def instrument(self, obj, method_name, phase=None):
+        """
+        Times every call to a method of an object.
+
+        :param obj: Object with the method.
+        :param str method_name: Name of the method.
+        :param str phase: Name of the phase, by default the name of the method.
+        """
+        phase = phase or method_name
+        self.phase(phase)
+        self.__instrumented.append((obj, method_name, phase))
+        if self.__enabled:
+            self.__wrap(obj, method_name, phase)
+
+    def __wrap(self, obj, method_name, phase):
+        method = getattr(obj, method_name)
+        timings = self.phases[phase]
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timings.add(perf_counter() - start)
+
+        # Set on the instance, so it shadows the method of the class until it's deleted again.
+        setattr(obj, method_name, timed)
+
+    def enable(self):
+        if self.__enabled:
+            return
+        self.__enabled = True
+        for obj, method_name, phase in self.__instrumented:
+            self.__wrap(obj, method_name, phase)
+        if self.pbase is not None:
+            self.__add_tasks()
+        if self.overlay is not None:
+            self.overlay.show()
+
+    def disable(self):
+        if not self.__enabled:
+            return
+        self.__enabled = False
+        for obj, method_name, _ in self.__instrumented:
+            try:
+                delattr(obj, method_name)
+            except AttributeError:
+                pass
+        self.__remove_tasks()
+        self.__starts.clear()
+        if self.overlay is not None:
+            self.overlay.hide()
+
+    def toggle(self):
+        if self.__enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def begin(self, phase):
+        """
+        Starts timing a phase, it's recorded by the next call to :meth:`end`.
+        """
+        if self.__enabled:
+            self.__starts[phase] = perf_counter()
+
+    def end(self, phase):
+        start = self.__starts.pop(phase, None)
+        if start is not None:
+            self.record(phase, perf_counter() - start)
+
+    def record(self, phase, duration):
+        """
+        Adds the duration of a phase in seconds.
+        """
+        if self.__enabled:
+            self.phase(phase).add(duration)
+
+    def clear(self):
+        for timings in self.phases.values():
+            timings.clear()
+
+    def percentile(self, phase, q):
+        return self.phases[phase].percentile(q)
+
+    def p50(self, phase):
+        return self.phases[phase].percentile(50)
+
+    def p99(self, phase):
+        return self.phases[phase].percentile(99)
+
+    def stats(self):
+        """
+        Statistics of every phase, see :meth:`PhaseTimings.stats`.
+
+        :rtype: collections.OrderedDict
+        """
+        return OrderedDict((name, timings.stats()) for name, timings in self.phases.items())
+
+    def report(self):
+        """
+        Table with the median and 99th percentile of every phase in milliseconds.
+
+        :rtype: str
+        """
+        lines = ["{:16} {:>8} {:>8} {:>8}".format("phase", "count", "p50 ms", "p99 ms")]
+        for name, stats in self.stats().items():
+            lines.append("{:16} {:8d} {:8.3f} {:8.3f}".format(
+                name, stats["count"], stats["p50"] * 1e3, stats["p99"] * 1e3))
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """
+        Writes the statistics of every phase to a file.
+
+        A ``.csv`` file gets a row per phase appended to it, together with the wall clock time of
+        the dump, so the periodic dumps form a time series. Any other file is overwritten with
+        the statistics as JSON.
+
+        :param str path: Path of the file.
+        """
+        stats = self.stats()
+        if path.endswith(".csv"):
+            new = not os.path.exists(path)
+            with open(path, "a") as f:
+                writer = csv.writer(f)
+                if new:
+                    writer.writerow(("time", "phase") + STAT_NAMES)
+                now = _time.time()
+                for name, phase_stats in stats.items():
+                    writer.writerow([now, name] + [phase_stats[stat] for stat in STAT_NAMES])
+        else:
+            # Written to a temporary file first, so readers never see a partial dump.
+            directory = os.path.dirname(os.path.abspath(path))
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+            # Phases without durations have nan statistics, which aren't valid JSON.
+            phases = OrderedDict((name, {stat: None if value != value else value
+                                         for stat, value in phase_stats.items()})
+                                 for name, phase_stats in stats.items())
+            with os.fdopen(fd, "w") as f:
+                json.dump({"time": _time.time(), "phases": phases}, f, indent=2)
+            os.replace(tmp_path, path)
+
+    def attach(self, pbase, overlay=False, dump_path=None, dump_interval=5., font=None):
+        """
+        Times the render task and the whole frame of a ShowBase.
+
+        :param direct.showbase.ShowBase.ShowBase pbase: Main Panda3d ShowBase.
+        :param bool overlay: If True the statistics are shown on screen while enabled.
+        :param str dump_path: Optional file the statistics are dumped to, see :meth:`dump`.
+        :param float dump_interval: Wall clock time in seconds between the dumps.
+        :param font: Font of the overlay, preferably monospaced.
+        """
+        self.pbase = pbase
+        self.phase("render")
+        self.phase("frame")
+        if overlay:
+            self.overlay = ProfilerOverlay(self, pbase, font=font)
+            if not self.__enabled:
+                self.overlay.hide()
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        if self.__enabled:
+            self.__add_tasks()
+
+    def __add_tasks(self):
+        task_mgr = self.pbase.taskMgr
+        # igLoop, which renders the frame, has sort 50.
+        self.__tasks = [
+            task_mgr.add(self.__frame_task, "profiler_frame", sort=-100),
+            task_mgr.add(self.__render_begin_task, "profiler_render_begin", sort=49),
+            task_mgr.add(self.__render_end_task, "profiler_render_end", sort=51),
+        ]
+        self.__last_frame = None
+        self.__last_dump = perf_counter()
+
+    def __remove_tasks(self):
+        for task in self.__tasks:
+            task.remove()
+        self.__tasks = []
+
+    def __render_begin_task(self, task):
+        self.begin("render")
+        return task.cont
+
+    def __render_end_task(self, task):
+        self.end("render")
+        return task.cont
+
+    def __frame_task(self, task):
+        now = perf_counter()
+        if self.__last_frame is not None:
+            self.record("frame", now - self.__last_frame)
+        self.__last_frame = now
+
+        if self.overlay is not None:
+            self.overlay.update(now)
+        if self.dump_path is not None and now - self.__last_dump >= self.dump_interval:
+            self.__last_dump = now
+            self.dump(self.dump_path)
+        return task.cont
+
+
+class ProfilerOverlay(object):
+    """
+    On screen table with the median and 99th percentile of every phase.
+
+    :param FrameProfiler profiler: The profiler.
+    :param direct.showbase.ShowBase.ShowBase pbase: Main Panda3d ShowBase.
+    :param float interval: Wall clock time in seconds between updates of the text.
+    :param font: Font of the text, preferably monospaced.
+    """
+
+    def __init__(self, profiler, pbase, interval=0.5, font=None):
+        from direct.gui.OnscreenText import OnscreenText
+        from panda3d.core import TextNode
+
+        self.profiler = profiler
+        self.interval = interval
+        self.__last_update = None
+        self.text = OnscreenText(text="", style=1, fg=(1, 1, 0, 1), shadow=(0, 0, 0, 1),
+                                 parent=pbase.a2dTopRight, align=TextNode.ARight,
+                                 pos=(-0.08, -0.1), scale=.04, font=font, mayChange=True)
+
+    def update(self, now):
+        if self.__last_update is not None and now - self.__last_update < self.interval:
+            return
+        self.__last_update = now
+        self.text.setText(self.profiler.report())
+
+    def show(self):
+        self.__last_update = None
+        self.text.show()
+
+    def hide(self):
+        self.text.hide()
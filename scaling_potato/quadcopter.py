@@ -1,9 +1,8 @@
-from scipy.integrate import ode
+import os
+
 import numpy as np
-from math import pi
-from panda3d.core import WindowProperties, VBase3, LQuaternionf, Mat4, FrameBufferProperties
 from scaling_potato.pid_control import PIDControl
-from scaling_potato.scaling_potato_c import test_read_texture_from_memory, Camera
+from scaling_potato.transforms import RotationCache, to_body, to_inertial
 
 
 __author__ = "Aaron M. de Windt"
@@ -14,28 +13,117 @@ class Quadcopter(object):
     Object handling the quadcopter dynamics and simulated camera.
 
     :param list init_x: Initial position of the quadcopter.
-    :param direct.showbase.ShowBase.ShowBase pbase: Main Panda3d ShowBase
+    :param direct.showbase.ShowBase.ShowBase pbase: Main Panda3d ShowBase. If None the quadcopter
+                                                    is simulated headless, without model or cameras.
+    :param bool cameras: If False the front and bottom cameras are not created.
+    :param scaling_potato.readback.ReadbackPipeline readback: Optional pipeline the cameras are
+                                                              registered with for on demand
+                                                              readback of their images.
+    :param scaling_potato.atlas.CameraAtlas atlas: Optional atlas the cameras render into instead
+                                                   of their own texture buffers.
+    :param scaling_potato.scaling_potato_c.QuadcopterIntegrator native_integrator: Optional
+        native integrator used instead of SciPy's dopri5 to integrate the state.
     """
 
-    def __init__(self, init_x, pbase=None):
-        self.x = np.array(init_x)
-        self.v_i = np.array([0] * 3)
-        self.a_i = np.array([0] * 3)
-        self.q = np.array([0, 1, 0, 0])
-        self.omega = np.array([0]*3)
-        self.omega_dot = np.array([0]*3)
+    def __init__(self, init_x, pbase=None, cameras=True, readback=None, atlas=None,
+                 native_integrator=None):
+        # The state and its derivative live in preallocated buffers. The state variables and the
+        # inputs (a_i and omega_dot) are exposed as views into these so the integrator callback
+        # does not need to allocate any arrays.
+        self.__state = np.zeros((13,))
+        self.__state_dot = np.zeros((13,))
+        self.__x_dot = self.__state_dot[0:3]
+        self.__q_dot = self.__state_dot[6:10]
+        self.__prev_state = np.zeros((13,))
+
+        self.x = init_x
+        self.q = [1, 0, 0, 0]
 
         self.time = None
 
-        # Explicit runge-kutta method of order (4)5 due to Dormand & Prince
-        self.integrator = ode(self.rhs_equation).set_integrator('dopri5')
+        # SciPy is only imported when it integrates the state, see the integrator property.
+        self.__integrator = None
+        self.native_integrator = native_integrator
 
         self.pbase = pbase
+        self.readback = readback
+        self.atlas = atlas
+
+        # Create quadcopter node. Without a ShowBase it's only created when it's used, see the
+        # node_path property.
+        self.__node_path = None
+        self.__prev_state[:] = self.__state
+        if pbase is not None:
+            self.__node_path = pbase.render.attachNewNode("Quadcopter")
+            self.sync_node_path()
+
+        self.front_buffer = None
+        self.__front_image_camera = None
+        self.front_camera = None
+        self.front_readback = None
+        self.bottom_buffer = None
+        self.bottom_camera = None
+        self.bottom_readback = None
+        self.model = None
+
+        if pbase is not None:
+            if cameras:
+                self.create_cameras()
+
+            from scaling_potato.assets import shared_model_cache
+
+            # Load in quadcopter model
+            self.model = shared_model_cache(pbase).copy("models/plane.egg", self.node_path)
+            self.model.setH(90)
+            # self.model.setScale(1/8., 1/8., 1/8.)
+
+        self.error = None
+
+        self.v_pid = PIDControl(20.0, 10.0, 0.0)
+        self.omega_pid = PIDControl(5.0, 0.0, 0.0)
+
+        self.__rotation = RotationCache()
+
+    @property
+    def integrator(self):
+        """
+        SciPy's dopri5 integrator, created on first use so simulations with a native integrator
+        never import SciPy.
+        """
+        if self.__integrator is None:
+            from scipy.integrate import ode
+
+            # Explicit runge-kutta method of order (4)5 due to Dormand & Prince
+            self.__integrator = ode(self.rhs_equation).set_integrator('dopri5')
+        return self.__integrator
+
+    @property
+    def node_path(self):
+        """
+        Node of the quadcopter. Without a ShowBase it's not attached to any scene graph, it's only
+        used to keep track of the quadcopter's transformation.
+        """
+        if self.__node_path is None:
+            from panda3d.core import NodePath
+
+            self.__node_path = NodePath("Quadcopter")
+            self.sync_node_path()
+        return self.__node_path
+
+    def create_cameras(self):
+        """
+        Creates the front and bottom camera and their texture buffers. If the quadcopter has a
+        camera atlas, the cameras render into two of its tiles instead.
+        """
+        from panda3d.core import FrameBufferProperties
 
-        # Create quadcopter node.
-        self.node_path = pbase.render.attachNewNode("Quadcopter")
-        self.node_path.setPos(*self.x)
-        self.q = np.array(self.node_path.getQuat())
+        if self.atlas is not None:
+            self.front_readback = self.atlas.add_camera(self.node_path, "front_camera")
+            self.front_camera = self.front_readback.camera
+            self.bottom_readback = self.atlas.add_camera(self.node_path, "bottom_camera")
+            self.bottom_camera = self.bottom_readback.camera
+            self.pbase.accept("u", self.update_textures)
+            return
 
         # Configure front camera
         fb_prop = FrameBufferProperties()
@@ -44,18 +132,23 @@ class Quadcopter(object):
         fb_prop.setRgbaBits(8, 8, 8, 0)
         # fb_prop.setDepthBits(16)
 
-        self.front_buffer = self.pbase.win.makeTextureBuffer("front_buffer", 256, 256, to_ram=True, fbp=fb_prop)
+        # The images are not copied to RAM every frame, they are only read back on demand.
+        self.front_buffer = self.pbase.win.makeTextureBuffer("front_buffer", 256, 256, fbp=fb_prop)
         self.front_camera = self.pbase.makeCamera(self.front_buffer)
         self.front_camera.reparentTo(self.node_path)
 
         # self.front_camera.setH(-90)
 
         # Configure bottom camera
-        self.bottom_buffer = self.pbase.win.makeTextureBuffer("bottom_buffer", 256, 256)
+        self.bottom_buffer = self.pbase.win.makeTextureBuffer("bottom_buffer", 256, 256, fbp=fb_prop)
         self.bottom_camera = self.pbase.makeCamera(self.bottom_buffer)
         self.bottom_camera.reparentTo(self.node_path)
         # self.bottom_camera.setP(-90)
 
+        if self.readback is not None:
+            self.front_readback = self.readback.add_camera(self.front_buffer)
+            self.bottom_readback = self.readback.add_camera(self.bottom_buffer)
+
         self.pbase.accept("v", self.pbase.bufferViewer.toggleEnable)
         self.pbase.accept("V", self.pbase.bufferViewer.toggleEnable)
         self.pbase.bufferViewer.setPosition("llcorner")
@@ -63,26 +156,87 @@ class Quadcopter(object):
 
         self.pbase.accept("u", self.update_textures)
 
-        # Load in quadcopter model
-        self.model = pbase.loader.loadModel("models/plane.egg")
-        self.model.reparentTo(self.node_path)
-        self.model.setH(90)
-        # self.model.setScale(1/8., 1/8., 1/8.)
+    def extract_front_texture(self):
+        """
+        Synchronously copies the last front camera image to RAM. If the camera is registered with
+        a readback pipeline, the texture of the last frame it delivered is returned instead.
 
-        self.error = None
+        :return: The front camera texture.
+        :rtype: panda3d.core.Texture
+        """
+        if self.front_readback is not None and self.front_readback.latest is not None:
+            return self.front_readback.latest.texture
 
-        self.v_pid = PIDControl(20.0, 10.0, 0.0)
-        self.omega_pid = PIDControl(5.0, 0.0, 0.0)
+        texture = self.front_buffer.getTexture()
+        self.pbase.graphicsEngine.extractTextureData(texture, self.front_buffer.getGsg())
+        return texture
+
+    def record_cameras(self, path, compression="zlib"):
+        """
+        Starts recording the front and bottom camera images to the "front" and "bottom"
+        subdirectories of path. The cameras must be registered with a readback pipeline or atlas.
+
+        :param str path: Directory the recordings are written to.
+        :param str compression: "zlib" for lossless compression, None to store the frames raw.
+        :return: The front and bottom frame recorders, they must be closed when done.
+        :rtype: tuple
+        """
+        from scaling_potato.frame_store import FrameRecorder
+
+        if self.front_readback is None or self.bottom_readback is None:
+            raise ValueError("Recording the cameras requires a readback pipeline or camera atlas.")
+
+        recorders = []
+        for name, readback in (("front", self.front_readback), ("bottom", self.bottom_readback)):
+            recorder = FrameRecorder(os.path.join(path, name), compression)
+            readback.subscribe(recorder)
+            recorders.append(recorder)
+        return tuple(recorders)
+
+    def front_frame(self):
+        """
+        Latest front camera image as a NumPy array, without copying it.
 
-        self.__tmat_ib = Mat4()
+        The array has the shape (y_size, x_size, n_components) with the rows ordered top to bottom
+        and the channels in BGR(A) order. It's a read-only view on the texture's RAM image. The
+        image is read back synchronously, register a subscriber with :attr:`front_readback` to
+        receive the images without stalling the render loop.
+
+        With a camera atlas the last front camera image delivered by the atlas is returned, or None
+        if nothing was delivered yet.
+
+        :rtype: numpy_array
+        """
+        if self.atlas is not None:
+            frame = self.front_readback.latest
+            return None if frame is None else frame.image
+        return np.asarray(self.front_image_camera().set_texture(self.extract_front_texture()))
+
+    def front_image_camera(self):
+        # The extension is only needed when the camera images are used, so simulations without
+        # cameras don't depend on OpenCV being available.
+        if self.__front_image_camera is None:
+            from scaling_potato.scaling_potato_c import Camera
+            self.__front_image_camera = Camera()
+        return self.__front_image_camera
 
     def update_textures(self):
-        self.front_texture = self.front_buffer.get_texture()
-        self.ram_image = self.front_texture.getRamImage()
+        if self.front_readback is None:
+            self.show_texture(self.extract_front_texture())
+        else:
+            # With a camera atlas the texture holds all cameras, the frame image is the tile.
+            self.front_readback.subscribe(lambda frame: self.show_image(frame.image), once=True)
 
-        cam = Camera()
-        cam.set_image(self.ram_image.this, self.front_texture.getXSize(), self.front_texture.getYSize())
-        cam.show_image()
+    def show_texture(self, texture):
+        camera = self.front_image_camera()
+        camera.set_texture(texture)
+        camera.show_image()
+
+    def show_image(self, image):
+        """
+        Shows a camera image with the rows ordered top to bottom, e.g. a tile of an atlas.
+        """
+        self.front_image_camera().push_image(np.ascontiguousarray(image))
 
     def v_control(self, time, v_command):
         self.v_pid.command = v_command
@@ -97,104 +251,208 @@ class Quadcopter(object):
 
     @property
     def roll(self):
-        return self.node_path.getR()
+        return self.__rotation.hpr(self.q)[2]
 
     @property
     def pitch(self):
-        return self.node_path.getP()
+        return self.__rotation.hpr(self.q)[1]
 
     @property
     def yaw(self):
-        return self.node_path.getH()
+        return self.__rotation.hpr(self.q)[0]
 
     @property
     def tmat_ib(self):
-        return self.node_path.getMat()
+        """
+        Transformation matrix from the body to the inertial frame. It's cached and only
+        recomputed when the quaternion changes.
+        """
+        return self.__rotation.tmat_ib(self.q)
 
     @property
     def tmat_bi(self):
-        self.__tmat_ib.invertFrom(self.node_path.getMat())
-        return self.__tmat_ib
+        return self.tmat_ib.T
 
     @property
     def v_b(self):
-        return np.array(self.tmat_bi.xformVec(VBase3(*self.v_i)))
+        return to_body(self.tmat_ib, self.v_i)
 
     @v_b.setter
     def v_b(self, value):
-        self.v_i = np.array(self.tmat_ib.xformVec(VBase3(*value)))
+        to_inertial(self.tmat_ib, value, out=self.v_i)
 
     @property
     def a_b(self):
-        return np.array(self.tmat_bi.xformVec(VBase3(*self.a_i)))
+        return to_body(self.tmat_ib, self.a_i)
 
     @a_b.setter
     def a_b(self, value):
-        self.a_i = np.array(self.tmat_ib.xformVec(VBase3(*value)))
+        to_inertial(self.tmat_ib, value, out=self.a_i)
+
+    @property
+    def x(self):
+        return self.__state[0:3]
+
+    @x.setter
+    def x(self, value):
+        self.__state[0:3] = value
+
+    @property
+    def v_i(self):
+        return self.__state[3:6]
+
+    @v_i.setter
+    def v_i(self, value):
+        self.__state[3:6] = value
+
+    @property
+    def q(self):
+        return self.__state[6:10]
+
+    @q.setter
+    def q(self, value):
+        self.__state[6:10] = value
+
+    @property
+    def omega(self):
+        return self.__state[10:13]
+
+    @omega.setter
+    def omega(self, value):
+        self.__state[10:13] = value
+
+    @property
+    def a_i(self):
+        return self.__state_dot[3:6]
+
+    @a_i.setter
+    def a_i(self, value):
+        self.__state_dot[3:6] = value
+
+    @property
+    def omega_dot(self):
+        return self.__state_dot[10:13]
+
+    @omega_dot.setter
+    def omega_dot(self, value):
+        self.__state_dot[10:13] = value
 
     @property
     def state_vector(self):
-        state_vector = np.append([], self.x)
-        state_vector = np.append(state_vector, self.v_i)
-        state_vector = np.append(state_vector, self.q)
-        state_vector = np.append(state_vector, self.omega)
-        return state_vector
+        """
+        Property with the state vector. This is the internal buffer, not a copy.
+        """
+        return self.__state
 
     @state_vector.setter
     def state_vector(self, value):
-        self.x = value[:3]
-        self.v_i = value[3:6]
-        self.q = value[6:10]
-        self.omega = value[10:]
+        self.__state[:] = value
 
     @property
     def state_vector_dot(self):
         """
-        Property with the state vector that's passed to the integrator.
+        Property with the derivative of the state vector that's passed to the integrator.
+        This is the internal buffer, not a copy.
         """
-        state_vector = np.append([], self.v_i)
-        state_vector = np.append(state_vector, self.a_i)
-        state_vector = np.append(state_vector, omega2qdot(self.omega, self.q))
-        state_vector = np.append(state_vector, self.omega_dot)
-        return state_vector
+        return self.derivative(self.__state)
 
     def step(self, time):
-        if self.time is None:
+        """
+        Integrates the state to the given time.
+
+        The scene graph is not touched, call :meth:`sync_node_path` before rendering.
+
+        :param float time: Simulation time to integrate to.
+        """
+        self.__prev_state[:] = self.__state
+        if self.native_integrator is not None:
+            # Integrates the state buffer in place, with the inputs held constant.
+            if self.time is not None:
+                self.native_integrator.integrate(self.__state, self.a_i, self.omega_dot, self.time,
+                                                 time)
+            self.time = time
+        elif self.time is None:
             self.integrator.set_initial_value(self.state_vector, time)
             self.time = time
         else:
             self.integrator.integrate(time)
             self.time = self.integrator.t
-            self.state_vector = self.integrator.y
+            self.__state[:] = self.integrator.y
 
-        self.node_path.setPos(*self.x)
-        self.node_path.setQuat(LQuaternionf(*self.q))
+    def interpolated_pose(self, alpha):
+        """
+        Position and attitude interpolated between the state before and after the last step.
+
+        :param float alpha: Interpolation factor, 0 gives the previous and 1 the current pose.
+        :return: Tuple with the position and quaternion.
+        :rtype: tuple
+        """
+        prev_x = self.__prev_state[0:3]
+        prev_q = self.__prev_state[6:10]
+        x = prev_x + alpha * (self.x - prev_x)
+
+        # Normalized linear interpolation along the shortest arc.
+        q = self.q
+        if np.dot(prev_q, q) < 0:
+            q = -q
+        q = prev_q + alpha * (q - prev_q)
+        q /= np.linalg.norm(q)
+        return x, q
+
+    def sync_node_path(self, alpha=1.0):
+        """
+        Moves the node path to the pose interpolated between the last two steps.
+
+        :param float alpha: Interpolation factor, 0 gives the previous and 1 the current pose.
+        """
+        x, q = self.interpolated_pose(alpha)
+        self.node_path.setPos(*x)
+        self.node_path.setQuat(tuple(q.tolist()))
 
     def rhs_equation(self, t, y):
-        self.state_vector = y
-        return self.state_vector_dot
+        return self.derivative(y)
+
+    def derivative(self, y):
+        """
+        Fills the derivative buffer for the state vector y in place.
+
+        :param numpy_array y: State vector, it's not written back to the quadcopter state.
+        :return: The derivative buffer.
+        :rtype: numpy_array
+        """
+        self.__x_dot[:] = y[3:6]
+        omega2qdot(y[10:13], y[6:10], out=self.__q_dot)
+        return self.__state_dot
 
 
-def omega2qdot(omega, quat, K=1.0):
+def omega2qdot(omega, quat, K=1.0, out=None):
     """Converts Rotational Rates (omega) to Quaternion rates
 
-    :param omega: Rotational Rate column vector
+    :param omega: Rotational Rate vector
     :type omega: numpy_array
-    :param q: Quaternions column vector
-    :type q: numpy_array
+    :param quat: Quaternions vector
+    :type quat: numpy_array
+    :param out: Optional array with 4 elements the quaternion rates are written into.
+    :type out: numpy_array
     :return: Quaternion Rates
     :rtype: numpy_array
     """
+    if out is None:
+        out = np.empty((4,))
 
     p = omega[0]
     q = omega[1]
     r = omega[2]
+    q0 = quat[0]
+    q1 = quat[1]
+    q2 = quat[2]
+    q3 = quat[3]
 
-    e = K * (1-(quat[0] * quat[0] + quat[1] * quat[1] + quat[2] * quat[2] + quat[3] * quat[3]))
+    e = K * (1-(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3))
 
-    qdot = 0.5*np.array([[e*quat[0] - p*quat[1] - q*quat[2] - r*quat[3]],
-                         [p*quat[0] + e*quat[1] + r*quat[2] - q*quat[3]],
-                         [q*quat[0] - r*quat[1] + e*quat[2] + p*quat[3]],
-                         [r*quat[0] + q*quat[1] - p*quat[2] + e*quat[3]]])
+    out[0] = 0.5 * (e*q0 - p*q1 - q*q2 - r*q3)
+    out[1] = 0.5 * (p*q0 + e*q1 + r*q2 - q*q3)
+    out[2] = 0.5 * (q*q0 - r*q1 + e*q2 + p*q3)
+    out[3] = 0.5 * (r*q0 + q*q1 - p*q2 + e*q3)
 
-    return qdot
\ No newline at end of file
+    return out
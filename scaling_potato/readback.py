@@ -0,0 +1,165 @@
+import numpy as np
+from panda3d.core import GraphicsOutput, Texture, ClockObject
+
+
+__author__ = "Aaron M. de Windt"
+
+
+def ram_image_array(texture, flip=True):
+    """
+    NumPy view of a texture's RAM image, without copying it.
+
+    :param panda3d.core.Texture texture: Texture with a RAM image.
+    :param bool flip: If True the rows are ordered top to bottom, Panda3d stores them bottom to
+                      top.
+    :return: Read-only (y_size, x_size, n_components) uint8 array with the channels in BGR(A)
+             order.
+    :rtype: numpy_array
+    """
+    image = np.frombuffer(memoryview(texture.getRamImage()), dtype=np.uint8)
+    image = image.reshape(texture.getYSize(), texture.getXSize(), texture.getNumComponents())
+    return image[::-1] if flip else image
+
+
+class ReadbackFrame(object):
+    """
+    Frame delivered by a :class:`CameraReadback` to its subscribers.
+
+    The image is a view on the texture's RAM image. It stays valid until the next copy into the
+    texture, which is the next frame at the earliest. Subscribers that need the image for longer
+    have to copy it.
+    """
+
+    __slots__ = ("camera", "texture", "image", "frame_number", "time")
+
+    def __init__(self, camera, texture, image, frame_number, time):
+        self.camera = camera
+        self.texture = texture
+        self.image = image
+        self.frame_number = frame_number
+        self.time = time
+
+
+class CameraReadback(object):
+    """
+    On demand, rate limited readback of the images rendered into a texture buffer.
+
+    The buffer renders into a single texture attached with ``RTMTriggeredCopyRam``, so it's
+    only copied to RAM in the frames a copy was triggered for. A copy is only triggered when the
+    camera has subscribers and the time since the last copy is at least ``1 / rate``. The copy
+    itself is synchronous, it's made at the end of the next rendered frame, and the image is
+    delivered by the update after that frame.
+
+    :param panda3d.core.GraphicsOutput buffer: Buffer the camera renders into.
+    :param float rate: Maximum number of frames read back per second, None for every frame.
+    """
+
+    def __init__(self, buffer, rate=None):
+        self.buffer = buffer
+        self.rate = rate
+        self.texture = buffer.getTexture() or Texture()
+
+        self.subscribers = []
+        # Number of the frame whose copy was triggered.
+        self.pending = None
+        self.last_trigger_time = None
+        self.latest = None
+
+        self.n_triggered = 0
+        self.n_delivered = 0
+
+        # Attached once, changing the render targets of a buffer every frame is expensive.
+        self.buffer.clearRenderTextures()
+        self.buffer.addRenderTexture(self.texture, GraphicsOutput.RTMTriggeredCopyRam)
+
+    @property
+    def active(self):
+        return len(self.subscribers) > 0
+
+    def subscribe(self, callback, once=False):
+        """
+        Adds a callback that's called with a :class:`ReadbackFrame` for every frame read back.
+
+        :param callback: Callable taking a single ReadbackFrame argument.
+        :param bool once: If True the callback is removed after the first frame.
+        """
+        self.subscribers.append((callback, once))
+
+    def unsubscribe(self, callback):
+        self.subscribers = [(c, once) for c, once in self.subscribers if c != callback]
+
+    def due(self, time):
+        if not self.active:
+            return False
+        if self.rate is None or self.last_trigger_time is None:
+            return True
+        return time - self.last_trigger_time >= 1. / self.rate
+
+    def update(self, frame_number, time):
+        """
+        Delivers the frame whose copy was made while rendering the last frame and triggers the
+        next copy if it's due. Must be called once per frame, after the frame was rendered.
+
+        :param int frame_number: Number of the frame that was just rendered.
+        :param float time: Time of the frame that was just rendered.
+        """
+        if self.pending is not None and frame_number >= self.pending:
+            self.pending = None
+            if self.texture.hasRamImage():
+                # The copy was made while rendering this frame.
+                self.deliver(ReadbackFrame(self, self.texture, ram_image_array(self.texture),
+                                           frame_number, time))
+
+        if self.due(time):
+            self.buffer.triggerCopy()
+            self.pending = frame_number + 1
+            self.last_trigger_time = time
+            self.n_triggered += 1
+
+    def deliver(self, frame):
+        self.latest = frame
+        self.n_delivered += 1
+        subscribers = self.subscribers
+        self.subscribers = [(callback, once) for callback, once in subscribers if not once]
+        for callback, once in subscribers:
+            callback(frame)
+
+
+class ReadbackPipeline(object):
+    """
+    Updates the readback of all registered cameras once per frame, right after rendering.
+
+    :param direct.showbase.ShowBase.ShowBase pbase: Main Panda3d ShowBase.
+    :param int sort: Sort of the readback task, it must run after igLoop (sort 50).
+    """
+
+    def __init__(self, pbase, sort=55):
+        self.pbase = pbase
+        self.cameras = []
+        self.task = pbase.taskMgr.add(self.update_task, "readback_pipeline", sort=sort)
+
+    def add_camera(self, buffer, rate=None):
+        """
+        Registers the buffer of a camera.
+
+        :param panda3d.core.GraphicsOutput buffer: Buffer the camera renders into.
+        :param float rate: Maximum number of frames read back per second, None for every frame.
+        :rtype: CameraReadback
+        """
+        camera = CameraReadback(buffer, rate)
+        self.cameras.append(camera)
+        return camera
+
+    def remove_camera(self, camera):
+        self.cameras.remove(camera)
+
+    def update(self):
+        clock = ClockObject.getGlobalClock()
+        frame_number = clock.getFrameCount()
+        time = clock.getFrameTime()
+        for camera in self.cameras:
+            camera.update(frame_number, time)
+
+    def update_task(self, task):
+        self.update()
+        return task.cont
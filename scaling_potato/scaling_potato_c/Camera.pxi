@@ -1,23 +1,226 @@
-cdef extern from "Camera.h":
+
+
+cdef extern from "Camera.h" nogil:
     cdef cppclass _Camera "Camera":
-        _Camera()
+        _Camera(size_t max_queue_size)
 
         void set_image(long pointer, unsigned int x_size, unsigned int y_size)
+        void set_buffer(uint8_t *data, unsigned int x_size, unsigned int y_size, unsigned int n_components)
         bool is_set()
         void show_image()
+        bool push_frame(const uint8_t *data, unsigned int x_size, unsigned int y_size, unsigned int n_components, bool flip)
+        void start()
+        void stop()
+        size_t queue_depth()
+        uint64_t dropped_frames()
+        uint64_t processed_frames()
+
+
+cdef class Frame:
+    """
+    Zero-copy view of the RAM image of a Panda3d texture.
+
+    The frame exposes the image through the buffer protocol as a read-only (y_size, x_size,
+    n_components) array of bytes, so ``numpy.asarray(frame)`` or ``memoryview(frame)`` give
+    access to the pixels without copying them. Panda3d stores the rows bottom to top, if
+    ``flip`` is True the view is vertically flipped using a negative row stride so the first
+    row is the top of the image. The channels are in BGR(A) order.
+
+    The frame holds a reference to the texture's PointerToArray, so the memory stays valid for
+    as long as the frame or any array created from it is alive, even after Panda3d replaced the
+    texture's RAM image with a newer one.
+
+    :param texture: panda3d.core.Texture with a RAM image.
+    :param bool flip: If True the rows are ordered top to bottom.
+    """
+    cdef object ram_image
+    cdef Py_buffer source
+    cdef bint has_source
+    cdef Py_ssize_t shape[3]
+    cdef Py_ssize_t strides[3]
+
+    cdef readonly unsigned int x_size
+    cdef readonly unsigned int y_size
+    cdef readonly unsigned int n_components
+    cdef readonly Py_ssize_t row_stride
+    cdef readonly bint flipped
+
+    def __cinit__(self, texture, bint flip=True):
+        self.has_source = False
+        if texture.getComponentWidth() != 1:
+            raise ValueError("Only textures with 8 bit components are supported.")
+
+        self.ram_image = texture.getRamImage()
+        self.x_size = texture.getXSize()
+        self.y_size = texture.getYSize()
+        self.n_components = texture.getNumComponents()
+        self.row_stride = self.x_size * self.n_components
+        self.flipped = flip
+
+        PyObject_GetBuffer(self.ram_image, &self.source, PyBUF_SIMPLE)
+        self.has_source = True
+
+        if self.source.len < self.row_stride * self.y_size:
+            raise ValueError("The texture's RAM image is smaller than its size.")
+
+        self.shape[0] = self.y_size
+        self.shape[1] = self.x_size
+        self.shape[2] = self.n_components
+        self.strides[0] = -self.row_stride if flip else self.row_stride
+        self.strides[1] = self.n_components
+        self.strides[2] = 1
+
+    def __dealloc__(self):
+        if self.has_source:
+            PyBuffer_Release(&self.source)
+
+    cdef uint8_t *data(self):
+        """
+        Pointer to the first byte of the image as stored by Panda3d, bottom row first.
+        """
+        return <uint8_t *>self.source.buf
+
+    cdef uint8_t *first_row(self):
+        """
+        Pointer to the first row of the exposed view.
+        """
+        if self.flipped:
+            return self.data() + (self.y_size - 1) * self.row_stride
+        return self.data()
+
+    @property
+    def pointer(self):
+        """
+        Address of the image data as stored by Panda3d, bottom row first.
+        """
+        return <uintptr_t>self.data()
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        if flags & PyBUF_WRITABLE:
+            raise BufferError("Frames are read-only.")
+        if self.flipped and (flags & PyBUF_STRIDES) != PyBUF_STRIDES:
+            raise BufferError("Flipped frames can only be exported with strides.")
+
+        buffer.buf = self.first_row()
+        buffer.obj = self
+        buffer.len = self.row_stride * self.y_size
+        buffer.readonly = 1
+        buffer.itemsize = 1
+        buffer.format = NULL
+        if flags & PyBUF_FORMAT:
+            buffer.format = b"B"
+        buffer.ndim = 3
+        buffer.shape = self.shape
+        buffer.strides = self.strides
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        pass
+
 
 cdef class Camera:
+    """
+    Camera image display running on its own worker thread.
+
+    Frames are copied into a bounded queue that's emptied by the worker thread, which displays
+    them in an OpenCV window. When the worker falls behind the oldest queued frames are dropped,
+    so showing a frame never blocks the caller. The GIL is released while frames are copied and
+    queued.
+
+    :param int max_queue_size: Number of frames that may wait for the worker thread.
+    """
     cdef _Camera *_thisptr
+    cdef readonly Frame frame
 
-    def __cinit__(self):
-        self._thisptr = new _Camera()
+    def __cinit__(self, size_t max_queue_size=2):
+        self._thisptr = new _Camera(max_queue_size)
 
     def __dealloc__(self):
-        del self._thisptr
+        # Joins the worker thread.
+        with nogil:
+            del self._thisptr
+
+    @property
+    def queue_depth(self):
+        """
+        Number of frames waiting for the worker thread.
+        """
+        return self._thisptr.queue_depth()
+
+    @property
+    def dropped_frames(self):
+        """
+        Number of frames dropped because the worker thread fell behind.
+        """
+        return self._thisptr.dropped_frames()
+
+    @property
+    def processed_frames(self):
+        """
+        Number of frames handled by the worker thread.
+        """
+        return self._thisptr.processed_frames()
+
+    cpdef bool push_frame(self, Frame frame):
+        """
+        Queues a copy of the frame for the worker thread.
+
+        :return: False if an older frame was dropped to make room for it.
+        """
+        cdef bool queued
+        cdef uint8_t *data = frame.data()
+        cdef unsigned int x_size = frame.x_size
+        cdef unsigned int y_size = frame.y_size
+        cdef unsigned int n_components = frame.n_components
+        with nogil:
+            queued = self._thisptr.push_frame(data, x_size, y_size, n_components, True)
+        return queued
+
+    cpdef bool push_image(self, image):
+        """
+        Queues a copy of an image for the worker thread, e.g. a tile of a camera atlas.
+
+        :param image: C-contiguous (y_size, x_size, n_components) uint8 array with the rows
+                      ordered top to bottom.
+        :return: False if an older frame was dropped to make room for it.
+        """
+        cdef bool queued
+        cdef const uint8_t[:, :, ::1] view = image
+        cdef unsigned int x_size = view.shape[1]
+        cdef unsigned int y_size = view.shape[0]
+        cdef unsigned int n_components = view.shape[2]
+        with nogil:
+            queued = self._thisptr.push_frame(&view[0, 0, 0], x_size, y_size, n_components, False)
+        return queued
+
+    cpdef stop(self):
+        """
+        Stops the worker thread, it's restarted by the next frame.
+        """
+        with nogil:
+            self._thisptr.stop()
 
     cpdef void set_image(self, long pointer, unsigned int x_size, unsigned int y_size):
+        self.frame = None
         self._thisptr.set_image(pointer, x_size, y_size)
 
-    cpdef show_image(self):
-        self._thisptr.show_image() 
+    cpdef Frame set_texture(self, texture, bint flip=True):
+        """
+        Sets the camera image to the RAM image of the texture without copying it.
 
+        :param texture: panda3d.core.Texture with a RAM image.
+        :param bool flip: If True the rows of the returned frame are ordered top to bottom.
+        :return: Zero-copy frame with the texture's image.
+        """
+        cdef Frame frame = Frame(texture, flip)
+        self.frame = frame
+        self._thisptr.set_buffer(frame.data(), frame.x_size, frame.y_size, frame.n_components)
+        return frame
+
+    cpdef show_image(self):
+        """
+        Queues a copy of the current image for display, without waiting for the display.
+        """
+        with nogil:
+            self._thisptr.show_image()
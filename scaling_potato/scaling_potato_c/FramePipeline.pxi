@@ -0,0 +1,179 @@
+
+
+cdef extern from "opencv2/imgproc/imgproc.hpp":
+    enum:
+        CV_COLOR_BGR2GRAY "cv::COLOR_BGR2GRAY"
+        CV_COLOR_BGR2HSV "cv::COLOR_BGR2HSV"
+        CV_COLOR_BGRA2BGR "cv::COLOR_BGRA2BGR"
+        CV_COLOR_BGRA2GRAY "cv::COLOR_BGRA2GRAY"
+
+
+COLOR_BGR2GRAY = CV_COLOR_BGR2GRAY
+COLOR_BGR2HSV = CV_COLOR_BGR2HSV
+COLOR_BGRA2BGR = CV_COLOR_BGRA2BGR
+COLOR_BGRA2GRAY = CV_COLOR_BGRA2GRAY
+
+
+cdef extern from "FramePipeline.h" nogil:
+    cdef struct FrameInput:
+        const uint8_t *data
+        uint32_t x_size
+        uint32_t y_size
+        uint32_t n_components
+        size_t row_stride
+        bool flip
+
+    cdef struct Blob:
+        float x
+        float y
+        float area
+        float width
+        float height
+
+    cdef cppclass FrameResult:
+        vector[Blob] blobs
+        double scale_x
+        double scale_y
+        const uint8_t *image_data()
+        int image_rows()
+        int image_cols()
+        int image_channels()
+        size_t image_step()
+
+    cdef cppclass _FramePipeline "FramePipeline":
+        _FramePipeline(size_t n_threads) except +
+        void add_convert_color(int code) except +
+        void add_resize(double scale) except +
+        void add_color_blobs(const vector[double] &lower, const vector[double] &upper, double min_area) except +
+        size_t n_stages()
+        size_t n_threads()
+        void process(const vector[FrameInput] &inputs, vector[FrameResult] &results) except +
+
+
+cdef class FramePipeline:
+    """
+    Pipeline of native image processing stages, run on many camera frames across a thread pool.
+
+    The stages are run in the order they were added. Every call to :meth:`process` divides the
+    frames over the worker threads with the GIL released. The input frames are not copied or
+    modified.
+
+    :param int n_threads: Number of worker threads, 0 for one per hardware thread.
+    """
+    cdef _FramePipeline *_thisptr
+
+    def __cinit__(self, size_t n_threads=0):
+        self._thisptr = new _FramePipeline(n_threads)
+
+    def __dealloc__(self):
+        # Joins the worker threads.
+        with nogil:
+            del self._thisptr
+
+    @property
+    def n_stages(self):
+        return self._thisptr.n_stages()
+
+    @property
+    def n_threads(self):
+        return self._thisptr.n_threads()
+
+    def add_convert_color(self, int code):
+        """
+        Adds a colour conversion stage, code is one of the COLOR_* constants.
+        """
+        self._thisptr.add_convert_color(code)
+
+    def add_resize(self, double scale):
+        """
+        Adds a stage scaling the image by the given factor.
+        """
+        self._thisptr.add_resize(scale)
+
+    def add_color_blobs(self, lower, upper, double min_area=0.):
+        """
+        Adds a stage finding the connected regions with all channels within [lower, upper].
+
+        The blobs are returned by :meth:`process` as rows with the centroid x and y, the area,
+        the width and the height, all in pixels of the input frame.
+        """
+        self._thisptr.add_color_blobs([float(value) for value in lower],
+                                      [float(value) for value in upper], min_area)
+
+    def process(self, frames, bint return_images=False):
+        """
+        Runs the stages on all frames.
+
+        :param frames: List of :class:`Frame` objects or (y_size, x_size, n_components) uint8
+                       arrays with contiguous pixels. Rows may be in either direction.
+        :param bool return_images: If True the images after the last stage are returned too.
+        :return: List with a (n_blobs, 5) float32 array for every frame, or a tuple with that list
+                 and a list of the output images if return_images is True.
+        """
+        cdef vector[FrameInput] inputs
+        cdef vector[FrameResult] results
+        cdef FrameInput frame_input
+        cdef Frame frame
+        cdef const uint8_t[:, :, :] view
+        cdef size_t i, row
+        cdef size_t n_blobs
+        cdef float[:, ::1] blobs_view
+        cdef uint8_t[:, :, ::1] image_view
+
+        # Keeps the buffers of the frames alive while the worker threads read them.
+        keep_alive = []
+        inputs.reserve(len(frames))
+        for item in frames:
+            if isinstance(item, Frame):
+                frame = item
+                frame_input.data = frame.data()
+                frame_input.x_size = frame.x_size
+                frame_input.y_size = frame.y_size
+                frame_input.n_components = frame.n_components
+                frame_input.row_stride = frame.row_stride
+                frame_input.flip = frame.flipped
+            else:
+                view = item
+                if view.strides[2] != 1 or view.strides[1] != view.shape[2]:
+                    raise ValueError("The pixels of a frame must be contiguous.")
+                frame_input.x_size = view.shape[1]
+                frame_input.y_size = view.shape[0]
+                frame_input.n_components = view.shape[2]
+                if view.strides[0] < 0:
+                    # Vertically flipped view, pass the rows in memory order and flip them back.
+                    frame_input.data = &view[view.shape[0] - 1, 0, 0]
+                    frame_input.row_stride = -view.strides[0]
+                    frame_input.flip = True
+                else:
+                    frame_input.data = &view[0, 0, 0]
+                    frame_input.row_stride = view.strides[0]
+                    frame_input.flip = False
+            keep_alive.append(item)
+            inputs.push_back(frame_input)
+
+        with nogil:
+            self._thisptr.process(inputs, results)
+
+        blobs = []
+        images = []
+        for i in range(results.size()):
+            n_blobs = results[i].blobs.size()
+            frame_blobs = np.empty((n_blobs, 5), dtype=np.float32)
+            if n_blobs > 0:
+                blobs_view = frame_blobs
+                memcpy(&blobs_view[0, 0], results[i].blobs.data(), n_blobs * sizeof(Blob))
+            blobs.append(frame_blobs)
+
+            if return_images:
+                image = np.empty((results[i].image_rows(), results[i].image_cols(),
+                                  results[i].image_channels()), dtype=np.uint8)
+                if image.size > 0:
+                    image_view = image
+                    for row in range(<size_t>results[i].image_rows()):
+                        memcpy(&image_view[row, 0, 0], results[i].image_data() + row * results[i].image_step(),
+                               image.shape[1] * image.shape[2])
+                images.append(image)
+
+        if return_images:
+            return blobs, images
+        return blobs
@@ -0,0 +1,180 @@
+
+
+cdef extern from "Integrator.h" nogil:
+    enum:
+        METHOD_RK4
+        METHOD_DOPRI5
+
+    void quadcopter_derivative(const double *state, const double *a_i, const double *omega_dot,
+                               size_t n, double K, double *state_dot)
+
+    cdef cppclass _QuadcopterIntegrator "QuadcopterIntegrator":
+        _QuadcopterIntegrator(int method, bool adaptive, double max_step, double rtol, double atol,
+                              size_t max_steps, double K) except +
+        bool integrate(double *state, const double *a_i, const double *omega_dot, size_t n,
+                       double t0, double t1)
+        int method
+        bool adaptive
+        double max_step
+        double rtol
+        double atol
+        size_t max_steps
+        double K
+        size_t n_accepted
+        size_t n_rejected
+        double next_step
+
+
+cdef _as_rows(array, size_t n_columns, name):
+    """
+    View of the array as (n, n_columns) rows. The array must be C contiguous float64.
+    """
+    if not isinstance(array, np.ndarray) or array.dtype != np.float64 or \
+            not array.flags.c_contiguous:
+        raise ValueError("{} must be a C contiguous float64 array.".format(name))
+    if array.size % n_columns != 0:
+        raise ValueError("{} must have a multiple of {} elements.".format(name, n_columns))
+    return array.reshape(-1, n_columns)
+
+
+def quadcopter_state_derivative(state, a_i, omega_dot, double K=1.0):
+    """
+    Derivative of the quadcopter states, the same as ``Quadcopter.rhs_equation``.
+
+    :param numpy_array state: (13,) or (N, 13) C contiguous float64 states.
+    :param numpy_array a_i: (3,) or (N, 3) inertial accelerations.
+    :param numpy_array omega_dot: (3,) or (N, 3) rotational accelerations.
+    :rtype: numpy_array
+    """
+    cdef double[:, ::1] state_view = _as_rows(state, 13, "state")
+    cdef double[:, ::1] a_i_view = _as_rows(a_i, 3, "a_i")
+    cdef double[:, ::1] omega_dot_view = _as_rows(omega_dot, 3, "omega_dot")
+    cdef size_t n = state_view.shape[0]
+    if a_i_view.shape[0] != n or omega_dot_view.shape[0] != n:
+        raise ValueError("The states and inputs must be given for the same number of vehicles.")
+
+    state_dot = np.empty_like(state)
+    cdef double[:, ::1] state_dot_view = state_dot.reshape(-1, 13)
+    if n > 0:
+        with nogil:
+            quadcopter_derivative(&state_view[0, 0], &a_i_view[0, 0], &omega_dot_view[0, 0], n, K,
+                                  &state_dot_view[0, 0])
+    return state_dot
+
+
+cdef class QuadcopterIntegrator:
+    """
+    Native Runge-Kutta integrator of the quadcopter dynamics, including the quaternion
+    kinematics of ``omega2qdot``.
+
+    The states of any number of vehicles are integrated in place in a C contiguous (N, 13) array,
+    with the inertial and rotational accelerations held constant over the interval. The GIL is
+    released during the integration.
+
+    With a fixed step the interval is divided in equal steps of at most ``dt``. With an adaptive
+    step, only available for "dopri5", the step size is controlled on the error estimate of the
+    embedded 4th order solution like SciPy's ``ode('dopri5')``, and ``dt`` is the maximum step
+    size, 0 for no limit.
+
+    :param str method: "rk4" for the classic 4th order Runge-Kutta method, "dopri5" for
+                       Dormand-Prince 5(4).
+    :param bool adaptive: If True the step size is adaptive.
+    :param float dt: Fixed step size, or the maximum step size of the adaptive method.
+    :param float rtol: Relative tolerance of the adaptive method.
+    :param float atol: Absolute tolerance of the adaptive method.
+    :param int max_steps: Maximum number of adaptive steps per call.
+    :param float K: Gain of the quaternion normalisation term.
+    """
+    cdef _QuadcopterIntegrator *_thisptr
+
+    def __cinit__(self, method="dopri5", bint adaptive=True, double dt=0., double rtol=1e-6,
+                  double atol=1e-12, size_t max_steps=500, double K=1.0):
+        cdef int method_id
+        if method == "rk4":
+            method_id = METHOD_RK4
+        elif method == "dopri5":
+            method_id = METHOD_DOPRI5
+        else:
+            raise ValueError("Unknown integration method '{}'.".format(method))
+        self._thisptr = new _QuadcopterIntegrator(method_id, adaptive, dt, rtol, atol, max_steps, K)
+
+    def __dealloc__(self):
+        del self._thisptr
+
+    @property
+    def method(self):
+        return "rk4" if self._thisptr.method == METHOD_RK4 else "dopri5"
+
+    @property
+    def adaptive(self):
+        return self._thisptr.adaptive
+
+    @property
+    def dt(self):
+        return self._thisptr.max_step
+
+    @property
+    def rtol(self):
+        return self._thisptr.rtol
+
+    @property
+    def atol(self):
+        return self._thisptr.atol
+
+    @property
+    def max_steps(self):
+        return self._thisptr.max_steps
+
+    @property
+    def K(self):
+        return self._thisptr.K
+
+    @property
+    def n_accepted(self):
+        """
+        Number of steps taken by the last call to :meth:`integrate`.
+        """
+        return self._thisptr.n_accepted
+
+    @property
+    def n_rejected(self):
+        """
+        Number of adaptive steps rejected by the last call to :meth:`integrate`.
+        """
+        return self._thisptr.n_rejected
+
+    @property
+    def next_step(self):
+        """
+        Step size the next adaptive integration starts with.
+        """
+        return self._thisptr.next_step
+
+    def integrate(self, state, a_i, omega_dot, double t0, double t1):
+        """
+        Integrates the states in place from t0 to t1.
+
+        :param numpy_array state: (13,) or (N, 13) C contiguous float64 states.
+        :param numpy_array a_i: (3,) or (N, 3) C contiguous float64 inertial accelerations.
+        :param numpy_array omega_dot: (3,) or (N, 3) C contiguous float64 rotational accelerations.
+        :param float t0: Time of the current states.
+        :param float t1: Time to integrate to.
+        :return: The states.
+        """
+        cdef double[:, ::1] state_view = _as_rows(state, 13, "state")
+        cdef double[:, ::1] a_i_view = _as_rows(a_i, 3, "a_i")
+        cdef double[:, ::1] omega_dot_view = _as_rows(omega_dot, 3, "omega_dot")
+        cdef size_t n = state_view.shape[0]
+        cdef bool success
+        if a_i_view.shape[0] != n or omega_dot_view.shape[0] != n:
+            raise ValueError("The states and inputs must be given for the same number of vehicles.")
+        if n == 0:
+            return state
+
+        with nogil:
+            success = self._thisptr.integrate(&state_view[0, 0], &a_i_view[0, 0],
+                                              &omega_dot_view[0, 0], n, t0, t1)
+        if not success:
+            raise RuntimeError("The adaptive integration did not reach t1 within {} steps."
+                               .format(self._thisptr.max_steps))
+        return state
@@ -3,18 +3,32 @@
 //
 
 #include "Camera.h"
+#include <chrono>
 #include <opencv2/opencv.hpp>
 #include <panda3d/pointerToArray.h>
 
 using namespace cv;
 
 
-Camera::Camera() {}
+Camera::Camera(size_t max_queue_size) : max_queue_size(max_queue_size > 0 ? max_queue_size : 1),
+                                        n_dropped(0), n_processed(0) {}
+
+Camera::~Camera() {
+    stop();
+}
 
 void Camera::set_image(long pointer, unsigned int x_size, unsigned int y_size) {
     image_pointer = *(PointerToArray<unsigned char>*)pointer;
     this->x_size = x_size;
     this->y_size = y_size;
+    this->n_components = 3;
+}
+
+void Camera::set_buffer(uint8_t *data, unsigned int x_size, unsigned int y_size, unsigned int n_components) {
+    image_pointer = data;
+    this->x_size = x_size;
+    this->y_size = y_size;
+    this->n_components = n_components;
 }
 
 bool Camera::is_set() {
@@ -22,9 +36,98 @@ bool Camera::is_set() {
 }
 
 void Camera::show_image() {
-    Mat image =  Mat(y_size, x_size, CV_8UC3, image_pointer);
-    flip(image, image, 0);
+    if (!is_set()) {
+        return;
+    }
+    push_frame(image_pointer, x_size, y_size, n_components, true);
+}
+
+bool Camera::push_frame(const uint8_t *data, unsigned int x_size, unsigned int y_size, unsigned int n_components,
+                        bool flip) {
+    // Copy (and flip) the frame before taking the lock, the source buffer may be reused by
+    // Panda3d as soon as this function returns.
+    Mat source(y_size, x_size, CV_8UC(n_components), const_cast<uint8_t *>(data));
+    Mat frame;
+    if (flip) {
+        cv::flip(source, frame, 0);
+    } else {
+        frame = source.clone();
+    }
+
+    bool dropped = false;
+    {
+        std::lock_guard<std::mutex> lock(queue_mutex);
+        while (frame_queue.size() >= max_queue_size) {
+            frame_queue.pop_front();
+            n_dropped++;
+            dropped = true;
+        }
+        frame_queue.push_back(frame);
+    }
+    start();
+    queue_condition.notify_one();
+    return !dropped;
+}
+
+void Camera::start() {
+    std::lock_guard<std::mutex> lock(queue_mutex);
+    if (running) {
+        return;
+    }
+    running = true;
+    video_update_thread = std::thread(&Camera::run, this);
+}
+
+void Camera::stop() {
+    {
+        std::lock_guard<std::mutex> lock(queue_mutex);
+        if (!running) {
+            return;
+        }
+        running = false;
+    }
+    queue_condition.notify_all();
+    if (video_update_thread.joinable()) {
+        video_update_thread.join();
+    }
+}
+
+size_t Camera::queue_depth() {
+    std::lock_guard<std::mutex> lock(queue_mutex);
+    return frame_queue.size();
+}
+
+uint64_t Camera::dropped_frames() const {
+    return n_dropped;
+}
+
+uint64_t Camera::processed_frames() const {
+    return n_processed;
+}
+
+void Camera::run() {
     namedWindow("Display Image", WINDOW_AUTOSIZE);
-    imshow("Display Image", image);
-    waitKey(0);
+    while (true) {
+        Mat frame;
+        {
+            std::unique_lock<std::mutex> lock(queue_mutex);
+            // Wake up regularly so the window keeps processing its events.
+            queue_condition.wait_for(lock, std::chrono::milliseconds(10),
+                                     [this] { return !running || !frame_queue.empty(); });
+            if (!running) {
+                break;
+            }
+            if (!frame_queue.empty()) {
+                frame = frame_queue.front();
+                frame_queue.pop_front();
+            }
+        }
+
+        if (!frame.empty()) {
+            imshow("Display Image", frame);
+            n_processed++;
+        }
+        waitKey(1);
+    }
+    destroyWindow("Display Image");
 }
@@ -6,28 +6,59 @@
 #define SCALING_POTATO_QUADCOPTERCAMERAS_H
 
 #include <stdint.h>
+#include <stddef.h>
+#include <atomic>
+#include <condition_variable>
+#include <deque>
+#include <mutex>
 #include <thread>
 
+#include <opencv2/core/core.hpp>
 
 
 class Camera {
 public:
-    Camera();
+    // max_queue_size is the number of frames that may wait for the worker thread. When the queue
+    // is full the oldest frame is dropped, so the worker always works on the newest frames.
+    explicit Camera(size_t max_queue_size = 2);
+    ~Camera();
 
     void set_image(long pointer, unsigned int x_size, unsigned int y_size);
+    void set_buffer(uint8_t *data, unsigned int x_size, unsigned int y_size, unsigned int n_components);
     bool is_set();
 
+    // Queues a copy of the current image for display by the worker thread. Never blocks on the
+    // display.
     void show_image();
 
+    // Copies a frame into the queue of the worker thread. Returns false if an older frame had to
+    // be dropped to make room for it.
+    bool push_frame(const uint8_t *data, unsigned int x_size, unsigned int y_size, unsigned int n_components, bool flip);
+
+    void start();
+    void stop();
+
+    size_t queue_depth();
+    uint64_t dropped_frames() const;
+    uint64_t processed_frames() const;
+
 private:
+    void run();
+
     uint8_t *image_pointer = nullptr;
     uint32_t x_size = 0;
     uint32_t y_size = 0;
+    uint32_t n_components = 3;
 
-    std::thread video_update_thread;
-    
-    
+    size_t max_queue_size;
+    std::deque<cv::Mat> frame_queue;
+    std::mutex queue_mutex;
+    std::condition_variable queue_condition;
+    bool running = false;
+    std::atomic<uint64_t> n_dropped;
+    std::atomic<uint64_t> n_processed;
 
+    std::thread video_update_thread;
 };
 
 
@@ -0,0 +1,98 @@
+//
+// Pipeline of image processing stages run on camera frames across a thread pool.
+//
+
+#include "FramePipeline.h"
+
+#include <opencv2/opencv.hpp>
+
+using namespace cv;
+
+
+void ConvertColorStage::process(FrameResult &frame) const {
+    Mat converted;
+    cvtColor(frame.image, converted, code);
+    frame.image = converted;
+}
+
+void ResizeStage::process(FrameResult &frame) const {
+    Mat resized;
+    resize(frame.image, resized, Size(), scale, scale, INTER_AREA);
+    frame.scale_x *= (double)frame.image.cols / resized.cols;
+    frame.scale_y *= (double)frame.image.rows / resized.rows;
+    frame.image = resized;
+}
+
+void ColorBlobStage::process(FrameResult &frame) const {
+    int channels = frame.image.channels();
+    Scalar lower_bound, upper_bound;
+    for (int i = 0; i < channels && i < 4; i++) {
+        lower_bound[i] = i < (int)lower.size() ? lower[i] : 0.;
+        upper_bound[i] = i < (int)upper.size() ? upper[i] : 255.;
+    }
+
+    Mat mask, labels, stats, centroids;
+    inRange(frame.image, lower_bound, upper_bound, mask);
+    int n_labels = connectedComponentsWithStats(mask, labels, stats, centroids, 8, CV_32S);
+
+    // Label 0 is the background.
+    for (int label = 1; label < n_labels; label++) {
+        double area = stats.at<int>(label, CC_STAT_AREA) * frame.scale_x * frame.scale_y;
+        if (area < min_area) {
+            continue;
+        }
+        Blob blob;
+        blob.x = (float)(centroids.at<double>(label, 0) * frame.scale_x);
+        blob.y = (float)(centroids.at<double>(label, 1) * frame.scale_y);
+        blob.area = (float)area;
+        blob.width = (float)(stats.at<int>(label, CC_STAT_WIDTH) * frame.scale_x);
+        blob.height = (float)(stats.at<int>(label, CC_STAT_HEIGHT) * frame.scale_y);
+        frame.blobs.push_back(blob);
+    }
+}
+
+
+FramePipeline::FramePipeline(size_t n_threads) : pool(n_threads) {}
+
+void FramePipeline::add_convert_color(int code) {
+    stages.push_back(std::unique_ptr<FrameStage>(new ConvertColorStage(code)));
+}
+
+void FramePipeline::add_resize(double scale) {
+    stages.push_back(std::unique_ptr<FrameStage>(new ResizeStage(scale)));
+}
+
+void FramePipeline::add_color_blobs(const std::vector<double> &lower, const std::vector<double> &upper,
+                                    double min_area) {
+    stages.push_back(std::unique_ptr<FrameStage>(new ColorBlobStage(lower, upper, min_area)));
+}
+
+size_t FramePipeline::n_stages() const {
+    return stages.size();
+}
+
+size_t FramePipeline::n_threads() const {
+    return pool.size();
+}
+
+void FramePipeline::process(const std::vector<FrameInput> &inputs, std::vector<FrameResult> &results) {
+    results.clear();
+    results.resize(inputs.size());
+    pool.parallel_for(inputs.size(), [&](size_t i) { process_one(inputs[i], results[i]); });
+}
+
+void FramePipeline::process_one(const FrameInput &input, FrameResult &result) const {
+    Mat source(input.y_size, input.x_size, CV_8UC(input.n_components), const_cast<uint8_t *>(input.data),
+               input.row_stride);
+    // The stages write their output into new matrices, so the source, which is shared with
+    // Panda3d and Python, is never modified and doesn't have to be copied.
+    if (input.flip) {
+        flip(source, result.image, 0);
+    } else {
+        result.image = source;
+    }
+
+    for (const auto &stage : stages) {
+        stage->process(result);
+    }
+}
@@ -0,0 +1,115 @@
+//
+// Pipeline of image processing stages run on camera frames across a thread pool.
+//
+
+#ifndef SCALING_POTATO_FRAMEPIPELINE_H
+#define SCALING_POTATO_FRAMEPIPELINE_H
+
+#include <stdint.h>
+#include <stddef.h>
+#include <memory>
+#include <vector>
+
+#include <opencv2/core/core.hpp>
+
+#include "ThreadPool.h"
+
+
+struct FrameInput {
+    const uint8_t *data;
+    uint32_t x_size;
+    uint32_t y_size;
+    uint32_t n_components;
+    // Number of bytes between the start of two rows.
+    size_t row_stride;
+    // If true the rows are stored bottom to top, like Panda3d does.
+    bool flip;
+};
+
+// Blob found by a ColorBlobStage. The position and size are in pixels of the input frame.
+struct Blob {
+    float x;
+    float y;
+    float area;
+    float width;
+    float height;
+};
+
+struct FrameResult {
+    cv::Mat image;
+    std::vector<Blob> blobs;
+    // Scale from the pixels of the current image to the pixels of the input frame.
+    double scale_x = 1.;
+    double scale_y = 1.;
+
+    const uint8_t *image_data() const { return image.data; }
+    int image_rows() const { return image.rows; }
+    int image_cols() const { return image.cols; }
+    int image_channels() const { return image.channels(); }
+    size_t image_step() const { return image.step; }
+};
+
+
+class FrameStage {
+public:
+    virtual ~FrameStage() {}
+    virtual void process(FrameResult &frame) const = 0;
+};
+
+// Converts the colour space with cv::cvtColor.
+class ConvertColorStage : public FrameStage {
+public:
+    explicit ConvertColorStage(int code) : code(code) {}
+    void process(FrameResult &frame) const override;
+
+private:
+    int code;
+};
+
+// Scales the image with cv::resize using area interpolation.
+class ResizeStage : public FrameStage {
+public:
+    explicit ResizeStage(double scale) : scale(scale) {}
+    void process(FrameResult &frame) const override;
+
+private:
+    double scale;
+};
+
+// Finds the connected regions with all channels within [lower, upper].
+class ColorBlobStage : public FrameStage {
+public:
+    ColorBlobStage(const std::vector<double> &lower, const std::vector<double> &upper, double min_area)
+            : lower(lower), upper(upper), min_area(min_area) {}
+    void process(FrameResult &frame) const override;
+
+private:
+    std::vector<double> lower;
+    std::vector<double> upper;
+    double min_area;
+};
+
+
+class FramePipeline {
+public:
+    // A pipeline with n_threads == 0 uses one thread per hardware thread.
+    explicit FramePipeline(size_t n_threads = 0);
+
+    void add_convert_color(int code);
+    void add_resize(double scale);
+    void add_color_blobs(const std::vector<double> &lower, const std::vector<double> &upper, double min_area);
+    size_t n_stages() const;
+    size_t n_threads() const;
+
+    // Runs all stages on every frame, the frames are divided over the thread pool.
+    void process(const std::vector<FrameInput> &inputs, std::vector<FrameResult> &results);
+
+private:
+    void process_one(const FrameInput &input, FrameResult &result) const;
+
+    std::vector<std::unique_ptr<FrameStage>> stages;
+    ThreadPool pool;
+};
+
+
+#endif //SCALING_POTATO_FRAMEPIPELINE_H
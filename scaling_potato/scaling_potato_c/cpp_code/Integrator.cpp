@@ -0,0 +1,214 @@
+//
+// Explicit Runge-Kutta integrators for the quadcopter dynamics.
+//
+
+#include "Integrator.h"
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+
+
+void quadcopter_derivative(const double *state, const double *a_i, const double *omega_dot,
+                           size_t n, double K, double *state_dot) {
+    for (size_t i = 0; i < n; i++) {
+        const double *y = state + i * QUADCOPTER_STATE_SIZE;
+        double *y_dot = state_dot + i * QUADCOPTER_STATE_SIZE;
+
+        y_dot[0] = y[3];
+        y_dot[1] = y[4];
+        y_dot[2] = y[5];
+        y_dot[3] = a_i[3 * i];
+        y_dot[4] = a_i[3 * i + 1];
+        y_dot[5] = a_i[3 * i + 2];
+
+        // Same as omega2qdot.
+        const double p = y[10], q = y[11], r = y[12];
+        const double q0 = y[6], q1 = y[7], q2 = y[8], q3 = y[9];
+        const double e = K * (1 - (q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3));
+        y_dot[6] = 0.5 * (e * q0 - p * q1 - q * q2 - r * q3);
+        y_dot[7] = 0.5 * (p * q0 + e * q1 + r * q2 - q * q3);
+        y_dot[8] = 0.5 * (q * q0 - r * q1 + e * q2 + p * q3);
+        y_dot[9] = 0.5 * (r * q0 + q * q1 - p * q2 + e * q3);
+
+        y_dot[10] = omega_dot[3 * i];
+        y_dot[11] = omega_dot[3 * i + 1];
+        y_dot[12] = omega_dot[3 * i + 2];
+    }
+}
+
+
+QuadcopterIntegrator::QuadcopterIntegrator(int method, bool adaptive, double max_step,
+                                           double rtol, double atol, size_t max_steps, double K)
+        : method(method), adaptive(adaptive), max_step(max_step), rtol(rtol), atol(atol),
+          max_steps(max_steps), K(K) {
+    if (method != METHOD_RK4 && method != METHOD_DOPRI5) {
+        throw std::invalid_argument("Unknown integration method.");
+    }
+    if (adaptive && method != METHOD_DOPRI5) {
+        throw std::invalid_argument("Only the Dormand-Prince method supports an adaptive step.");
+    }
+    if (!adaptive && !(max_step > 0)) {
+        throw std::invalid_argument("A fixed step integrator needs a positive step size.");
+    }
+}
+
+
+void QuadcopterIntegrator::resize(size_t size) {
+    if (k1.size() == size) {
+        return;
+    }
+    for (std::vector<double> *v : {&k1, &k2, &k3, &k4, &k5, &k6, &k7, &y_tmp, &y_new}) {
+        v->assign(size, 0.);
+    }
+}
+
+
+bool QuadcopterIntegrator::integrate(double *state, const double *a_i, const double *omega_dot,
+                                     size_t n, double t0, double t1) {
+    n_accepted = 0;
+    n_rejected = 0;
+    if (t1 == t0 || n == 0) {
+        return true;
+    }
+    resize(n * QUADCOPTER_STATE_SIZE);
+
+    if (adaptive) {
+        return integrate_adaptive(state, a_i, omega_dot, n, t0, t1);
+    }
+
+    // Equal steps that end exactly at t1.
+    const double span = t1 - t0;
+    const size_t n_steps = std::max<size_t>(1, (size_t) std::ceil(std::fabs(span) / max_step - 1e-9));
+    const double h = span / n_steps;
+    const size_t size = n * QUADCOPTER_STATE_SIZE;
+    for (size_t step = 0; step < n_steps; step++) {
+        if (method == METHOD_RK4) {
+            rk4_step(state, a_i, omega_dot, n, h);
+        } else {
+            quadcopter_derivative(state, a_i, omega_dot, n, K, k1.data());
+            dopri5_step(state, a_i, omega_dot, n, h);
+            std::copy(y_new.begin(), y_new.begin() + size, state);
+        }
+    }
+    n_accepted = n_steps;
+    return true;
+}
+
+
+void QuadcopterIntegrator::rk4_step(double *state, const double *a_i, const double *omega_dot,
+                                    size_t n, double h) {
+    const size_t size = n * QUADCOPTER_STATE_SIZE;
+    double *y = y_tmp.data();
+
+    quadcopter_derivative(state, a_i, omega_dot, n, K, k1.data());
+    for (size_t j = 0; j < size; j++) y[j] = state[j] + 0.5 * h * k1[j];
+    quadcopter_derivative(y, a_i, omega_dot, n, K, k2.data());
+    for (size_t j = 0; j < size; j++) y[j] = state[j] + 0.5 * h * k2[j];
+    quadcopter_derivative(y, a_i, omega_dot, n, K, k3.data());
+    for (size_t j = 0; j < size; j++) y[j] = state[j] + h * k3[j];
+    quadcopter_derivative(y, a_i, omega_dot, n, K, k4.data());
+
+    for (size_t j = 0; j < size; j++) {
+        state[j] += h / 6. * (k1[j] + 2. * k2[j] + 2. * k3[j] + k4[j]);
+    }
+}
+
+
+// Dormand-Prince 5(4) coefficients.
+static const double
+        a21 = 1. / 5.,
+        a31 = 3. / 40., a32 = 9. / 40.,
+        a41 = 44. / 45., a42 = -56. / 15., a43 = 32. / 9.,
+        a51 = 19372. / 6561., a52 = -25360. / 2187., a53 = 64448. / 6561., a54 = -212. / 729.,
+        a61 = 9017. / 3168., a62 = -355. / 33., a63 = 46732. / 5247., a64 = 49. / 176.,
+        a65 = -5103. / 18656.,
+        a71 = 35. / 384., a73 = 500. / 1113., a74 = 125. / 192., a75 = -2187. / 6784.,
+        a76 = 11. / 84.,
+        // Difference between the 5th and embedded 4th order weights.
+        e1 = 71. / 57600., e3 = -71. / 16695., e4 = 71. / 1920., e5 = -17253. / 339200.,
+        e6 = 22. / 525., e7 = -1. / 40.;
+
+
+double QuadcopterIntegrator::dopri5_step(const double *state, const double *a_i,
+                                         const double *omega_dot, size_t n, double h) {
+    const size_t size = n * QUADCOPTER_STATE_SIZE;
+    double *y = y_tmp.data();
+
+    for (size_t j = 0; j < size; j++) y[j] = state[j] + h * a21 * k1[j];
+    quadcopter_derivative(y, a_i, omega_dot, n, K, k2.data());
+    for (size_t j = 0; j < size; j++) y[j] = state[j] + h * (a31 * k1[j] + a32 * k2[j]);
+    quadcopter_derivative(y, a_i, omega_dot, n, K, k3.data());
+    for (size_t j = 0; j < size; j++) y[j] = state[j] + h * (a41 * k1[j] + a42 * k2[j] + a43 * k3[j]);
+    quadcopter_derivative(y, a_i, omega_dot, n, K, k4.data());
+    for (size_t j = 0; j < size; j++) {
+        y[j] = state[j] + h * (a51 * k1[j] + a52 * k2[j] + a53 * k3[j] + a54 * k4[j]);
+    }
+    quadcopter_derivative(y, a_i, omega_dot, n, K, k5.data());
+    for (size_t j = 0; j < size; j++) {
+        y[j] = state[j] + h * (a61 * k1[j] + a62 * k2[j] + a63 * k3[j] + a64 * k4[j] + a65 * k5[j]);
+    }
+    quadcopter_derivative(y, a_i, omega_dot, n, K, k6.data());
+    for (size_t j = 0; j < size; j++) {
+        y_new[j] = state[j] + h * (a71 * k1[j] + a73 * k3[j] + a74 * k4[j] + a75 * k5[j] + a76 * k6[j]);
+    }
+    quadcopter_derivative(y_new.data(), a_i, omega_dot, n, K, k7.data());
+
+    double sum = 0.;
+    for (size_t j = 0; j < size; j++) {
+        const double error = h * (e1 * k1[j] + e3 * k3[j] + e4 * k4[j] + e5 * k5[j] + e6 * k6[j] + e7 * k7[j]);
+        const double scale = atol + rtol * std::max(std::fabs(state[j]), std::fabs(y_new[j]));
+        sum += (error / scale) * (error / scale);
+    }
+    return std::sqrt(sum / size);
+}
+
+
+bool QuadcopterIntegrator::integrate_adaptive(double *state, const double *a_i,
+                                              const double *omega_dot, size_t n,
+                                              double t0, double t1) {
+    const size_t size = n * QUADCOPTER_STATE_SIZE;
+    const double direction = t1 > t0 ? 1. : -1.;
+    const double span = std::fabs(t1 - t0);
+    const double step_limit = max_step > 0 ? max_step : span;
+
+    double h = next_step > 0 ? next_step : std::min(span, step_limit);
+    double t = t0;
+
+    quadcopter_derivative(state, a_i, omega_dot, n, K, k1.data());
+    while (direction * (t1 - t) > 0) {
+        if (n_accepted + n_rejected >= max_steps) {
+            return false;
+        }
+
+        h = std::min(h, step_limit);
+        const double proposed = h;
+        // Don't leave a sliver of the interval for a last tiny step.
+        const double remaining = direction * (t1 - t);
+        const bool last = h >= remaining * (1 - 1e-12);
+        if (last) {
+            h = remaining;
+        }
+        if (h <= 1e-14 * std::max(std::fabs(t), 1.)) {
+            return false;
+        }
+
+        const double error = dopri5_step(state, a_i, omega_dot, n, direction * h);
+        const double factor = error == 0 ? 10. : std::min(10., std::max(0.2, 0.9 * std::pow(error, -0.2)));
+
+        if (error <= 1.) {
+            t = last ? t1 : t + direction * h;
+            std::copy(y_new.begin(), y_new.begin() + size, state);
+            // First same as last, the derivative at the new state is the k1 of the next step.
+            std::swap(k1, k7);
+            n_accepted++;
+            h *= factor;
+            // A step that was cut short to hit t1 is not a good estimate for the next call.
+            next_step = last ? std::max(proposed, h) : h;
+        } else {
+            n_rejected++;
+            h *= std::min(1., factor);
+        }
+    }
+    return true;
+}
@@ -0,0 +1,72 @@
+//
+// Explicit Runge-Kutta integrators for the quadcopter dynamics.
+//
+
+#ifndef SCALING_POTATO_INTEGRATOR_H
+#define SCALING_POTATO_INTEGRATOR_H
+
+#include <stddef.h>
+#include <vector>
+
+
+// Number of elements in the state of a single quadcopter: position (3), velocity (3),
+// quaternion (4, w x y z) and rotational rate (3).
+const size_t QUADCOPTER_STATE_SIZE = 13;
+
+// Derivative of the state of n quadcopters. The inertial acceleration a_i (n x 3) and the
+// rotational acceleration omega_dot (n x 3) are held constant. K is the gain of the quaternion
+// normalisation term, like in omega2qdot.
+void quadcopter_derivative(const double *state, const double *a_i, const double *omega_dot,
+                           size_t n, double K, double *state_dot);
+
+
+enum IntegratorMethod {
+    METHOD_RK4 = 0,
+    METHOD_DOPRI5 = 1,
+};
+
+
+// Integrates the states of n quadcopters in place, all arrays are C contiguous.
+//
+// With a fixed step the interval is divided in equal steps of at most max_step. With an adaptive
+// step (Dormand-Prince only) the step size is controlled on the error estimate of the embedded
+// 4th order solution, like SciPy's dopri5. The step size is carried over to the next call.
+class QuadcopterIntegrator {
+public:
+    QuadcopterIntegrator(int method, bool adaptive, double max_step, double rtol, double atol,
+                         size_t max_steps, double K);
+
+    // Returns false if the adaptive integration needed more than max_steps steps or the step
+    // size underflowed. The state is then left at the last accepted step.
+    bool integrate(double *state, const double *a_i, const double *omega_dot, size_t n,
+                   double t0, double t1);
+
+    int method;
+    bool adaptive;
+    double max_step;
+    double rtol;
+    double atol;
+    size_t max_steps;
+    double K;
+
+    // Statistics of the last call to integrate.
+    size_t n_accepted = 0;
+    size_t n_rejected = 0;
+    // Step size the next adaptive integration starts with, 0 to start with the whole interval.
+    double next_step = 0.;
+
+private:
+    void resize(size_t size);
+    void rk4_step(double *state, const double *a_i, const double *omega_dot, size_t n, double h);
+    // Takes a Dormand-Prince step from state into y_new and returns the scaled error norm. k1
+    // must hold the derivative at state, on return k7 holds the derivative at y_new.
+    double dopri5_step(const double *state, const double *a_i, const double *omega_dot, size_t n,
+                       double h);
+    bool integrate_adaptive(double *state, const double *a_i, const double *omega_dot, size_t n,
+                            double t0, double t1);
+
+    std::vector<double> k1, k2, k3, k4, k5, k6, k7, y_tmp, y_new;
+};
+
+
+#endif //SCALING_POTATO_INTEGRATOR_H
@@ -0,0 +1,95 @@
+//
+// Fixed size pool of worker threads.
+//
+
+#include "ThreadPool.h"
+
+#include <algorithm>
+#include <atomic>
+#include <exception>
+
+
+ThreadPool::ThreadPool(size_t n_threads) {
+    if (n_threads == 0) {
+        n_threads = std::max(1u, std::thread::hardware_concurrency());
+    }
+    for (size_t i = 0; i < n_threads; i++) {
+        workers.emplace_back(&ThreadPool::run, this);
+    }
+}
+
+ThreadPool::~ThreadPool() {
+    {
+        std::lock_guard<std::mutex> lock(tasks_mutex);
+        stopping = true;
+    }
+    tasks_condition.notify_all();
+    for (auto &worker : workers) {
+        worker.join();
+    }
+}
+
+size_t ThreadPool::size() const {
+    return workers.size();
+}
+
+void ThreadPool::parallel_for(size_t n, const std::function<void(size_t)> &fn) {
+    if (n == 0) {
+        return;
+    }
+
+    std::atomic<size_t> next(0);
+    size_t n_tasks = std::min(n, workers.size());
+    size_t n_done = 0;
+    std::mutex done_mutex;
+    std::condition_variable done_condition;
+    std::exception_ptr error = nullptr;
+
+    // Every task keeps taking indices until all are handed out, so uneven work balances out.
+    auto work = [&]() {
+        try {
+            for (size_t i = next++; i < n; i = next++) {
+                fn(i);
+            }
+        } catch (...) {
+            std::lock_guard<std::mutex> lock(done_mutex);
+            if (!error) {
+                error = std::current_exception();
+            }
+            next = n;
+        }
+        std::lock_guard<std::mutex> lock(done_mutex);
+        n_done++;
+        done_condition.notify_one();
+    };
+
+    {
+        std::lock_guard<std::mutex> lock(tasks_mutex);
+        for (size_t i = 0; i < n_tasks; i++) {
+            tasks.push_back(work);
+        }
+    }
+    tasks_condition.notify_all();
+
+    std::unique_lock<std::mutex> lock(done_mutex);
+    done_condition.wait(lock, [&] { return n_done == n_tasks; });
+    if (error) {
+        std::rethrow_exception(error);
+    }
+}
+
+void ThreadPool::run() {
+    while (true) {
+        std::function<void()> task;
+        {
+            std::unique_lock<std::mutex> lock(tasks_mutex);
+            tasks_condition.wait(lock, [this] { return stopping || !tasks.empty(); });
+            if (stopping && tasks.empty()) {
+                return;
+            }
+            task = std::move(tasks.front());
+            tasks.pop_front();
+        }
+        task();
+    }
+}
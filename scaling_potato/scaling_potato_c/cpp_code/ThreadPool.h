@@ -0,0 +1,40 @@
+//
+// Fixed size pool of worker threads.
+//
+
+#ifndef SCALING_POTATO_THREADPOOL_H
+#define SCALING_POTATO_THREADPOOL_H
+
+#include <stddef.h>
+#include <condition_variable>
+#include <deque>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+
+class ThreadPool {
+public:
+    // A pool with n_threads == 0 uses one thread per hardware thread.
+    explicit ThreadPool(size_t n_threads = 0);
+    ~ThreadPool();
+
+    // Calls fn(i) for i in [0, n) on the worker threads and waits until all calls returned. The
+    // first exception thrown by fn is rethrown in the calling thread.
+    void parallel_for(size_t n, const std::function<void(size_t)> &fn);
+
+    size_t size() const;
+
+private:
+    void run();
+
+    std::vector<std::thread> workers;
+    std::deque<std::function<void()>> tasks;
+    std::mutex tasks_mutex;
+    std::condition_variable tasks_condition;
+    bool stopping = false;
+};
+
+
+#endif //SCALING_POTATO_THREADPOOL_H
@@ -37,9 +37,10 @@ void test_read_texture_from_memory(long ptr_long, int x_size, int y_size) {
 
     cout << (int*)texture << " " << (int*)(*(PointerToArray<unsigned char>*)ptr_long).p() << endl;
 
-    Mat image =  Mat(y_size, x_size, CV_8UC3, texture);
-    flip(image, image, 0);
+    Mat image;
+    flip(Mat(y_size, x_size, CV_8UC3, texture), image, 0);
     namedWindow("Display Image", WINDOW_AUTOSIZE);
     imshow("Display Image", image);
-    waitKey(0);
+    // Only process the window events, waiting for a key would freeze the simulation.
+    waitKey(1);
 }
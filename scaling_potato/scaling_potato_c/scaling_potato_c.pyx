@@ -2,6 +2,11 @@ from libcpp cimport bool
 from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t, int8_t, int16_t, int32_t, int64_t
 from libc.stddef cimport wchar_t, size_t
 from libc.stdint cimport uintptr_t
+from libc.string cimport memcpy
+from libcpp.vector cimport vector
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE, PyBUF_WRITABLE, PyBUF_STRIDES, PyBUF_FORMAT
+
+import numpy as np
 
 
 cdef extern from "test_opencv.h":
@@ -9,4 +14,6 @@ cdef extern from "test_opencv.h":
     cpdef void test_read_texture_from_memory(long, int, int)
 
 
-include "Camera.pxi"
\ No newline at end of file
+include "Camera.pxi"
+include "FramePipeline.pxi"
+include "Integrator.pxi"
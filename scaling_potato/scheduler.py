@@ -0,0 +1,72 @@
+__author__ = "Aaron M. de Windt"
+
+
+class FixedRateScheduler(object):
+    """
+    Runs callbacks at a fixed rate, independent of the rate at which frames are rendered.
+
+    Every frame the elapsed wall clock time is added to an accumulator, and the callbacks are
+    run once for every whole time step in it. The fraction of a time step left in the
+    accumulator is returned as the interpolation factor between the last two states, which is
+    used to display a smooth pose.
+
+    If a frame takes so long that more than ``max_substeps`` steps are due, the remaining time
+    is dropped instead of taking larger steps. The simulation then runs slower than real time,
+    but every step keeps the same time step.
+
+    :param float rate: Rate in Hz at which the callbacks are run.
+    :param int max_substeps: Maximum number of steps run in a single frame.
+    """
+
+    def __init__(self, rate=1000., max_substeps=250):
+        self.rate = rate
+        self.dt = 1. / rate
+        self.max_substeps = max_substeps
+
+        self.callbacks = []
+        self.time = 0.
+        self.n_steps = 0
+        self.accumulator = 0.
+        self.dropped_time = 0.
+        self.alpha = 0.
+
+    def add(self, callback):
+        """
+        Adds a callback that's run every step with the simulation time as its only argument.
+        """
+        self.callbacks.append(callback)
+
+    def remove(self, callback):
+        self.callbacks.remove(callback)
+
+    def step(self):
+        """
+        Runs all callbacks for a single step and advances the simulation time.
+        """
+        for callback in self.callbacks:
+            callback(self.time)
+        self.n_steps += 1
+        self.time = self.n_steps * self.dt
+
+    def advance(self, frame_dt):
+        """
+        Runs all steps due in the elapsed time.
+
+        :param float frame_dt: Wall clock time elapsed since the last call.
+        :return: Interpolation factor between the previous and current state, in [0, 1).
+        :rtype: float
+        """
+        self.accumulator += frame_dt
+
+        n_substeps = int(self.accumulator / self.dt)
+        if n_substeps > self.max_substeps:
+            self.dropped_time += (n_substeps - self.max_substeps) * self.dt
+            self.accumulator -= (n_substeps - self.max_substeps) * self.dt
+            n_substeps = self.max_substeps
+
+        for _ in range(n_substeps):
+            self.step()
+        self.accumulator -= n_substeps * self.dt
+
+        self.alpha = min(max(self.accumulator / self.dt, 0.), 1.)
+        return self.alpha
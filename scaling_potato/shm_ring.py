@@ -0,0 +1,291 @@
+"""
+Shared memory ring buffers for camera frames.
+
+A :class:`FrameRingWriter` publishes frames into a ring of slots in a
+``multiprocessing.shared_memory`` block. Any number of :class:`FrameRingReader` objects, in any
+process, can map the same block and access the frames as NumPy arrays without copying them.
+
+Every frame gets a sequence number, which is the number of frames written before it. Frame
+``seq`` is stored in slot ``seq % n_slots``. Before a slot is overwritten its sequence number is
+set to -1, so a reader can check with :meth:`FrameRingReader.valid` whether the frame it was
+looking at was overwritten in the meantime.
+"""
+
+from collections import namedtuple
+from multiprocessing import shared_memory
+import time as wall_clock
+
+import numpy as np
+
+
+__author__ = "Aaron M. de Windt"
+
+
+MAGIC = 0x53505246
+VERSION = 1
+ALIGNMENT = 64
+
+header_dtype = np.dtype([
+    ("magic", np.uint32),
+    ("version", np.uint32),
+    ("n_slots", np.uint32),
+    ("ndim", np.uint32),
+    ("shape", np.uint32, (4,)),
+    ("dtype", "S8"),
+    ("slot_size", np.uint64),
+    ("write_seq", np.uint64),
+])
+
+slot_dtype = np.dtype([
+    ("seq", np.int64),
+    ("frame_number", np.int64),
+    ("timestamp", np.float64),
+])
+
+
+# Names of the blocks created by writers in this process.
+_created = set()
+
+
+RingFrame = namedtuple("RingFrame", ["seq", "frame_number", "timestamp", "image"])
+
+
+def _align(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class _FrameRing(object):
+    def _map(self, shm):
+        self.shm = shm
+        self.header = np.ndarray((), dtype=header_dtype, buffer=shm.buf)
+        if self.header["magic"] != MAGIC or self.header["version"] != VERSION:
+            raise ValueError("Shared memory block '{}' is not a frame ring.".format(shm.name))
+
+        self.n_slots = int(self.header["n_slots"])
+        self.shape = tuple(int(size) for size in self.header["shape"][:int(self.header["ndim"])])
+        self.dtype = np.dtype(self.header["dtype"].item().decode("ascii"))
+        self.slot_size = int(self.header["slot_size"])
+
+        slots_offset = _align(header_dtype.itemsize)
+        self.slots = np.ndarray((self.n_slots,), dtype=slot_dtype, buffer=shm.buf, offset=slots_offset)
+        data_offset = slots_offset + _align(slot_dtype.itemsize * self.n_slots)
+        self.images = [np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf,
+                                  offset=data_offset + i * self.slot_size)
+                       for i in range(self.n_slots)]
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_seq(self):
+        """
+        Number of frames written to the ring.
+        """
+        return int(self.header["write_seq"])
+
+    def close(self):
+        """
+        Unmaps the shared memory. Arrays returned by the ring must not be used afterwards.
+        """
+        self.header = None
+        self.slots = None
+        self.images = None
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class FrameRingWriter(_FrameRing):
+    """
+    Publishes frames into a shared memory ring buffer.
+
+    :param str name: Name of the shared memory block, None for a generated name.
+    :param tuple shape: Shape of a frame, e.g. (256, 256, 3).
+    :param dtype: Data type of the frames.
+    :param int n_slots: Number of frames kept in the ring.
+    """
+
+    def __init__(self, name, shape, dtype=np.uint8, n_slots=8):
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        if len(shape) > 4:
+            raise ValueError("Frames can have at most 4 dimensions.")
+        if n_slots < 2:
+            raise ValueError("A frame ring needs at least two slots.")
+
+        slot_size = _align(int(np.prod(shape)) * dtype.itemsize)
+        size = (_align(header_dtype.itemsize) + _align(slot_dtype.itemsize * n_slots) +
+                slot_size * n_slots)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _created.add(shm._name)
+
+        header = np.ndarray((), dtype=header_dtype, buffer=shm.buf)
+        header["magic"] = MAGIC
+        header["version"] = VERSION
+        header["n_slots"] = n_slots
+        header["ndim"] = len(shape)
+        header["shape"] = tuple(shape) + (0,) * (4 - len(shape))
+        header["dtype"] = dtype.str.encode("ascii")
+        header["slot_size"] = slot_size
+        header["write_seq"] = 0
+        del header
+
+        self._map(shm)
+        self.slots["seq"] = -1
+
+    def claim(self):
+        """
+        Writable view of the slot the next frame goes into, for producers that render directly
+        into the ring. The frame is published by :meth:`commit`.
+
+        :rtype: numpy_array
+        """
+        seq = self.write_seq
+        slot = seq % self.n_slots
+        self.slots["seq"][slot] = -1
+        return self.images[slot]
+
+    def commit(self, timestamp, frame_number=-1):
+        """
+        Publishes the frame written into the view returned by :meth:`claim`.
+
+        :return: Sequence number of the frame.
+        :rtype: int
+        """
+        seq = self.write_seq
+        slot = seq % self.n_slots
+        self.slots["frame_number"][slot] = frame_number
+        self.slots["timestamp"][slot] = timestamp
+        self.slots["seq"][slot] = seq
+        self.header["write_seq"] = seq + 1
+        return seq
+
+    def write(self, image, timestamp, frame_number=-1):
+        """
+        Copies a frame into the ring and publishes it.
+
+        :param numpy_array image: Frame with the shape of the ring.
+        :param float timestamp: Time of the frame.
+        :param int frame_number: Number of the rendered frame.
+        :return: Sequence number of the frame.
+        :rtype: int
+        """
+        np.copyto(self.claim(), image, casting="unsafe")
+        return self.commit(timestamp, frame_number)
+
+    def unlink(self):
+        """
+        Removes the shared memory block, call this once the publisher is done.
+        """
+        _created.discard(self.shm._name)
+        self.shm.unlink()
+
+
+class FrameRingReader(_FrameRing):
+    """
+    Maps a frame ring published by a :class:`FrameRingWriter`.
+
+    :param str name: Name of the shared memory block.
+    """
+
+    def __init__(self, name):
+        shm = shared_memory.SharedMemory(name=name)
+        if shm._name not in _created:
+            # Readers don't own the block. Without this the resource tracker of this process
+            # would unlink it when the process exits. Forked processes share the tracker with
+            # the writer, which still owns it.
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        self._map(shm)
+        for image in self.images:
+            image.flags.writeable = False
+
+    def read(self, seq):
+        """
+        Frame with the given sequence number, or None if it's not in the ring (anymore).
+
+        The image is a read-only view on the shared memory. It's only guaranteed to be complete
+        if :meth:`valid` still returns True after using it.
+
+        :rtype: RingFrame
+        """
+        if seq < 0 or seq >= self.write_seq:
+            return None
+        slot = seq % self.n_slots
+        frame_number = int(self.slots["frame_number"][slot])
+        timestamp = float(self.slots["timestamp"][slot])
+        if self.slots["seq"][slot] != seq:
+            return None
+        return RingFrame(seq, frame_number, timestamp, self.images[slot])
+
+    def latest(self):
+        """
+        Latest complete frame, or None if no frame was published yet.
+
+        :rtype: RingFrame
+        """
+        while True:
+            seq = self.write_seq - 1
+            if seq < 0:
+                return None
+            frame = self.read(seq)
+            if frame is not None:
+                return frame
+
+    def valid(self, frame):
+        """
+        Returns True if the frame was not overwritten since it was read.
+        """
+        return self.slots["seq"][frame.seq % self.n_slots] == frame.seq
+
+    def wait(self, after_seq=-1, timeout=None, poll_interval=1e-4):
+        """
+        Waits for a frame newer than after_seq and returns the latest one.
+
+        :param int after_seq: Sequence number of the last frame that was handled.
+        :param float timeout: Maximum time to wait in seconds, None to wait forever.
+        :return: The latest frame, or None on timeout.
+        :rtype: RingFrame
+        """
+        start = wall_clock.monotonic()
+        while self.write_seq - 1 <= after_seq:
+            if timeout is not None and wall_clock.monotonic() - start > timeout:
+                return None
+            wall_clock.sleep(poll_interval)
+        return self.latest()
+
+
+class ReadbackPublisher(object):
+    """
+    Publishes the frames of a camera readback into a shared memory frame ring.
+
+    The ring is created when the first frame is delivered, once the size of the images is known.
+
+    :param scaling_potato.readback.CameraReadback readback: Readback of the camera.
+    :param str name: Name of the shared memory block.
+    :param int n_slots: Number of frames kept in the ring.
+    """
+
+    def __init__(self, readback, name, n_slots=8):
+        self.readback = readback
+        self.name = name
+        self.n_slots = n_slots
+        self.ring = None
+        readback.subscribe(self.publish)
+
+    def publish(self, frame):
+        if self.ring is None:
+            self.ring = FrameRingWriter(self.name, frame.image.shape, frame.image.dtype, self.n_slots)
+        self.ring.write(frame.image, frame.time, frame.frame_number)
+
+    def close(self):
+        self.readback.unsubscribe(self.publish)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
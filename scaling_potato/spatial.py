@@ -0,0 +1,370 @@
+"""
+Spatial index of the obstacles of a course.
+
+The pylons are vertical, so the index works on their (x, y) positions. It's a uniform grid
+stored as NumPy arrays, the obstacles sorted on the key of their grid cell. A query for all
+vehicles of a fleet at once looks up the candidate obstacles of every vehicle with one
+``searchsorted`` call per cell offset in the query window, and checks the exact distances of
+all candidates in a single vectorized operation. Windows with more cells than there are
+occupied cells, e.g. of vehicles far off the course or of long segments, are instead tested
+against the occupied cells in blocks of queries, and the nearest obstacle of such vehicles is
+found by comparing them against all obstacles. There are no loops over the vehicles or the
+obstacles.
+"""
+
+import numpy as np
+
+
+__author__ = "Aaron M. de Windt"
+
+
+# Maximum number of query and cell pairs tested at once against the occupied cells.
+BLOCK_SIZE = 1 << 20
+# Rough costs of a lookup per cell offset, per call and per query, relative to testing a query
+# against an occupied cell, to choose between the two.
+OFFSET_CALL_COST = 2000
+OFFSET_QUERY_COST = 10
+
+
+class ObstacleIndex(object):
+    """
+    Uniform grid over circular obstacles in the horizontal plane.
+
+    The queries take (N, 2) or (N, 3) positions, only the x and y components are used. Results
+    with pairs of queries and obstacles are returned as arrays with one element per pair, sorted
+    on the query index.
+
+    Obstacles keep their index when other obstacles are moved, added or removed. Moving an
+    obstacle within its grid cell only updates its position, the grid is only sorted again,
+    before the next query, when an obstacle changed cell.
+
+    :param numpy_array positions: (M, 2) positions of the obstacles.
+    :param radius: Radius of all obstacles or an (M,) array with the radius of every obstacle.
+    :param float cell_size: Size of the grid cells, in the order of the query radius.
+    """
+
+    def __init__(self, positions, radius=0., cell_size=5.):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        self.cell_size = float(cell_size)
+        self.positions = positions.copy()
+        self.radius = np.zeros((len(positions),))
+        self.radius[:] = radius
+        self.active = np.ones((len(positions),), dtype=bool)
+
+        self.__cells = np.zeros((0, 2), dtype=np.int64)
+        self.__dirty = True
+        self.n_rebuilds = 0
+
+    @classmethod
+    def from_course(cls, course, radius=0., cell_size=5.):
+        """
+        Index of the pylons of a course, see :mod:`scaling_potato.course`.
+
+        :rtype: ObstacleIndex
+        """
+        return cls(np.column_stack((course["x"], course["y"])), radius, cell_size)
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def cells(self, xy):
+        return np.floor(xy / self.cell_size).astype(np.int64)
+
+    def __rebuild(self):
+        self.n_rebuilds += 1
+        self.__cells = self.cells(self.positions)
+        ids = np.flatnonzero(self.active)
+        if len(ids) == 0:
+            self.__cell_min = np.zeros((2,), dtype=np.int64)
+            self.__cell_max = np.full((2,), -1, dtype=np.int64)
+        else:
+            self.__cell_min = self.__cells[ids].min(axis=0)
+            self.__cell_max = self.__cells[ids].max(axis=0)
+        self.__n_y = self.__cell_max[1] - self.__cell_min[1] + 1
+
+        keys = self.__key(self.__cells[ids])
+        order = np.argsort(keys, kind="stable")
+        self.__sorted_keys = keys[order]
+        self.__sorted_ids = ids[order]
+        occupied, self.__occupied_starts, self.__occupied_counts = np.unique(
+            self.__sorted_keys, return_index=True, return_counts=True)
+        self.__occupied_cells = np.column_stack((occupied // self.__n_y + self.__cell_min[0],
+                                                 occupied % self.__n_y + self.__cell_min[1]))
+        self.__max_radius = self.radius[ids].max() if len(ids) else 0.
+        self.__dirty = False
+
+    def __key(self, cells):
+        return (cells[..., 0] - self.__cell_min[0]) * self.__n_y + cells[..., 1] - self.__cell_min[1]
+
+    def __ensure_built(self):
+        if self.__dirty:
+            self.__rebuild()
+
+    def update(self, indices, positions):
+        """
+        Moves obstacles.
+
+        :param numpy_array indices: Indices of the obstacles.
+        :param numpy_array positions: (len(indices), 2) new positions.
+        """
+        indices = np.atleast_1d(indices)
+        self.positions[indices] = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if not self.__dirty and (self.cells(self.positions[indices]) != self.__cells[indices]).any():
+            self.__dirty = True
+
+    def add(self, positions, radius=0.):
+        """
+        Adds obstacles.
+
+        :return: Indices of the new obstacles.
+        :rtype: numpy_array
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        start = len(self.positions)
+        self.positions = np.concatenate((self.positions, positions))
+        self.radius = np.concatenate((self.radius, np.broadcast_to(radius, (len(positions),))))
+        self.active = np.concatenate((self.active, np.ones((len(positions),), dtype=bool)))
+        self.__dirty = True
+        return np.arange(start, len(self.positions))
+
+    def remove(self, indices):
+        """
+        Removes obstacles. The indices of the other obstacles don't change.
+        """
+        self.active[indices] = False
+        self.__dirty = True
+
+    def __candidates(self, lower, upper):
+        """
+        Candidate pairs of the queries and the obstacles in the grid cells from the lower to the
+        upper corner of the window of every query.
+
+        :param numpy_array lower: (N, 2) lower cell of the window of every query.
+        :param numpy_array upper: (N, 2) upper cell of the window of every query.
+        :return: Query and obstacle index of every pair.
+        :rtype: tuple
+        """
+        lower = np.maximum(lower, self.__cell_min)
+        upper = np.minimum(upper, self.__cell_max)
+        valid = (lower <= upper).all(axis=1)
+        queries = np.flatnonzero(valid)
+        lower = lower[queries]
+        upper = upper[queries]
+        span = upper - lower
+        if len(queries) == 0:
+            empty = np.zeros((0,), dtype=np.int64)
+            return empty, empty
+
+        # Windows with more cells than there are occupied cells are tested against the occupied
+        # cells, the others are looked up per cell offset if that's cheaper.
+        n_occupied = len(self.__occupied_cells)
+        large = (span + 1).prod(axis=1) > n_occupied
+        small = np.flatnonzero(~large)
+        if len(small):
+            max_span = span[small].max(axis=0)
+            n_offsets = (max_span[0] + 1) * (max_span[1] + 1)
+            if n_offsets * (OFFSET_CALL_COST + OFFSET_QUERY_COST * len(small)) > \
+                    len(small) * n_occupied:
+                large[:] = True
+                small = small[:0]
+        large = np.flatnonzero(large)
+
+        query_parts, start_parts, count_parts = self.__occupied_candidates(
+            queries[large], lower[large], upper[large])
+        if len(small):
+            parts = self.__window_candidates(queries[small], lower[small], span[small], max_span)
+            query_parts += parts[0]
+            start_parts += parts[1]
+            count_parts += parts[2]
+
+        query_ids = np.concatenate(query_parts)
+        starts = np.concatenate(start_parts)
+        counts = np.concatenate(count_parts)
+
+        # Expand the (start, count) ranges into one element per pair.
+        total = counts.sum()
+        pair_query = np.repeat(query_ids, counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_obstacle = self.__sorted_ids[np.repeat(starts, counts) + offsets]
+
+        order = np.argsort(pair_query, kind="stable")
+        return pair_query[order], pair_obstacle[order]
+
+    def __window_candidates(self, queries, lower, span, max_span):
+        """
+        Ranges of the sorted obstacles in the windows, found with a lookup per cell offset.
+        """
+        query_parts = []
+        start_parts = []
+        count_parts = []
+        for dx in range(max_span[0] + 1):
+            for dy in range(max_span[1] + 1):
+                inside = (span[:, 0] >= dx) & (span[:, 1] >= dy)
+                keys = self.__key(lower[inside] + [dx, dy])
+                starts = np.searchsorted(self.__sorted_keys, keys, side="left")
+                ends = np.searchsorted(self.__sorted_keys, keys, side="right")
+                query_parts.append(queries[inside])
+                start_parts.append(starts)
+                count_parts.append(ends - starts)
+        return query_parts, start_parts, count_parts
+
+    def __occupied_candidates(self, queries, lower, upper):
+        """
+        Ranges of the sorted obstacles in the windows, found by testing the occupied cells.
+        """
+        cells = self.__occupied_cells
+        query_parts = []
+        start_parts = []
+        count_parts = []
+        block = max(1, BLOCK_SIZE // len(cells))
+        for i in range(0, len(queries), block):
+            block_lower = lower[i:i + block, np.newaxis]
+            block_upper = upper[i:i + block, np.newaxis]
+            inside = ((cells >= block_lower) & (cells <= block_upper)).all(axis=2)
+            query_index, cell_index = np.nonzero(inside)
+            query_parts.append(queries[i:i + block][query_index])
+            start_parts.append(self.__occupied_starts[cell_index])
+            count_parts.append(self.__occupied_counts[cell_index])
+        return query_parts, start_parts, count_parts
+
+    def radius_query(self, points, r):
+        """
+        All obstacles within a distance of the points, measured to the edge of the obstacles.
+
+        :param numpy_array points: (N, 2) or (N, 3) positions.
+        :param r: Search radius, or an (N,) array with the radius of every query.
+        :return: Query indices, obstacle indices and distances between the centres.
+        :rtype: tuple
+        """
+        self.__ensure_built()
+        xy = np.asarray(points, dtype=np.float64).reshape(len(points), -1)[:, :2]
+        r = np.broadcast_to(np.asarray(r, dtype=np.float64), (len(xy),))
+        reach = (r + self.__max_radius)[:, np.newaxis]
+        query, obstacle = self.__candidates(self.cells(xy - reach), self.cells(xy + reach))
+
+        distance = np.hypot(*(xy[query] - self.positions[obstacle]).T)
+        within = distance <= r[query] + self.radius[obstacle]
+        return query[within], obstacle[within], distance[within]
+
+    def nearest(self, points):
+        """
+        Nearest obstacle centre of every point.
+
+        The search radius starts at a cell, or at the distance to the grid for points outside of
+        it, and is doubled for the points that have no obstacle within it yet, until the search
+        window covers the whole grid. Points whose window has more cells than there are occupied
+        cells are compared against all obstacles instead.
+
+        :param numpy_array points: (N, 2) or (N, 3) positions.
+        :return: Index of the nearest obstacle, -1 if there are none, and the distance between
+                 the centres.
+        :rtype: tuple
+        """
+        self.__ensure_built()
+        xy = np.asarray(points, dtype=np.float64).reshape(len(points), -1)[:, :2]
+        nearest = np.full((len(xy),), -1, dtype=np.int64)
+        distance = np.full((len(xy),), np.inf)
+        if len(self.__sorted_ids) == 0:
+            return nearest, distance
+
+        # Beyond this radius the window of every point covers the whole grid.
+        grid_lower = self.__cell_min * self.cell_size
+        grid_upper = (self.__cell_max + 1) * self.cell_size
+        full_radius = np.maximum(np.abs(xy - grid_lower), np.abs(xy - grid_upper)).max(axis=1)
+
+        outside = np.maximum(np.maximum(grid_lower - xy, xy - grid_upper), 0.)
+        r = np.minimum(np.maximum(np.hypot(*outside.T), self.cell_size), full_radius)
+
+        remaining = np.arange(len(xy))
+        while len(remaining):
+            window_cells = (2 * r[remaining] / self.cell_size + 2) ** 2
+            brute_force = window_cells > len(self.__occupied_cells)
+            if brute_force.any():
+                nearest[remaining[brute_force]], distance[remaining[brute_force]] = \
+                    self.__nearest_all(xy[remaining[brute_force]])
+                remaining = remaining[~brute_force]
+                if len(remaining) == 0:
+                    break
+
+            sub = xy[remaining]
+            sub_r = r[remaining][:, np.newaxis]
+            query, obstacle = self.__candidates(self.cells(sub - sub_r), self.cells(sub + sub_r))
+            d = np.hypot(*(sub[query] - self.positions[obstacle]).T)
+
+            # Minimum per query, the pairs are sorted on the query.
+            order = np.lexsort((d, query))
+            query, obstacle, d = query[order], obstacle[order], d[order]
+            first = np.ones((len(query),), dtype=bool)
+            first[1:] = query[1:] != query[:-1]
+            query, obstacle, d = query[first], obstacle[first], d[first]
+
+            # Only exact if no obstacle outside the search radius can be closer.
+            done = (d <= sub_r[query, 0]) | (full_radius[remaining[query]] <= sub_r[query, 0])
+            nearest[remaining[query[done]]] = obstacle[done]
+            distance[remaining[query[done]]] = d[done]
+
+            unresolved = np.ones((len(remaining),), dtype=bool)
+            unresolved[query[done]] = False
+            remaining = remaining[unresolved]
+            r[remaining] = np.minimum(2 * r[remaining], full_radius[remaining])
+        return nearest, distance
+
+    def __nearest_all(self, xy):
+        """
+        Nearest obstacle of every point, compared against all obstacles in blocks of points.
+        """
+        ids = self.__sorted_ids
+        x, y = self.positions[ids].T
+        nearest = np.empty((len(xy),), dtype=np.int64)
+        distance2 = np.empty((len(xy),))
+        block = max(1, BLOCK_SIZE // len(ids))
+        for i in range(0, len(xy), block):
+            dx = xy[i:i + block, 0:1] - x
+            dy = xy[i:i + block, 1:2] - y
+            d2 = dx * dx + dy * dy
+            closest = d2.argmin(axis=1)
+            nearest[i:i + block] = ids[closest]
+            distance2[i:i + block] = d2[np.arange(len(d2)), closest]
+        return nearest, np.sqrt(distance2)
+
+    def segment_query(self, start, end, r=0.):
+        """
+        Obstacles passed by line segments, e.g. from the previous to the current position of
+        every vehicle, for collision and gate passing checks.
+
+        :param numpy_array start: (N, 2) or (N, 3) start points of the segments.
+        :param numpy_array end: (N, 2) or (N, 3) end points of the segments.
+        :param r: Radius around the segments, e.g. of the vehicles.
+        :return: Query indices, obstacle indices, the fraction of the segment at the point
+                 closest to the obstacle centre, in [0, 1], and the distance from it to the
+                 centre.
+        :rtype: tuple
+        """
+        self.__ensure_built()
+        a = np.asarray(start, dtype=np.float64).reshape(len(start), -1)[:, :2]
+        b = np.asarray(end, dtype=np.float64).reshape(len(end), -1)[:, :2]
+        r = np.broadcast_to(np.asarray(r, dtype=np.float64), (len(a),))
+        reach = (r + self.__max_radius)[:, np.newaxis]
+        query, obstacle = self.__candidates(self.cells(np.minimum(a, b) - reach),
+                                            self.cells(np.maximum(a, b) + reach))
+
+        direction = b[query] - a[query]
+        length2 = (direction ** 2).sum(axis=1)
+        relative = self.positions[obstacle] - a[query]
+        t = np.where(length2 > 0,
+                     (relative * direction).sum(axis=1) / np.where(length2 > 0, length2, 1.), 0.)
+        t = np.clip(t, 0., 1.)
+        distance = np.hypot(*(relative - t[:, np.newaxis] * direction).T)
+        within = distance <= r[query] + self.radius[obstacle]
+        return query[within], obstacle[within], t[within], distance[within]
+
+    def collisions(self, points, r):
+        """
+        Whether every point is within a distance of any obstacle.
+
+        :rtype: numpy_array
+        """
+        query, _, _ = self.radius_query(points, r)
+        colliding = np.zeros((len(points),), dtype=bool)
+        colliding[query] = True
+        return colliding
@@ -0,0 +1,317 @@
+"""
+Parallel sweeps over the controller gains, initial positions and command profiles.
+
+The cases of a sweep are rows of a structured array with the :data:`case_dtype` fields, created
+with :func:`grid` or :func:`random_cases`. :func:`run_sweep` divides them in batches which are
+simulated headless on a process pool. Every batch is flown as a single
+:class:`scaling_potato.fleet.QuadcopterFleet` with one controller gain per vehicle, so the
+cases within a batch are integrated and controlled in the same NumPy operations.
+"""
+
+import itertools
+import multiprocessing
+
+import numpy as np
+
+from scaling_potato.cache import config_hash
+from scaling_potato.fleet import QuadcopterFleet
+from scaling_potato.pid_control import PIDBank
+
+
+__author__ = "Aaron M. de Windt"
+
+
+case_dtype = np.dtype([
+    ("v_k_p", np.float64),
+    ("v_k_i", np.float64),
+    ("v_k_d", np.float64),
+    ("omega_k_p", np.float64),
+    ("omega_k_i", np.float64),
+    ("omega_k_d", np.float64),
+    ("init_x", np.float64, (3,)),
+    ("profile", np.int64),
+])
+
+metrics_dtype = np.dtype([
+    ("overshoot", np.float64),
+    ("settling_time", np.float64),
+    ("rms_error", np.float64),
+])
+
+result_dtype = np.dtype(case_dtype.descr + metrics_dtype.descr)
+
+# Gains used by Quadcopter and QuadcopterFleet.
+default_case = {
+    "v_k_p": 20., "v_k_i": 10., "v_k_d": 0.,
+    "omega_k_p": 5., "omega_k_i": 0., "omega_k_d": 0.,
+    "init_x": (0., 0., 0.),
+    "profile": 0,
+}
+
+
+class StepProfile(object):
+    """
+    Command profile stepping from zero to constant commands.
+
+    :param tuple v_command: Velocity command after the step.
+    :param tuple omega_command: Rotational rate command after the step.
+    :param float start: Time of the step.
+    """
+
+    def __init__(self, v_command=(0., 1., 0.), omega_command=(0., 0., 0.), start=0.):
+        self.v_command = np.array(v_command, dtype=np.float64)
+        self.omega_command = np.array(omega_command, dtype=np.float64)
+        self.start = start
+        self.__zero = np.zeros((3,))
+
+    def __call__(self, time, quadcopter=None):
+        if time < self.start:
+            return self.__zero, self.__zero
+        return self.v_command, self.omega_command
+
+
+class Uniform(object):
+    """
+    Uniform distribution of a case field for :func:`random_cases`. Integer fields are drawn
+    from the integers from low up to and including high.
+
+    :param low: Lower bound.
+    :param high: Upper bound.
+    """
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample(self, rng, shape, dtype):
+        if np.issubdtype(dtype, np.integer):
+            return rng.randint(self.low, self.high + 1, shape)
+        return rng.uniform(self.low, self.high, shape)
+
+
+def grid(**axes):
+    """
+    All combinations of the values given for the case fields. Fields that are not given get
+    the value from :data:`default_case`.
+
+    Example: ``grid(v_k_p=[10, 20, 40], v_k_i=[0, 5, 10], profile=[0, 1])``
+
+    :return: Structured array with :data:`case_dtype`.
+    :rtype: numpy_array
+    """
+    names = [name for name in case_dtype.names if name in axes]
+    unknown = set(axes) - set(names)
+    if unknown:
+        raise ValueError("Unknown case fields: {}.".format(", ".join(sorted(unknown))))
+
+    combinations = list(itertools.product(*[axes[name] for name in names]))
+    cases = _default_cases(len(combinations))
+    for i, values in enumerate(combinations):
+        for name, value in zip(names, values):
+            cases[name][i] = value
+    return cases
+
+
+def random_cases(n, seed=None, **distributions):
+    """
+    Randomly drawn cases for Monte Carlo runs.
+
+    Every distribution is either a :class:`Uniform` distribution, a sequence of values to choose
+    from, or a callable taking a ``numpy.random.RandomState`` and the number of cases and
+    returning the values. Fields that are not given get the value from :data:`default_case`.
+
+    Example: ``random_cases(1000, seed=1, v_k_p=Uniform(5, 50), profile=[0, 1, 2])``
+
+    :param int n: Number of cases.
+    :param int seed: Seed of the random number generator.
+    :return: Structured array with :data:`case_dtype`.
+    :rtype: numpy_array
+    """
+    unknown = set(distributions) - set(case_dtype.names)
+    if unknown:
+        raise ValueError("Unknown case fields: {}.".format(", ".join(sorted(unknown))))
+
+    rng = np.random.RandomState(seed)
+    cases = _default_cases(n)
+    for name in case_dtype.names:
+        if name not in distributions:
+            continue
+        distribution = distributions[name]
+        field = cases.dtype[name]
+        if isinstance(distribution, Uniform):
+            cases[name] = distribution.sample(rng, (n,) + field.shape, field.base)
+        elif callable(distribution):
+            cases[name] = distribution(rng, n)
+        else:
+            choices = np.asarray(distribution)
+            cases[name] = choices[rng.randint(len(choices), size=n)]
+    return cases
+
+
+def _default_cases(n):
+    cases = np.zeros((n,), dtype=case_dtype)
+    for name, value in default_case.items():
+        cases[name] = value
+    return cases
+
+
+def step_metrics(time, error, reference, band=0.02):
+    """
+    Metrics of the velocity error of a batch of step responses.
+
+    :param numpy_array time: (n_steps,) time of every step.
+    :param numpy_array error: (n_steps, N, 3) velocity error of every vehicle.
+    :param numpy_array reference: (N, 3) final velocity command of every vehicle.
+    :param float band: Settling band relative to the size of the final command.
+    :return: Structured array with :data:`metrics_dtype`. The overshoot is relative to the size
+             of the final command, the settling time is nan for responses that didn't settle.
+    :rtype: numpy_array
+    """
+    metrics = np.zeros((error.shape[1],), dtype=metrics_dtype)
+    size = np.linalg.norm(reference, axis=1)
+    scale = np.where(size > 0, size, 1.)
+    direction = reference / scale[:, np.newaxis]
+
+    # The error is command - velocity, so it's negative along the command when overshooting.
+    along = -np.einsum("tnj,nj->tn", error, direction)
+    metrics["overshoot"] = np.maximum(along.max(axis=0), 0) / scale
+
+    magnitude = np.linalg.norm(error, axis=2)
+    outside = magnitude > band * scale
+    settled = ~outside[-1]
+    # Index of the first sample after the last one outside the band.
+    last_outside = len(time) - 1 - np.argmax(outside[::-1], axis=0)
+    first_inside = np.where(outside.any(axis=0), last_outside + 1, 0)
+    metrics["settling_time"] = np.where(settled, time[np.minimum(first_inside, len(time) - 1)], np.nan)
+
+    metrics["rms_error"] = np.sqrt(np.mean(magnitude ** 2, axis=0))
+    return metrics
+
+
+def run_batch(cases, profiles, duration, dt=0.01, band=0.02):
+    """
+    Simulates a batch of cases as a single fleet.
+
+    :param numpy_array cases: Structured array with :data:`case_dtype`.
+    :param list profiles: Command profiles, command sources like those of
+                          :class:`scaling_potato.headless.HeadlessRunner` with the signature
+                          ``profile(time, quadcopter)`` returning the velocity and rotational
+                          rate commands. The batch is flown as a fleet, so the quadcopter is
+                          None.
+    :param float duration: Simulated time of every case.
+    :param float dt: Time step of the controllers.
+    :param float band: Settling band relative to the size of the final command.
+    :return: Structured array with :data:`result_dtype`.
+    :rtype: numpy_array
+    """
+    n = len(cases)
+    fleet = QuadcopterFleet(cases["init_x"])
+    fleet.v_pid = PIDBank(n, 3, cases["v_k_p"], cases["v_k_i"], cases["v_k_d"])
+    fleet.omega_pid = PIDBank(n, 3, cases["omega_k_p"], cases["omega_k_i"], cases["omega_k_d"])
+
+    n_steps = int(round(duration / dt))
+    times = np.arange(n_steps) * dt
+    errors = np.zeros((n_steps, n, 3))
+    v_command = np.zeros((n, 3))
+    omega_command = np.zeros((n, 3))
+    case_profiles = [profiles[profile] for profile in cases["profile"]]
+
+    for i in range(n_steps):
+        time = i * dt
+        fleet.step(time)
+        for j, profile in enumerate(case_profiles):
+            v_command[j], omega_command[j] = profile(time, None)
+        fleet.v_control(time, v_command)
+        fleet.omega_control(time, omega_command)
+        errors[i] = fleet.error
+
+    reference = np.array([profile(duration, None)[0] for profile in case_profiles]).reshape(n, 3)
+    metrics = step_metrics(times, errors, reference, band)
+
+    results = np.zeros((n,), dtype=result_dtype)
+    for name in case_dtype.names:
+        results[name] = cases[name]
+    for name in metrics_dtype.names:
+        results[name] = metrics[name]
+    return results
+
+
+def _run_batch(args):
+    return run_batch(*args)
+
+
+def run_sweep(cases, profiles=None, duration=5., dt=0.01, band=0.02, processes=None,
+              batch_size=128, cache=None):
+    """
+    Runs all cases on a process pool, without rendering.
+
+    :param numpy_array cases: Structured array with :data:`case_dtype`.
+    :param list profiles: Command profiles the ``profile`` field of the cases indexes. They must
+                          be picklable, e.g. :class:`StepProfile` or
+                          :class:`scaling_potato.command_stream.CommandStream` objects. By
+                          default a single 1 m/s forward velocity step.
+    :param float duration: Simulated time of every case.
+    :param float dt: Time step of the controllers.
+    :param float band: Settling band relative to the size of the final command.
+    :param int processes: Number of worker processes, None for one per cpu and 1 to run the
+                          cases in this process.
+    :param int batch_size: Number of cases simulated together as one fleet.
+    :param scaling_potato.cache.SimulationCache cache: Optional cache, batches that were run
+                                                       before are not simulated again.
+    :return: Structured array with :data:`result_dtype`, in the order of the cases.
+    :rtype: numpy_array
+    """
+    profiles = profiles or [StepProfile()]
+    batches = [(cases[i:i + batch_size], profiles, duration, dt, band)
+               for i in range(0, len(cases), batch_size)]
+
+    results = [None] * len(batches)
+    keys = [None] * len(batches)
+    if cache is not None:
+        for i, batch in enumerate(batches):
+            keys[i] = config_hash("sweep_batch", batch)
+            cached = cache.get(keys[i])
+            if cached is not None:
+                cache.hits += 1
+                results[i] = cached["results"]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    if processes == 1:
+        ran = [_run_batch(batches[i]) for i in missing]
+    elif missing:
+        pool = multiprocessing.Pool(processes)
+        try:
+            ran = pool.map(_run_batch, [batches[i] for i in missing], chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        ran = []
+
+    for i, result in zip(missing, ran):
+        results[i] = result
+        if cache is not None:
+            cache.misses += 1
+            cache.put(keys[i], {"results": result})
+
+    if not results:
+        return np.zeros((0,), dtype=result_dtype)
+    return np.concatenate(results)
+
+
+def save_results(path, results):
+    """
+    Saves a results table as csv, with the vector fields split into one column per component.
+    """
+    columns = []
+    header = []
+    for name in results.dtype.names:
+        values = results[name]
+        if values.ndim == 1:
+            columns.append(values)
+            header.append(name)
+        else:
+            for i in range(values.shape[1]):
+                columns.append(values[:, i])
+                header.append("{}_{}".format(name, i))
+    np.savetxt(path, np.column_stack(columns), delimiter=",", header=",".join(header), comments="")
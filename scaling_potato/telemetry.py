@@ -0,0 +1,306 @@
+"""
+Telemetry recording into memory mapped columnar files.
+
+Every column is stored in its own raw binary file, one fixed size row per step, and described
+in a ``telemetry.json`` file next to them. The files are memory mapped and grow in chunks of
+rows, so recording a step is only a copy into the mapped memory. Writing the pages back to disk
+is left to the operating system and to a background thread, which also keeps the number of
+recorded rows in ``telemetry.json`` up to date.
+"""
+
+from collections import OrderedDict
+import json
+import os
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import numpy as np
+
+
+__author__ = "Aaron M. de Windt"
+
+
+META_FILE = "telemetry.json"
+VERSION = 1
+
+
+def quadcopter_columns(n_vehicles=1):
+    """
+    Columns recorded by :meth:`TelemetryRecorder.record_quadcopters`.
+
+    :param int n_vehicles: Number of quadcopters recorded every step.
+    :return: Ordered dictionary mapping the column names to the shape of a row.
+    :rtype: collections.OrderedDict
+    """
+    return OrderedDict([
+        ("state", (n_vehicles, 13)),
+        ("v_command", (n_vehicles, 3)),
+        ("omega_command", (n_vehicles, 3)),
+        ("a_b", (n_vehicles, 3)),
+        ("omega_dot", (n_vehicles, 3)),
+        ("error", (n_vehicles, 3)),
+    ])
+
+
+class TelemetryRecorder(object):
+    """
+    Records a time column and any number of fixed shape columns, one row per step.
+
+    :param str path: Directory the files are written to, it's created if needed.
+    :param dict columns: Ordered dictionary mapping the column names to the shape of a row.
+    :param int chunk_size: Number of rows the files grow by when they are full.
+    :param dtype: Data type of the columns, the time is always stored as float64.
+    """
+
+    def __init__(self, path, columns, chunk_size=4096, dtype=np.float64):
+        if "time" in columns:
+            raise ValueError("The time column is recorded implicitly.")
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self.length = 0
+        self.capacity = 0
+
+        self.columns = OrderedDict([("time", ((), np.dtype(np.float64)))])
+        for name, shape in columns.items():
+            self.columns[name] = (tuple(shape), np.dtype(dtype))
+
+        self.arrays = OrderedDict()
+        for name in self.columns:
+            open(self.file_path(name), "wb").close()
+        self.__write_meta(0)
+
+        self.__jobs = queue.Queue()
+        self.__flush_pending = threading.Event()
+        self.__thread = threading.Thread(target=self.__flush_worker, name="telemetry_flush")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+        self.__grow()
+
+    def file_path(self, name):
+        return os.path.join(self.path, name + ".bin")
+
+    def __grow(self):
+        """
+        Grows the files by a chunk and maps them again. The old maps are flushed by the
+        background thread.
+        """
+        old_arrays = list(self.arrays.values())
+        self.capacity += self.chunk_size
+        for name, (shape, dtype) in self.columns.items():
+            row_size = int(np.prod(shape)) * dtype.itemsize
+            with open(self.file_path(name), "r+b") as f:
+                f.truncate(self.capacity * row_size)
+            self.arrays[name] = np.memmap(self.file_path(name), dtype=dtype, mode="r+",
+                                          shape=(self.capacity,) + shape)
+        if old_arrays:
+            self.__jobs.put((old_arrays, self.length))
+
+    def append(self, time, **values):
+        """
+        Records a row.
+
+        :param float time: Time of the row.
+        :param values: Values of the columns, columns without a value are set to zero.
+        :return: Index of the row.
+        :rtype: int
+        """
+        row = self.length
+        if row == self.capacity:
+            self.__grow()
+
+        self.arrays["time"][row] = time
+        for name, array in self.arrays.items():
+            if name == "time":
+                continue
+            value = values.get(name)
+            array[row] = 0 if value is None else value
+        self.length = row + 1
+        return row
+
+    def record_quadcopters(self, time, quadcopters, v_commands, omega_commands):
+        """
+        Records the state, commands and controller outputs of quadcopters. The recorder must have
+        been created with the columns from :func:`quadcopter_columns`.
+
+        :param float time: Simulation time.
+        :param list quadcopters: List of :class:`scaling_potato.quadcopter.Quadcopter` objects.
+        :param list v_commands: Velocity command of each quadcopter.
+        :param list omega_commands: Rotational rate command of each quadcopter.
+        :return: Index of the row.
+        :rtype: int
+        """
+        row = self.length
+        if row == self.capacity:
+            self.__grow()
+
+        arrays = self.arrays
+        arrays["time"][row] = time
+        for i, quadcopter in enumerate(quadcopters):
+            arrays["state"][row, i] = quadcopter.state_vector
+            arrays["v_command"][row, i] = v_commands[i]
+            arrays["omega_command"][row, i] = omega_commands[i]
+            arrays["a_b"][row, i] = quadcopter.v_pid.output
+            arrays["omega_dot"][row, i] = quadcopter.omega_dot
+            if quadcopter.error is not None:
+                arrays["error"][row, i] = quadcopter.error
+        self.length = row + 1
+        return row
+
+    def flush(self, wait=False):
+        """
+        Writes the recorded rows back to disk and updates the number of rows in the meta data
+        file on the background thread. Flushes requested while one is pending are merged.
+
+        :param bool wait: If True, block until the flush has completed.
+        """
+        if not self.__flush_pending.is_set():
+            self.__flush_pending.set()
+            self.__jobs.put("flush")
+        if wait:
+            self.__jobs.join()
+
+    def close(self):
+        """
+        Flushes all rows, stops the background thread and trims the files to the recorded rows.
+        """
+        if self.__thread is None:
+            return
+        self.flush()
+        self.__jobs.put(None)
+        self.__thread.join()
+        self.__thread = None
+
+        self.arrays = OrderedDict()
+        for name, (shape, dtype) in self.columns.items():
+            with open(self.file_path(name), "r+b") as f:
+                f.truncate(self.length * int(np.prod(shape)) * dtype.itemsize)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __flush_worker(self):
+        while True:
+            job = self.__jobs.get()
+            try:
+                if job is None:
+                    return
+                if job == "flush":
+                    # Flushes everything recorded so far, including the rows recorded after the
+                    # flush was requested.
+                    self.__flush_pending.clear()
+                    length = self.length
+                    arrays = list(self.arrays.values())
+                else:
+                    arrays, length = job
+                for array in arrays:
+                    array.flush()
+                self.__write_meta(length)
+            finally:
+                self.__jobs.task_done()
+
+    def __write_meta(self, length):
+        meta = {
+            "version": VERSION,
+            "length": length,
+            "columns": OrderedDict((name, {"shape": list(shape), "dtype": dtype.str})
+                                   for name, (shape, dtype) in self.columns.items()),
+        }
+        # Written to a temporary file first, so readers never see a partial file.
+        meta_path = os.path.join(self.path, META_FILE)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+
+class TelemetryReader(object):
+    """
+    Lazily opens a recorded telemetry run.
+
+    The columns are only memory mapped when they are first accessed, and slicing them doesn't
+    read anything from disk until the data is used, so runs much larger than the memory can be
+    opened. A run that's still being recorded can be read up to the last flush, call
+    :meth:`refresh` to pick up newer rows.
+
+    :param str path: Directory the run was recorded to.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.length = 0
+        self.columns = OrderedDict()
+        self.__arrays = {}
+        self.refresh()
+
+    def refresh(self):
+        """
+        Reloads the meta data, the columns are mapped again when they are accessed.
+        """
+        with open(os.path.join(self.path, META_FILE)) as f:
+            meta = json.load(f, object_pairs_hook=OrderedDict)
+        if meta["version"] != VERSION:
+            raise ValueError("Unsupported telemetry version {}.".format(meta["version"]))
+
+        self.length = meta["length"]
+        self.columns = OrderedDict((name, (tuple(column["shape"]), np.dtype(column["dtype"])))
+                                   for name, column in meta["columns"].items())
+        self.__arrays = {}
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        """
+        Column with the given name as a read-only memory mapped array.
+
+        :rtype: numpy_array
+        """
+        if name not in self.__arrays:
+            shape, dtype = self.columns[name]
+            if self.length == 0:
+                self.__arrays[name] = np.zeros((0,) + shape, dtype=dtype)
+            else:
+                self.__arrays[name] = np.memmap(os.path.join(self.path, name + ".bin"),
+                                                dtype=dtype, mode="r",
+                                                shape=(self.length,) + shape)
+        return self.__arrays[name]
+
+    @property
+    def time(self):
+        return self["time"]
+
+    def time_range(self, start=None, end=None):
+        """
+        Rows with a time in [start, end), assuming the time increases monotonically.
+
+        :param float start: Start time, None for the start of the run.
+        :param float end: End time, None for the end of the run.
+        :rtype: slice
+        """
+        time = self.time
+        i_start = 0 if start is None else int(np.searchsorted(time, start, side="left"))
+        i_end = self.length if end is None else int(np.searchsorted(time, end, side="left"))
+        return slice(i_start, i_end)
+
+    def slice(self, start=None, end=None, columns=None):
+        """
+        Views on the rows in the time range [start, end).
+
+        :param float start: Start time, None for the start of the run.
+        :param float end: End time, None for the end of the run.
+        :param list columns: Names of the columns, None for all of them.
+        :return: Ordered dictionary mapping the column names to the views.
+        :rtype: collections.OrderedDict
+        """
+        rows = self.time_range(start, end)
+        return OrderedDict((name, self[name][rows]) for name in (columns or self.columns))
@@ -0,0 +1,125 @@
+import numpy as np
+
+
+__author__ = "Aaron M. de Windt"
+
+
+def quat2tmat(quat, out=None):
+    """Transformation matrix from the body to the inertial frame.
+
+    Works on a single quaternion (4,) giving a (3, 3) matrix, or on a (N, 4) array of
+    quaternions giving a (N, 3, 3) array of matrices.
+
+    :param quat: Quaternion(s) with the real part first, like Panda3d.
+    :type quat: numpy_array
+    :param out: Optional array the matrices are written into.
+    :type out: numpy_array
+    :return: Transformation matrices.
+    :rtype: numpy_array
+    """
+    quat = np.asarray(quat)
+    if out is None:
+        out = np.empty(quat.shape[:-1] + (3, 3))
+
+    w = quat[..., 0]
+    x = quat[..., 1]
+    y = quat[..., 2]
+    z = quat[..., 3]
+
+    out[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    out[..., 0, 1] = 2 * (x * y - w * z)
+    out[..., 0, 2] = 2 * (x * z + w * y)
+    out[..., 1, 0] = 2 * (x * y + w * z)
+    out[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    out[..., 1, 2] = 2 * (y * z - w * x)
+    out[..., 2, 0] = 2 * (x * z - w * y)
+    out[..., 2, 1] = 2 * (y * z + w * x)
+    out[..., 2, 2] = 1 - 2 * (x * x + y * y)
+
+    return out
+
+
+def to_inertial(tmat_ib, v, out=None):
+    """Transforms vectors from the body to the inertial frame.
+
+    :param tmat_ib: (3, 3) or (N, 3, 3) transformation matrices from the body to inertial frame.
+    :type tmat_ib: numpy_array
+    :param v: (3,) or (N, 3) vectors in the body frame.
+    :type v: numpy_array
+    :param out: Optional array the result is written into.
+    :type out: numpy_array
+    :return: Vectors in the inertial frame.
+    :rtype: numpy_array
+    """
+    return np.einsum("...ij,...j->...i", tmat_ib, v, out=out)
+
+
+def to_body(tmat_ib, v, out=None):
+    """Transforms vectors from the inertial to the body frame.
+
+    :param tmat_ib: (3, 3) or (N, 3, 3) transformation matrices from the body to inertial frame.
+    :type tmat_ib: numpy_array
+    :param v: (3,) or (N, 3) vectors in the inertial frame.
+    :type v: numpy_array
+    :param out: Optional array the result is written into.
+    :type out: numpy_array
+    :return: Vectors in the body frame.
+    :rtype: numpy_array
+    """
+    return np.einsum("...ji,...j->...i", tmat_ib, v, out=out)
+
+
+def tmat2hpr(tmat_ib):
+    """Heading, pitch and roll in degrees, using the same convention as Panda3d's getHpr.
+
+    :param tmat_ib: (3, 3) or (N, 3, 3) transformation matrices from the body to inertial frame.
+    :type tmat_ib: numpy_array
+    :return: (3,) or (N, 3) array with the heading, pitch and roll.
+    :rtype: numpy_array
+    """
+    tmat_ib = np.asarray(tmat_ib)
+    hpr = np.empty(tmat_ib.shape[:-2] + (3,))
+    hpr[..., 0] = np.arctan2(-tmat_ib[..., 0, 1], tmat_ib[..., 1, 1])
+    hpr[..., 1] = np.arcsin(np.clip(tmat_ib[..., 2, 1], -1., 1.))
+    hpr[..., 2] = np.arctan2(-tmat_ib[..., 2, 0], tmat_ib[..., 2, 2])
+    return np.degrees(hpr, out=hpr)
+
+
+class RotationCache(object):
+    """
+    Caches the transformation matrices derived from a quaternion, or array of quaternions.
+
+    The matrices are only recomputed when the quaternions differ from the ones they were last
+    computed for.
+    """
+
+    def __init__(self):
+        self.__quat = None
+        self.__tmat_ib = None
+        self.__hpr = None
+
+    def invalidate(self):
+        self.__quat = None
+
+    def tmat_ib(self, quat):
+        """
+        Transformation matrices from the body to the inertial frame for the quaternions.
+        """
+        if self.__quat is None or self.__quat.shape != quat.shape:
+            self.__quat = np.array(quat)
+            self.__tmat_ib = quat2tmat(quat)
+            self.__hpr = None
+        elif not np.array_equal(self.__quat, quat):
+            self.__quat[...] = quat
+            quat2tmat(quat, out=self.__tmat_ib)
+            self.__hpr = None
+        return self.__tmat_ib
+
+    def hpr(self, quat):
+        """
+        Heading, pitch and roll in degrees for the quaternions.
+        """
+        tmat_ib = self.tmat_ib(quat)
+        if self.__hpr is None:
+            self.__hpr = tmat2hpr(tmat_ib)
+        return self.__hpr
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+
+
+__author__ = "Aaron M. de Windt"
+
+
+# HSV range of the orange pilons. OpenCV uses hues in [0, 180).
+PILON_HSV_LOWER = (5, 120, 120)
+PILON_HSV_UPPER = (25, 255, 255)
+
+
+def pilon_pipeline(n_threads=0, scale=0.5, lower=PILON_HSV_LOWER, upper=PILON_HSV_UPPER, min_area=4.):
+    """
+    Creates a native pipeline detecting the pilons in BGR camera frames.
+
+    The frames are downscaled, converted to HSV and thresholded, the pipeline returns one blob
+    per pilon in view.
+
+    :param int n_threads: Number of worker threads, 0 for one per hardware thread.
+    :param float scale: Factor the frames are downscaled with before the detection.
+    :param tuple lower: Lower HSV bound of the pilon colour.
+    :param tuple upper: Upper HSV bound of the pilon colour.
+    :param float min_area: Minimum area of a blob in pixels of the input frame.
+    :rtype: scaling_potato.scaling_potato_c.FramePipeline
+    """
+    from scaling_potato.scaling_potato_c import FramePipeline, COLOR_BGR2HSV
+
+    pipeline = FramePipeline(n_threads)
+    if scale != 1:
+        pipeline.add_resize(scale)
+    pipeline.add_convert_color(COLOR_BGR2HSV)
+    pipeline.add_color_blobs(lower, upper, min_area)
+    return pipeline
+
+
+class FrameProcessor(object):
+    """
+    Runs a native frame pipeline on the frames delivered by camera readbacks.
+
+    The frames delivered during a render frame are collected and processed in a single call
+    to the pipeline, which divides them over its worker threads. The results are stored in
+    :attr:`results` with the key the camera was added with, and passed to the subscribers.
+
+    :param direct.showbase.ShowBase.ShowBase pbase: Main Panda3d ShowBase.
+    :param scaling_potato.scaling_potato_c.FramePipeline pipeline: Pipeline run on the frames.
+    :param int sort: Sort of the processing task, it must run after the readback pipeline.
+    """
+
+    def __init__(self, pbase, pipeline, sort=56):
+        self.pipeline = pipeline
+        self.pending = OrderedDict()
+        self.results = {}
+        self.subscribers = []
+        self.task = pbase.taskMgr.add(self.update_task, "frame_processor", sort=sort)
+
+    def add_camera(self, key, readback):
+        """
+        Processes the frames delivered by a camera readback.
+
+        :param key: Key the results of this camera are stored with.
+        :param scaling_potato.readback.CameraReadback readback: Readback of the camera.
+        """
+        def collect(frame):
+            self.pending[key] = frame
+        readback.subscribe(collect)
+
+    def subscribe(self, callback):
+        """
+        Adds a callback that's called with a dictionary mapping the camera keys to the blobs
+        found in their latest frames.
+        """
+        self.subscribers.append(callback)
+
+    def update(self):
+        if not self.pending:
+            return
+
+        keys = list(self.pending.keys())
+        blobs = self.pipeline.process([self.pending[key].image for key in keys])
+        self.pending.clear()
+
+        results = OrderedDict(zip(keys, blobs))
+        self.results.update(results)
+        for callback in self.subscribers:
+            callback(results)
+
+    def update_task(self, task):
+        self.update()
+        return task.cont
@@ -1,20 +1,26 @@
 import sys
 import os
 from direct.showbase.ShowBase import ShowBase
-from panda3d.core import Point3, VBase4, TextNode
+from panda3d.core import Point3, VBase4, TextNode, ClockObject
 from panda3d.core import AmbientLight, DirectionalLight, PointLight
 from direct.task import Task
 from direct.gui.DirectGui import *
-from collections import OrderedDict
 import enum
 
-quat_params = ("x", "v_i", "a_i", "v_b", "a_b", "roll", "pitch", "yaw", "omega", "omega_dot", "error")
-
 from math import pi, sin, cos
 
 import numpy as np
 
 from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.scheduler import FixedRateScheduler
+from scaling_potato.readback import ReadbackPipeline
+from scaling_potato.telemetry import TelemetryRecorder, quadcopter_columns
+from scaling_potato.command_stream import CommandRecorder
+from scaling_potato.profiler import FrameProfiler
+from scaling_potato.hud import QuadcopterHud
+from scaling_potato.assets import BamCache, ModelCache
+from scaling_potato.course import CourseRenderer, as_course
+from scaling_potato.spatial import ObstacleIndex
 
 __author__ = "Aaron M. de Windt"
 
@@ -46,10 +52,41 @@ class mv(enum.Enum):
 
 
 class World(ShowBase):
-    def __init__(self, pilons=None):
+    """
+    Interactive simulation of a quadcopter.
+
+    The physics and controllers run at a fixed rate on their own scheduler, the frame rate is
+    limited separately.
+
+    :param list pilons: List with the colour and (x, y) position of each pilon, a course array or
+                        the path of a course file, see :mod:`scaling_potato.course`.
+    :param float physics_rate: Rate in Hz of the physics and control loops.
+    :param float render_rate: Maximum frame rate in Hz.
+    :param str telemetry_path: Optional directory the telemetry of every physics step is
+                               recorded to.
+    :param str commands_path: Optional ``.npz`` file the commands of every physics step are
+                              saved to on exit, to replay the flight with
+                              :func:`scaling_potato.command_stream.replay`.
+    :param bool profile: If True the frame profiler starts enabled, it's toggled with "p".
+    :param str profile_path: Optional ``.json`` or ``.csv`` file the profiler statistics are
+                             dumped to every ``profile_interval`` seconds while it's enabled.
+    :param float profile_interval: Wall clock time in seconds between the profiler dumps.
+    :param float hud_rate: Maximum number of HUD refreshes per second.
+    :param str asset_cache_path: Directory of the converted models, by default
+                                 :func:`scaling_potato.assets.default_cache_path`.
+    """
+
+    def __init__(self, pilons=None, physics_rate=1000., render_rate=60., telemetry_path=None,
+                 commands_path=None, profile=False, profile_path=None, profile_interval=5.,
+                 hud_rate=10., asset_cache_path=None):
         ShowBase.__init__(self)
 
-        self.pilons = pilons or []
+        globalClock.setMode(ClockObject.MLimited)
+        globalClock.setFrameRate(render_rate)
+
+        self.pilons = as_course(pilons)
+        # Shared with the quadcopter, see scaling_potato.assets.shared_model_cache.
+        self.model_cache = ModelCache(self.loader, BamCache(asset_cache_path))
 
         # Disable the camera trackball controls.
         # self.disableMouse()
@@ -83,19 +120,47 @@ class World(ShowBase):
         self.load_pilons()
 
         self.taskMgr.add(self.main_loop, "main_loop")
-        self.quadcopter_text = OrderedDict([(name, addInstructions((1 + i) * 0.06, name)) for i, name in enumerate(quat_params)])
 
-        self.quadcopter = Quadcopter([0, -20, 1.5], self)
+        self.readback = ReadbackPipeline(self)
+        self.quadcopter = Quadcopter([0, -20, 1.5], self, readback=self.readback)
+        self.hud = QuadcopterHud(self.quadcopter, lambda i, name: addInstructions((1 + i) * 0.06, name),
+                                 rate=hud_rate)
         self.movements = []
 
-    def update_quatcopter_text(self):
-        formatter = {"float_kind": lambda x: "{:10.4f}".format(x)}
-        for name, text_node in self.quadcopter_text.iteritems():
-            value = getattr(self.quadcopter, name)
-            if isinstance(value, np.ndarray):
-                value = np.array2string(value, formatter=formatter)
+        self.scheduler = FixedRateScheduler(physics_rate)
+        self.scheduler.add(self.physics_step)
+
+        self.recorder = None
+        if telemetry_path is not None:
+            self.recorder = TelemetryRecorder(telemetry_path, quadcopter_columns())
+
+        self.commands_path = commands_path
+        self.command_recorder = None
+        if commands_path is not None:
+            self.command_recorder = CommandRecorder(self.scheduler.dt, self.quadcopter.x)
+
+        self.profiler = FrameProfiler()
+        self.profiler.instrument(self.quadcopter, "step", "integration")
+        self.profiler.instrument(self.quadcopter, "v_control")
+        self.profiler.instrument(self.quadcopter, "omega_control")
+        self.profiler.instrument(self, "update_quatcopter_text", "hud")
+        self.profiler.instrument(self.readback, "update", "readback")
+        self.profiler.attach(self, overlay=True, dump_path=profile_path,
+                             dump_interval=profile_interval, font=self.font_ubuntu_mono)
+        if profile:
+            self.profiler.enable()
+        self.accept("p", self.profiler.toggle)
+
+        self.exitFunc = self.close_recorders
+
+    def close_recorders(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.command_recorder is not None:
+            self.command_recorder.save(self.commands_path)
 
-            text_node.setText("{:10} {}".format(name, value))
+    def update_quatcopter_text(self):
+        self.hud.update(globalClock.getFrameTime())
 
     def handle_key_press(self, movement, down):
         if down:
@@ -105,11 +170,31 @@ class World(ShowBase):
             if movement in self.movements:
                 self.movements.remove(movement)
 
-    # Define a procedure to move the camera.
     def main_loop(self, task):
-        self.quadcopter.step(task.time)
+        alpha = self.scheduler.advance(globalClock.getDt())
+        self.quadcopter.sync_node_path(alpha)
         self.update_quatcopter_text()
+        return Task.cont
+
+    def physics_step(self, time):
+        """
+        Runs the physics and control loops for a single fixed time step.
+        """
+        self.quadcopter.step(time)
+        v_command, omega_command = self.movement_commands()
+        self.quadcopter.v_control(time, v_command)
+        self.quadcopter.omega_control(time, omega_command)
+        if self.recorder is not None:
+            self.recorder.record_quadcopters(time, [self.quadcopter], [v_command], [omega_command])
+        if self.command_recorder is not None:
+            self.command_recorder.record(time, v_command, omega_command)
+        # self.quadcopter.a_b = np.array(v_command)
+        # self.quadcopter.omega_dot = [0.01, 0, 0]
 
+    def movement_commands(self):
+        """
+        Velocity and rotational rate commands for the keys currently pressed.
+        """
         v_command = np.zeros((3,))
         omega_command = np.zeros((3,))
         if mv.forward in self.movements:
@@ -138,16 +223,10 @@ class World(ShowBase):
         if mv.rotate_right in self.movements:
             omega_command += [0, 0, -1]
 
-        self.quadcopter.v_control(task.time, v_command*3)
-        self.quadcopter.omega_control(task.time, omega_command)
-        # self.quadcopter.a_b = np.array(v_command)
-        # self.quadcopter.omega_dot = [0.01, 0, 0]
-
-        return Task.cont
+        return v_command*3, omega_command
 
     def load_scene(self):
-        self.scene_model = self.loader.loadModel("models/scene.egg")
-        self.scene_model.reparentTo(self.render)
+        self.scene_model = self.model_cache.copy("models/scene.egg", self.render)
 
         self.alight = AmbientLight('alight')
         self.alight.setColor(VBase4(0.1, 0.1, 0.1, 1))
@@ -179,20 +258,17 @@ class World(ShowBase):
         self.trackball.node().setPos(0, 20, -3)
 
     def load_pilons(self):
-        self.pilon_models = []
-
-        for color, position in self.pilons:
-            pilon_model = self.loader.loadModel("models/pilon.egg")
-            pilon_model.setPos(position[0], position[1], 0)
-            pilon_model.reparentTo(self.render)
-            self.pilon_models.append(pilon_model)
+        self.course_renderer = CourseRenderer(self.render, self.pilons,
+                                              self.model_cache.get("models/pilon.egg"))
+        self.obstacles = ObstacleIndex.from_course(self.pilons)
 
 
-pilons = [
+default_pilons = [
     [None, (0, 0)],
     [None, (3, 2)],
     [None, (-9, 3)],
 ]
 
-app = World(pilons)
-app.run()
+
+if __name__ == "__main__":
+    World(default_pilons).run()
@@ -63,7 +63,8 @@ def create_scaling_potato_ext():
                     library_dirs=sc.lib_dirs,
                     libraries=sc.libraries,
                     language="c++",
-                    extra_compile_args=["-g", "-std=c++11"], #, "/Od", "/MDd"], # for release version change /Od compile arg to /O2 (optimization for maximum speed)
+                    extra_compile_args=["-g", "-O2", "-std=c++11", "-pthread"], #, "/Od", "/MDd"], # for release version change /Od compile arg to /O2 (optimization for maximum speed)
+                    extra_link_args=["-pthread"],
                     # extra_link_args=["-debug"], # leave this enabled for release! :)))
                     define_macros = [('PYTHON_EXT', '1')]
                     )
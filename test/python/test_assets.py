@@ -0,0 +1,116 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from panda3d.core import getModelPath, DSearchPath, Filename
+
+from scaling_potato.assets import BamCache, ModelCache, shared_model_cache
+from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.headless import offscreen_base
+
+
+TRIANGLE_EGG = """<CoordinateSystem> { Z-Up }
+<VertexPool> triangle {
+  <Vertex> 0 { 0 0 0 }
+  <Vertex> 1 { {size} 0 0 }
+  <Vertex> 2 { 0 {size} 0 }
+}
+<Polygon> { <VertexRef> { 0 1 2 <Ref> { triangle } } }
+"""
+
+
+def restore_model_path(saved):
+    """
+    Restores the model path saved with ``DSearchPath(getModelPath().getValue())``.
+
+    ``clear()`` resets the model path to the configured directories, the directories that were
+    added around them before are added again.
+    """
+    model_path = getModelPath()
+    model_path.clear()
+    configured = [model_path.getDirectory(i) for i in range(model_path.getNumDirectories())]
+    directories = [saved.getDirectory(i) for i in range(saved.getNumDirectories())]
+    for start in range(len(directories) - len(configured) + 1):
+        if directories[start:start + len(configured)] == configured:
+            break
+    for directory in reversed(directories[:start]):
+        model_path.prependDirectory(directory)
+    for directory in directories[start + len(configured):]:
+        model_path.appendDirectory(directory)
+
+
+def write_egg(path, size=1):
+    with open(path, "w") as f:
+        f.write(TRIANGLE_EGG.replace("{size}", str(size)))
+
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.base = offscreen_base()
+        self.path = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.path, "models"))
+        self.egg_path = os.path.join(self.path, "models", "triangle.egg")
+        write_egg(self.egg_path)
+        self.model_path = DSearchPath(getModelPath().getValue())
+        getModelPath().prependDirectory(Filename.fromOsSpecific(self.path))
+        self.cache_path = os.path.join(self.path, "cache")
+
+    def tearDown(self):
+        restore_model_path(self.model_path)
+        shutil.rmtree(self.path)
+
+    def size(self, model):
+        bounds = model.getTightBounds()
+        return bounds[1][0] - bounds[0][0]
+
+    def test_bam_cache(self):
+        cache = BamCache(self.cache_path)
+        model = cache.load(self.base.loader, "models/triangle.egg")
+        self.assertEqual(cache.n_converted, 1)
+        self.assertAlmostEqual(self.size(model), 1.)
+        self.assertTrue(os.path.exists(cache.bam_path(self.egg_path)))
+
+        # A later launch loads the conversion.
+        cache = BamCache(self.cache_path)
+        model = cache.load(self.base.loader, "models/triangle.egg")
+        self.assertEqual((cache.n_converted, cache.n_hits), (0, 1))
+        self.assertAlmostEqual(self.size(model), 1.)
+
+        # A changed model is converted again.
+        write_egg(self.egg_path, 2)
+        model = cache.load(self.base.loader, "models/triangle.egg")
+        self.assertEqual(cache.n_converted, 1)
+        self.assertAlmostEqual(self.size(model), 2.)
+        self.assertEqual(len(os.listdir(self.cache_path)), 2)
+
+        cache.clear()
+        self.assertEqual(os.listdir(self.cache_path), [])
+        self.assertRaises(IOError, cache.load, self.base.loader, "models/missing.egg")
+
+    def test_model_cache(self):
+        bam_cache = BamCache(self.cache_path)
+        models = ModelCache(self.base.loader, bam_cache)
+        model = models.get("models/triangle.egg")
+        self.assertIs(models.get("models/triangle.egg"), model)
+        self.assertEqual(bam_cache.n_converted, 1)
+        self.assertEqual(bam_cache.n_hits, 0)
+
+    def test_shared_by_vehicles(self):
+        write_egg(os.path.join(self.path, "models", "plane.egg"))
+        try:
+            quadcopters = [Quadcopter([i, 0, 0], self.base, cameras=False) for i in range(3)]
+            models = shared_model_cache(self.base)
+            self.assertIs(shared_model_cache(self.base), models)
+            self.assertEqual(list(models.models), ["models/plane.egg"])
+            for quadcopter in quadcopters:
+                self.assertAlmostEqual(self.size(quadcopter.model), 1.)
+                quadcopter.node_path.removeNode()
+        finally:
+            del self.base.model_cache
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+from __future__ import absolute_import
+
+import unittest
+
+from panda3d.core import NodePath
+
+from scaling_potato.atlas import CameraAtlas
+from scaling_potato.readback import ReadbackPipeline
+from scaling_potato.headless import offscreen_base
+
+import numpy.testing as npt
+
+
+class TestCameraAtlas(unittest.TestCase):
+    def setUp(self):
+        self.base = offscreen_base()
+        self.pipeline = ReadbackPipeline(self.base)
+        self.atlas = CameraAtlas(self.base, 3, tile_size=(16, 8), readback=self.pipeline)
+        self.parent = NodePath("atlas_test")
+        colors = [(1, 0, 0, 1), (0, 1, 0, 1), (0, 0, 1, 1)]
+        self.tiles = [self.atlas.add_camera(self.parent, clear_color=color) for color in colors]
+
+    def tearDown(self):
+        self.atlas.remove()
+        self.pipeline.task.remove()
+
+    def render(self, n):
+        for i in range(n):
+            self.base.graphicsEngine.renderFrame()
+            self.pipeline.cameras[0].update(i, i * 0.1)
+
+    def test_layout(self):
+        self.assertEqual((self.atlas.columns, self.atlas.rows), (2, 2))
+        self.assertEqual(self.atlas.buffer.getXSize(), 32)
+        self.assertEqual(self.atlas.tile_bounds(0), (0, 0.5, 0.5, 1))
+        self.assertEqual(self.atlas.tile_bounds(2), (0, 0.5, 0, 0.5))
+        self.assertRaises(ValueError, self.atlas.add_camera, self.parent)
+
+    def test_only_read_back_when_subscribed(self):
+        self.render(3)
+        self.assertEqual(self.atlas.readback.n_triggered, 0)
+
+        once = []
+        self.tiles[1].subscribe(once.append, once=True)
+        self.render(6)
+        self.assertEqual(len(once), 1)
+        self.assertEqual(self.atlas.readback.n_triggered, 1)
+
+    def test_tile_images(self):
+        frames = [[] for _ in self.tiles]
+        for tile, tile_frames in zip(self.tiles, frames):
+            tile.subscribe(tile_frames.append)
+        self.render(4)
+
+        self.assertEqual(self.atlas.readback.n_triggered, 4)
+        self.assertEqual(len(frames[0]), 3)
+        for tile_frames, bgr in zip(frames, [(0, 0, 255), (0, 255, 0), (255, 0, 0)]):
+            image = tile_frames[-1].image
+            self.assertEqual(image.shape[:2], (8, 16))
+            npt.assert_array_equal(image[..., :3].reshape(-1, 3).min(axis=0), bgr)
+            npt.assert_array_equal(image[..., :3].reshape(-1, 3).max(axis=0), bgr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from scaling_potato.cache import SimulationCache, config_hash, quadcopter_config
+from scaling_potato.command_stream import CommandStream, replay_trajectory
+from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.sweep import StepProfile, grid, run_sweep
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestSimulationCache(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_config_hash(self):
+        a = config_hash(np.zeros(3), {"k_p": 20., "k_i": 10.}, StepProfile((0, 1, 0)))
+        self.assertEqual(a, config_hash(np.zeros(3), {"k_i": 10., "k_p": 20.}, StepProfile((0, 1, 0))))
+        self.assertNotEqual(a, config_hash(np.zeros(3), {"k_p": 20., "k_i": 10.}, StepProfile((0, 2, 0))))
+        self.assertNotEqual(config_hash(np.zeros(3)), config_hash(np.zeros(3, np.float32)))
+        self.assertNotEqual(config_hash(np.zeros(3)), config_hash(np.zeros((3, 1))))
+
+        qc = Quadcopter([0, 0, 0])
+        key = config_hash(quadcopter_config(qc))
+        qc.integrator.set_integrator("dopri5", rtol=1e-9)
+        self.assertNotEqual(key, config_hash(quadcopter_config(qc)))
+
+    def test_get_or_run(self):
+        cache = SimulationCache(self.path)
+        runs = []
+
+        def run():
+            runs.append(1)
+            return {"x": np.arange(5.)}
+
+        for i in range(3):
+            npt.assert_array_equal(cache.get_or_run("ab12", run)["x"], np.arange(5.))
+        self.assertEqual((len(runs), cache.hits, cache.misses), (1, 2, 1))
+        self.assertIn("ab12", cache)
+        self.assertIsNone(cache.get("cd34"))
+
+    def test_lru_eviction(self):
+        result = {"x": np.zeros(1000)}
+        cache = SimulationCache(self.path)
+        cache.put("aa", result)
+        entry_size = cache.size
+        cache.max_size = 3 * entry_size
+
+        cache.put("bb", result)
+        cache.put("cc", result)
+        # Make "aa" the most recently used result.
+        os.utime(cache.file_path("bb"), (time.time() - 20, time.time() - 20))
+        os.utime(cache.file_path("cc"), (time.time() - 10, time.time() - 10))
+        os.utime(cache.file_path("aa"), (time.time() - 30, time.time() - 30))
+        cache.get("aa")
+
+        cache.put("dd", result)
+        self.assertEqual(len(cache), 3)
+        self.assertNotIn("bb", cache)
+        self.assertIn("aa", cache)
+        self.assertLessEqual(cache.size, cache.max_size)
+
+    def test_put_does_not_scan(self):
+        cache = SimulationCache(self.path)
+        scans = []
+        entries = cache.entries
+
+        def counted_entries():
+            scans.append(1)
+            return entries()
+
+        cache.entries = counted_entries
+        result = {"x": np.zeros(100)}
+        cache.put("00", result)
+        cache.max_size = 5 * os.path.getsize(cache.file_path("00"))
+        for i in range(1, 20):
+            cache.put("{:02x}".format(i), result)
+        self.assertEqual(len(scans), 1)
+        self.assertEqual(len(entries()), 5)
+        self.assertIn("13", cache)
+        self.assertNotIn("0e", cache)
+
+    def test_replay_trajectory(self):
+        cache = SimulationCache(self.path)
+        n = 200
+        stream = CommandStream(0.01, np.zeros(3), np.arange(n) * 0.01,
+                               np.tile([0., 1., 0.], (n, 1)), np.zeros((n, 3)))
+        first = replay_trajectory(stream, cache=cache)
+        second = replay_trajectory(stream, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        npt.assert_array_equal(second["state"], first["state"])
+        npt.assert_allclose(first["state"][-1, 3:6], [0, 1, 0], atol=0.05)
+
+        qc = Quadcopter([0, 0, 0])
+        qc.v_pid.k_p = 40.
+        replay_trajectory(stream, quadcopter=qc, cache=cache)
+        self.assertEqual(cache.misses, 2)
+
+    def test_sweep(self):
+        cache = SimulationCache(self.path)
+        cases = grid(v_k_p=[10, 20, 30, 40])
+        first = run_sweep(cases, duration=1., processes=1, batch_size=2, cache=cache)
+        second = run_sweep(cases, duration=1., processes=1, batch_size=2, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        for name in first.dtype.names:
+            npt.assert_array_equal(second[name], first[name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from scaling_potato.cli import main, parse_axis, random_distributions
+from scaling_potato.sweep import Uniform, random_cases
+from scaling_potato.telemetry import TelemetryReader
+
+import numpy as np
+import numpy.testing as npt
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def imported_modules(statement):
+    """
+    Top level packages imported by a statement in a fresh interpreter.
+    """
+    code = "import sys\n{}\nprint(' '.join(sorted(set(m.split('.')[0] for m in sys.modules))))"
+    output = subprocess.check_output([sys.executable, "-c", code.format(statement)], cwd=ROOT)
+    return set(output.decode().split())
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_lazy_imports(self):
+        modules = imported_modules(
+            "import scaling_potato.quadcopter, scaling_potato.fleet, scaling_potato.pid_control, "
+            "scaling_potato.sweep, scaling_potato.headless, scaling_potato.cli\n"
+            "from scaling_potato.quadcopter import Quadcopter\n"
+            "Quadcopter([0, 0, 0]).v_control(0., [0, 1, 0])")
+        self.assertNotIn("scipy", modules)
+        self.assertNotIn("panda3d", modules)
+        self.assertNotIn("direct", modules)
+
+    def test_world_import_has_no_side_effects(self):
+        modules = imported_modules(
+            "import scaling_potato.world\n"
+            "import builtins\n"
+            "assert getattr(builtins, 'base', None) is None")
+        self.assertIn("panda3d", modules)
+
+    def test_parse_axis(self):
+        self.assertEqual(parse_axis("v_k_p=10,20.5"), ("v_k_p", [10., 20.5]))
+
+    def test_random_distributions(self):
+        distributions = random_distributions([parse_axis("v_k_p=40,10,20"),
+                                              parse_axis("profile=0,1,2")])
+        self.assertIsInstance(distributions["v_k_p"], Uniform)
+        self.assertEqual((distributions["v_k_p"].low, distributions["v_k_p"].high), (10., 40.))
+        self.assertEqual(distributions["profile"], [0., 1., 2.])
+        cases = random_cases(100, seed=0, **distributions)
+        self.assertEqual(set(cases["profile"]), {0, 1, 2})
+
+    def test_headless(self):
+        telemetry_path = os.path.join(self.path, "telemetry")
+        self.assertEqual(main(["headless", "--duration", "0.5", "--init-x", "1", "2", "3",
+                               "--telemetry", telemetry_path]), 0)
+        reader = TelemetryReader(telemetry_path)
+        self.assertEqual(len(reader), 50)
+        npt.assert_allclose(reader["state"][-1, 0, 0:3], [1, 2, 3])
+
+    def test_batch(self):
+        output = os.path.join(self.path, "results.csv")
+        self.assertEqual(main(["batch", "--axis", "v_k_p=10,20", "--axis", "v_k_i=0,5",
+                               "--processes", "1", "--duration", "0.5", "--output", output]), 0)
+        results = np.genfromtxt(output, delimiter=",", names=True)
+        self.assertEqual(len(results), 4)
+        npt.assert_array_equal(results["v_k_p"], [10, 10, 20, 20])
+
+
+if __name__ == '__main__':
+    unittest.main()
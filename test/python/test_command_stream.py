@@ -0,0 +1,72 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.scheduler import FixedRateScheduler
+from scaling_potato.command_stream import CommandRecorder, CommandStream, replay
+from scaling_potato.telemetry import TelemetryRecorder, TelemetryReader, quadcopter_columns
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestCommandStream(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_hold(self):
+        stream = CommandStream(0.1, np.zeros((3,)), np.array([0., 0.1, 0.2]),
+                               np.arange(9.).reshape(3, 3), np.zeros((3, 3)))
+        npt.assert_array_equal(stream(-0.1)[0], 0)
+        npt.assert_array_equal(stream(0.15)[0], [3, 4, 5])
+        npt.assert_array_equal(stream(5.)[0], [6, 7, 8])
+        self.assertAlmostEqual(stream.duration, 0.3)
+
+    def test_bit_identical_replay(self):
+        # Fly a "live" run on the fixed rate scheduler, the same way World does, with irregular
+        # frame times and commands that change every few steps.
+        rng = np.random.RandomState(0)
+        qc = Quadcopter([0, -20, 1.5])
+        scheduler = FixedRateScheduler(500.)
+        commands = CommandRecorder(scheduler.dt, qc.x, capacity=16)
+        telemetry = TelemetryRecorder(os.path.join(self.path, "live"), quadcopter_columns())
+        current = [np.zeros((3,)), np.zeros((3,))]
+
+        def physics_step(time):
+            qc.step(time)
+            if scheduler.n_steps % 37 == 0:
+                current[:] = [rng.uniform(-3, 3, 3), rng.uniform(-1, 1, 3)]
+            v_command, omega_command = current
+            qc.v_control(time, v_command)
+            qc.omega_control(time, omega_command)
+            telemetry.record_quadcopters(time, [qc], [v_command], [omega_command])
+            commands.record(time, v_command, omega_command)
+
+        scheduler.add(physics_step)
+        for i in range(200):
+            scheduler.advance(rng.uniform(0.005, 0.03))
+        telemetry.close()
+
+        commands.save(os.path.join(self.path, "commands.npz"))
+        replay_telemetry = TelemetryRecorder(os.path.join(self.path, "replay"), quadcopter_columns())
+        runner = replay(os.path.join(self.path, "commands.npz"), recorder=replay_telemetry)
+        replay_telemetry.close()
+
+        self.assertEqual(runner.n_steps, scheduler.n_steps)
+        live = TelemetryReader(os.path.join(self.path, "live"))
+        replayed = TelemetryReader(os.path.join(self.path, "replay"))
+        self.assertEqual(len(live), len(replayed))
+        for name in live.columns:
+            npt.assert_array_equal(replayed[name], live[name])
+        npt.assert_array_equal(runner.quadcopters[0].state_vector, qc.state_vector)
+
+
+if __name__ == '__main__':
+    unittest.main()
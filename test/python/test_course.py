@@ -0,0 +1,106 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from panda3d.core import CardMaker, NodePath
+
+from scaling_potato.assets import ModelCache
+from scaling_potato.course import CourseRenderer, as_course, course_dtype, course_from_pilons, \
+    load_course, make_course, save_course
+from scaling_potato.headless import offscreen_base
+
+import numpy as np
+import numpy.testing as npt
+
+
+def pylon_model():
+    card = CardMaker("pylon")
+    card.setFrame(-0.2, 0.2, 0, 1)
+    model = NodePath("pylon")
+    model.attachNewNode(card.generate())
+    return model
+
+
+class TestCourseFormat(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_from_pilons(self):
+        course = course_from_pilons([[None, (0, 0)], [(1, 0.5, 0), (3, 2)]])
+        self.assertEqual(course.dtype, course_dtype)
+        npt.assert_array_equal(course["color"], [[0, 0, 0, 0], [255, 128, 0, 255]])
+        npt.assert_array_equal(course["x"], [0, 3])
+        npt.assert_array_equal(course["y"], [0, 2])
+        self.assertIs(as_course(course), course)
+        self.assertEqual(len(as_course(None)), 0)
+
+    def test_save_load(self):
+        rng = np.random.RandomState(0)
+        course = make_course(rng.uniform(-10, 10, 20), rng.uniform(-10, 10, 20),
+                             rng.randint(0, 256, (20, 4)))
+        for name in ("course.npy", "course.csv"):
+            path = os.path.join(self.path, name)
+            save_course(path, course)
+            loaded = as_course(path)
+            for field in course_dtype.names:
+                npt.assert_array_equal(loaded[field], course[field])
+
+        path = os.path.join(self.path, "single.csv")
+        save_course(path, course[:1])
+        self.assertEqual(len(load_course(path)), 1)
+
+
+class TestCourseRenderer(unittest.TestCase):
+    def setUp(self):
+        self.base = offscreen_base()
+        self.models = ModelCache(self.base.loader)
+        self.models.add("pylon", pylon_model())
+
+    def test_model_cache(self):
+        model = self.models.get("pylon")
+        self.assertIs(self.models.get("pylon"), model)
+        copy = self.models.copy("pylon", self.base.render)
+        self.assertNotEqual(copy.node(), model.node())
+        instance = self.models.instance("pylon", self.base.render)
+        self.assertEqual(instance.node(), model.node())
+        copy.removeNode()
+        instance.removeNode()
+
+    def test_flattened_cells(self):
+        rng = np.random.RandomState(0)
+        course = make_course(rng.uniform(0, 100, 1000), rng.uniform(0, 100, 1000),
+                             (255, 100, 0, 255))
+        renderer = CourseRenderer(self.base.render, course, self.models.get("pylon"), cell_size=50.)
+        try:
+            self.assertEqual(len(renderer.cells), 4)
+            self.assertEqual(renderer.n_geoms, 4)
+            bounds = renderer.node_path.getTightBounds()
+            npt.assert_allclose([bounds[0][0], bounds[1][0]],
+                                [course["x"].min() - 0.2, course["x"].max() + 0.2], atol=1e-3)
+            self.base.graphicsEngine.renderFrame()
+        finally:
+            renderer.remove()
+
+    def test_unflattened(self):
+        course = course_from_pilons([[None, (0, 0)], [(1, 0, 0), (3, 2)], [None, (60, 0)]])
+        renderer = CourseRenderer(self.base.render, course, self.models.get("pylon"),
+                                  flatten=False)
+        try:
+            self.assertEqual(len(renderer.cells), 2)
+            self.assertEqual(renderer.n_geoms, 3)
+            pylons = renderer.cells[(0, 0)].getChildren()
+            self.assertFalse(pylons[0].hasColor())
+            self.assertEqual(tuple(pylons[1].getColor()), (1, 0, 0, 1))
+            self.assertEqual(tuple(pylons[1].getPos()), (3, 2, 0))
+        finally:
+            renderer.remove()
+
+
+if __name__ == '__main__':
+    unittest.main()
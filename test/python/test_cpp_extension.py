@@ -1,12 +1,145 @@
 import unittest
 
-from scaling_potato.scaling_potato_c import test_opencv
+import numpy as np
+import numpy.testing as npt
+from panda3d.core import Texture
+
+from scaling_potato.scaling_potato_c import test_opencv, Camera, Frame, FramePipeline, \
+    QuadcopterIntegrator, quadcopter_state_derivative
+from scaling_potato.vision import pilon_pipeline
+from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.fleet import QuadcopterFleet
+from scaling_potato.headless import HeadlessRunner
+from scaling_potato.cache import integrator_settings
+
+
+def make_texture(x_size, y_size):
+    texture = Texture()
+    texture.setup2dTexture(x_size, y_size, Texture.TUnsignedByte, Texture.FRgb8)
+    texture.setRamImage(bytes(bytearray(range(x_size * y_size * 3))))
+    return texture
 
 
 class TestCppExtension(unittest.TestCase):
     def test_printing(self):
         test_opencv()
 
+    def test_frame_zero_copy(self):
+        texture = make_texture(4, 2)
+        frame = Frame(texture)
+        image = np.asarray(frame)
+        self.assertEqual(image.shape, (2, 4, 3))
+        self.assertEqual(image.strides, (-12, 3, 1))
+        self.assertFalse(image.flags.writeable)
+        npt.assert_array_equal(image[0, 0], [12, 13, 14])
+        npt.assert_array_equal(image[1, 0], [0, 1, 2])
+        self.assertEqual(frame.pointer, image[1].ctypes.data)
+
+    def test_frame_unflipped(self):
+        image = np.asarray(Frame(make_texture(4, 2), flip=False))
+        npt.assert_array_equal(image.ravel(), np.arange(24))
+
+    def test_frame_lifetime(self):
+        texture = make_texture(4, 2)
+        camera = Camera()
+        image = np.asarray(camera.set_texture(texture))
+        texture.setRamImage(bytes(bytearray(24)))
+        camera.set_texture(texture)
+        npt.assert_array_equal(image[1, 0], [0, 1, 2])
+
+    def test_worker_queue(self):
+        camera = Camera(1)
+        frame = Frame(make_texture(4, 2))
+        for _ in range(100):
+            camera.push_frame(frame)
+        self.assertLessEqual(camera.queue_depth, 1)
+        camera.stop()
+        self.assertEqual(camera.processed_frames + camera.dropped_frames + camera.queue_depth, 100)
+
+    def test_push_image(self):
+        camera = Camera(1)
+        atlas = np.arange(4 * 8 * 3, dtype=np.uint8).reshape(4, 8, 3)
+        self.assertRaises(ValueError, camera.push_image, atlas[:, :4])
+        camera.push_image(np.ascontiguousarray(atlas[:, :4]))
+        camera.stop()
+        self.assertEqual(camera.processed_frames + camera.dropped_frames + camera.queue_depth, 1)
+
+    def test_frame_pipeline_blobs(self):
+        image = np.zeros((64, 128, 3), dtype=np.uint8)
+        image[10:20, 30:50] = (0, 128, 255)
+        image[40:44, 100:104] = (0, 128, 255)
+
+        pipeline = pilon_pipeline(n_threads=2, scale=0.5, min_area=20.)
+        self.assertEqual(pipeline.n_stages, 3)
+        blobs = pipeline.process([image, image[::-1]])
+        self.assertEqual(len(blobs), 2)
+        self.assertEqual(blobs[0].dtype, np.float32)
+        npt.assert_allclose(blobs[0], [[39.5, 14.5, 200., 20., 10.]], atol=1.)
+        npt.assert_allclose(blobs[1], blobs[0], atol=1e-6)
+
+    def test_frame_pipeline_images(self):
+        pipeline = FramePipeline(1)
+        pipeline.add_resize(0.5)
+        texture = make_texture(4, 2)
+        blobs, images = pipeline.process([Frame(texture)], return_images=True)
+        self.assertEqual(images[0].shape, (1, 2, 3))
+        self.assertEqual(blobs[0].shape, (0, 5))
+
+    def test_state_derivative(self):
+        qc = Quadcopter([1, 2, 3])
+        qc.v_i = [1, 0, 0]
+        qc.omega = [0.3, 0.2, -0.1]
+        qc.a_i = [0, 1, 0]
+        qc.omega_dot = [0.1, 0, 0]
+        expected = qc.rhs_equation(0, qc.state_vector).copy()
+        npt.assert_allclose(quadcopter_state_derivative(qc.state_vector, qc.a_i, qc.omega_dot),
+                            expected, rtol=1e-15)
+
+    def test_integrators_match_scipy(self):
+        def commands(time, quadcopter):
+            return np.array([0., 3., 0.]), np.array([0.1, 0., 0.2])
+
+        states = []
+        for integrator in [None, QuadcopterIntegrator(), QuadcopterIntegrator("rk4", False, 1e-3),
+                           QuadcopterIntegrator("dopri5", False, 1e-2)]:
+            qc = Quadcopter([0, 0, 0], native_integrator=integrator)
+            HeadlessRunner([qc], dt=0.01, command_source=commands).run(5.)
+            states.append(qc.state_vector.copy())
+        for state in states[1:]:
+            npt.assert_allclose(state, states[0], atol=1e-8)
+
+    def test_fleet_integrator(self):
+        fleets = [QuadcopterFleet(np.zeros((10, 3))),
+                  QuadcopterFleet(np.zeros((10, 3)), native_integrator=QuadcopterIntegrator())]
+        for fleet in fleets:
+            for i in range(100):
+                fleet.step(i * 0.01)
+                fleet.v_control(i * 0.01, np.linspace(0, 1, 30).reshape(10, 3))
+                fleet.omega_control(i * 0.01, [0.1, 0, 0])
+        npt.assert_allclose(fleets[1].state, fleets[0].state, atol=1e-8)
+
+    def test_integrator_arguments(self):
+        self.assertRaises(ValueError, QuadcopterIntegrator, "euler")
+        self.assertRaises(ValueError, QuadcopterIntegrator, "rk4", True)
+        self.assertRaises(ValueError, QuadcopterIntegrator, "rk4", False, 0.)
+
+        integrator = QuadcopterIntegrator("rk4", False, 0.003)
+        state = np.zeros((2, 13))
+        state[:, 6] = 1
+        integrator.integrate(state, np.ones((2, 3)), np.zeros((2, 3)), 0., 0.01)
+        self.assertEqual(integrator.n_accepted, 4)
+        npt.assert_allclose(state[:, 0], 0.5 * 0.01 ** 2)
+        self.assertRaises(ValueError, integrator.integrate, state.T.copy().T, np.ones((2, 3)),
+                          np.zeros((2, 3)), 0., 0.01)
+        self.assertRaises(ValueError, integrator.integrate, state, np.ones((3, 3)),
+                          np.zeros((3, 3)), 0., 0.01)
+
+    def test_integrator_settings(self):
+        settings = integrator_settings(QuadcopterIntegrator("rk4", False, 0.003))
+        self.assertEqual((settings["name"], settings["method"], settings["dt"]),
+                         ("native", "rk4", 0.003))
+        self.assertEqual(integrator_settings(Quadcopter([0, 0, 0]).integrator)["name"], "dopri5")
+
 
 if __name__ == '__main__':
     unittest.main()
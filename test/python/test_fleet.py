@@ -0,0 +1,44 @@
+from __future__ import absolute_import
+
+import unittest
+
+from scaling_potato.fleet import QuadcopterFleet, omega2qdot_batch
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestQuadcopterFleet(unittest.TestCase):
+    def test_state_views(self):
+        fleet = QuadcopterFleet([[1, 2, 3], [4, 5, 6]])
+        self.assertEqual(fleet.state.shape, (2, 13))
+        npt.assert_allclose(fleet.x, [[1, 2, 3], [4, 5, 6]])
+        npt.assert_allclose(fleet.q, [[1, 0, 0, 0], [1, 0, 0, 0]])
+        fleet.v_i = [[1, 0, 0], [0, 1, 0]]
+        npt.assert_allclose(fleet.state[:, 3:6], [[1, 0, 0], [0, 1, 0]])
+
+    def test_constant_acceleration(self):
+        fleet = QuadcopterFleet(np.zeros((500, 3)))
+        fleet.a_i[:, 0] = np.linspace(0, 1, 500)
+        fleet.step(0.)
+        fleet.step(1.)
+        npt.assert_allclose(fleet.x[:, 0], 0.5 * np.linspace(0, 1, 500), atol=1e-9)
+        npt.assert_allclose(fleet.v_i[:, 0], np.linspace(0, 1, 500), atol=1e-9)
+
+    def test_yaw_rotation(self):
+        fleet = QuadcopterFleet(np.zeros((3, 3)))
+        fleet.omega[:, 2] = [0., np.pi / 2, np.pi]
+        fleet.step(0.)
+        fleet.step(1.)
+        angles = np.array([0., np.pi / 2, np.pi])
+        npt.assert_allclose(fleet.q[:, 0], np.cos(angles / 2), atol=1e-6)
+        npt.assert_allclose(fleet.q[:, 3], np.sin(angles / 2), atol=1e-6)
+
+    def test_omega2qdot_batch(self):
+        omega = np.array([[1., 2., 3.]])
+        quat = np.array([[1., 0., 0., 0.]])
+        npt.assert_allclose(omega2qdot_batch(omega, quat), [[0., 0.5, 1., 1.5]])
+
+
+if __name__ == '__main__':
+    unittest.main()
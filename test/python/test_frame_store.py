@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+
+import errno
+import shutil
+import tempfile
+import time
+import unittest
+
+from scaling_potato.frame_store import FrameRecorder, FrameReader
+from scaling_potato.readback import ReadbackFrame
+
+import numpy as np
+import numpy.testing as npt
+
+
+def make_frame(i):
+    image = np.zeros((8, 16, 3), dtype=np.uint8)
+    image[:, :, 0] = i % 256
+    image[i % 8, :, 1] = 255
+    return image
+
+
+class TestFrameStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def record(self, compression):
+        with FrameRecorder(self.path, compression, max_queue_size=1000) as recorder:
+            for i in range(100):
+                self.assertTrue(recorder.record(make_frame(i), 10 + 2 * i, i * 0.1))
+        self.assertEqual(recorder.n_written, 100)
+        return FrameReader(self.path)
+
+    def check(self, reader):
+        self.assertEqual(len(reader), 100)
+        self.assertEqual(reader.shape, (8, 16, 3))
+        npt.assert_array_equal(reader.frame(10 + 2 * 57), make_frame(57))
+        npt.assert_array_equal(reader[-1], make_frame(99))
+        self.assertEqual(reader.at_time(4.25), 42)
+        self.assertEqual(reader.at_time(-1.), -1)
+        self.assertRaises(KeyError, reader.find, 11)
+
+    def test_compressed(self):
+        reader = self.record("zlib")
+        self.check(reader)
+        self.assertLess(reader.index["size"].max(), reader.frame_size)
+
+    def test_raw(self):
+        reader = self.record(None)
+        self.check(reader)
+        npt.assert_array_equal(reader.index["offset"], np.arange(100) * reader.frame_size)
+        self.assertFalse(reader[3].flags.writeable)
+
+    def test_subscriber(self):
+        recorder = FrameRecorder(self.path)
+        image = make_frame(3)
+        recorder(ReadbackFrame(None, None, image[::-1], 5, 0.5))
+        self.assertRaises(ValueError, recorder.record, np.zeros((2, 2, 3), np.uint8), 6, 0.6)
+        recorder.close()
+        reader = FrameReader(self.path)
+        npt.assert_array_equal(reader.frame(5), image[::-1])
+
+    def test_worker_failure(self):
+        class FullDisk(object):
+            def write(self, data):
+                raise IOError(errno.ENOSPC, "No space left on device")
+
+            def close(self):
+                pass
+
+        recorder = FrameRecorder(self.path, max_queue_size=1)
+        recorder._FrameRecorder__data_file = FullDisk()
+        recorder.record(make_frame(0), 0, 0.)
+        deadline = time.time() + 5
+        with self.assertRaises(IOError):
+            while time.time() < deadline:
+                recorder.record(make_frame(1), 1, 0.1)
+        # The queue is full and the thread stopped, closing must not block.
+        self.assertRaises(IOError, recorder.close)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+from __future__ import absolute_import
+
+import unittest
+
+from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.headless import HeadlessRunner
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestHeadlessRunner(unittest.TestCase):
+    def test_hover(self):
+        qc = Quadcopter([0, -20, 1.5])
+        runner = HeadlessRunner([qc], dt=0.01)
+        runner.run(1.)
+        self.assertEqual(runner.n_steps, 100)
+        npt.assert_allclose(qc.x, [0, -20, 1.5], atol=1e-12)
+
+    def test_velocity_command(self):
+        qc = Quadcopter([0, 0, 0])
+        runner = HeadlessRunner([qc], dt=0.01,
+                                command_source=lambda t, q: (np.array([0., 3., 0.]), np.zeros((3,))))
+        runner.run(10.)
+        npt.assert_allclose(qc.v_i, [0, 3, 0], atol=1e-3)
+        self.assertGreater(runner.real_time_factor, 1.)
+
+
+if __name__ == '__main__':
+    unittest.main()
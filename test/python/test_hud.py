@@ -0,0 +1,78 @@
+from __future__ import absolute_import
+
+import unittest
+
+from scaling_potato.hud import QuadcopterHud, QUADCOPTER_FIELDS
+from scaling_potato.quadcopter import Quadcopter
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TextNode(object):
+    def __init__(self):
+        self.text = None
+        self.n_set = 0
+
+    def setText(self, text):
+        self.text = text
+        self.n_set += 1
+
+
+class TestQuadcopterHud(unittest.TestCase):
+    def setUp(self):
+        self.qc = Quadcopter([1, 2, 3])
+        self.hud = QuadcopterHud(self.qc, lambda i, name: TextNode(), rate=10.)
+
+    def test_snapshot(self):
+        self.qc.v_i = [0.5, 0, 0]
+        snapshot = self.hud.take_snapshot()
+        self.assertEqual(len(snapshot), sum(QUADCOPTER_FIELDS.values()))
+        npt.assert_allclose(snapshot[self.hud.slices["x"]], [1, 2, 3])
+        npt.assert_allclose(snapshot[self.hud.slices["v_b"]], self.qc.v_b)
+        self.assertTrue(np.isnan(snapshot[self.hud.slices["error"]]).all())
+
+    def test_text(self):
+        self.hud.refresh()
+        self.assertEqual(self.hud.text_nodes["x"].text,
+                         "x          [    1.0000     2.0000     3.0000]")
+        self.assertEqual(self.hud.text_nodes["yaw"].text, "yaw            0.0000")
+        self.assertEqual(self.hud.text_nodes["error"].text,
+                         "error      [       nan        nan        nan]")
+
+    def test_only_changed_fields(self):
+        self.assertEqual(self.hud.refresh(), list(QUADCOPTER_FIELDS))
+        self.assertEqual(self.hud.n_set_text, len(QUADCOPTER_FIELDS))
+
+        self.assertEqual(self.hud.refresh(), [])
+        # Changes below the displayed precision don't change the text.
+        self.qc.x = [1, 2, 3.00001]
+        self.assertEqual(self.hud.refresh(), [])
+
+        self.qc.x = [1, 2, 4]
+        self.assertEqual(self.hud.refresh(), ["x"])
+        self.assertEqual(self.hud.text_nodes["x"].n_set, 2)
+        self.assertEqual(self.hud.text_nodes["v_i"].n_set, 1)
+
+        self.qc.v_i = [0, 1, 0]
+        self.assertEqual(self.hud.refresh(), ["v_i", "v_b"])
+
+    def test_negative_zero(self):
+        self.hud.refresh()
+        self.qc.x = [-0.00001, 2, 3]
+        self.assertEqual(self.hud.refresh(), ["x"])
+        self.assertEqual(self.hud.text_nodes["x"].text,
+                         "x          [    0.0000     2.0000     3.0000]")
+
+    def test_rate(self):
+        self.assertTrue(self.hud.update(0.))
+        self.assertFalse(self.hud.update(0.05))
+        self.assertTrue(self.hud.update(0.1))
+        self.assertEqual(self.hud.n_refreshes, 2)
+
+        self.hud.rate = None
+        self.assertTrue(self.hud.update(0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+from __future__ import absolute_import
+
+import unittest
+
+from scaling_potato.pid_control import PIDControl, PIDBank
+from scaling_potato.fleet import QuadcopterFleet
+from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.headless import HeadlessRunner
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestPIDBank(unittest.TestCase):
+    def test_matches_pid_control(self):
+        gains = [(20.0, 10.0, 0.5), (5.0, 0.0, 0.0), (1.0, 2.0, 3.0)]
+        controllers = [PIDControl(*g) for g in gains]
+        bank = PIDBank(3, 2, *zip(*gains))
+
+        rng = np.random.RandomState(0)
+        commands = rng.randn(3, 2)
+        bank.command[:] = commands
+        for controller, command in zip(controllers, commands):
+            controller.command = command
+
+        for i in range(10):
+            time = i * 0.01
+            values = rng.randn(3, 2)
+            for controller, value in zip(controllers, values):
+                controller.step(time, value)
+            bank.step(0.01, values)
+            npt.assert_allclose(bank.output, [c.output for c in controllers])
+
+    def test_per_controller_dt(self):
+        bank = PIDBank(2, 1, 0., 1., 0.)
+        bank.command[:] = 1.
+        bank.step(0., np.zeros((2, 1)))
+        bank.step(np.array([0.1, 0.2]), np.zeros((2, 1)))
+        npt.assert_allclose(bank.integral, [[0.1], [0.2]])
+
+    def test_integral_limit(self):
+        bank = PIDBank(2, 3, 0., 1., 0., integral_limit=[0.5, 2.])
+        bank.command[:] = 1.
+        out = np.empty((2, 3))
+        for _ in range(100):
+            bank.step(0.1, np.zeros((2, 3)), out=out)
+        npt.assert_allclose(out, [[0.5] * 3, [2.] * 3])
+        npt.assert_allclose(bank.output, 0.)
+
+    def test_derivative_filter(self):
+        bank = PIDBank(1, 1, 0., 0., 1., derivative_tau=0.1)
+        bank.step(0.1, np.zeros((1, 1)))
+        bank.step(0.1, -np.ones((1, 1)))
+        npt.assert_allclose(bank.derivative, [[5.]])
+
+
+class TestFleetControl(unittest.TestCase):
+    def test_matches_quadcopter(self):
+        init_x = [[0, 0, 0], [1, 2, 3]]
+        v_command = np.array([[0., 3., 0.], [1., 0., 0.]])
+        omega_command = np.array([[0., 0., 1.], [0.5, 0., 0.]])
+
+        quadcopters = [Quadcopter(x) for x in init_x]
+        commands = dict(zip(map(id, quadcopters), zip(v_command, omega_command)))
+        runner = HeadlessRunner(quadcopters, dt=0.01, command_source=lambda t, qc: commands[id(qc)])
+        runner.run(2.)
+
+        fleet = QuadcopterFleet(init_x)
+        for i in range(200):
+            time = i * 0.01
+            fleet.step(time)
+            fleet.v_control(time, v_command)
+            fleet.omega_control(time, omega_command)
+
+        npt.assert_allclose(fleet.x, [qc.x for qc in quadcopters], atol=1e-4)
+        npt.assert_allclose(fleet.q, [qc.q for qc in quadcopters], atol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+from __future__ import absolute_import
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from scaling_potato.profiler import FrameProfiler, PhaseTimings
+from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.headless import offscreen_base
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestPhaseTimings(unittest.TestCase):
+    def test_ring_buffer(self):
+        timings = PhaseTimings(capacity=100)
+        self.assertTrue(np.isnan(timings.percentile(50)))
+
+        for duration in np.arange(250):
+            timings.add(duration)
+        self.assertEqual(timings.count, 250)
+        # Only the last 100 durations are kept.
+        npt.assert_array_equal(np.sort(timings.values), np.arange(150, 250))
+        self.assertAlmostEqual(timings.percentile(50), 199.5)
+
+        stats = timings.stats()
+        self.assertEqual(stats["count"], 250)
+        self.assertAlmostEqual(stats["p50"], 199.5)
+        self.assertAlmostEqual(stats["p99"], np.percentile(np.arange(150, 250), 99))
+        self.assertEqual(stats["max"], 249)
+
+        counts, edges = timings.histogram(bins=4)
+        npt.assert_array_equal(counts, [25, 25, 25, 25])
+
+        timings.clear()
+        self.assertEqual(len(timings.values), 0)
+
+
+class TestFrameProfiler(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_instrument(self):
+        qc = Quadcopter([0, 0, 0])
+        profiler = FrameProfiler(capacity=16)
+        profiler.instrument(qc, "step", "integration")
+
+        # Disabled the method isn't wrapped at all.
+        self.assertNotIn("step", vars(qc))
+        qc.step(0.01)
+        self.assertEqual(profiler.phases["integration"].count, 0)
+
+        profiler.enable()
+        self.assertIn("step", vars(qc))
+        for i in range(2, 22):
+            qc.step(i * 0.01)
+        self.assertEqual(profiler.phases["integration"].count, 20)
+        self.assertGreater(profiler.p50("integration"), 0)
+        self.assertGreaterEqual(profiler.p99("integration"), profiler.p50("integration"))
+        self.assertAlmostEqual(qc.time, 0.21)
+
+        profiler.toggle()
+        self.assertFalse(profiler.enabled)
+        self.assertNotIn("step", vars(qc))
+        qc.step(0.3)
+        self.assertEqual(profiler.phases["integration"].count, 20)
+
+    def test_begin_end(self):
+        profiler = FrameProfiler()
+        profiler.begin("render")
+        profiler.end("render")
+        self.assertNotIn("render", profiler.phases)
+
+        profiler.enable()
+        profiler.begin("render")
+        profiler.end("render")
+        profiler.record("readback", 0.002)
+        self.assertEqual(profiler.phases["render"].count, 1)
+        self.assertEqual(profiler.p50("readback"), 0.002)
+        self.assertIn("readback", profiler.report())
+
+    def test_dump(self):
+        profiler = FrameProfiler(enabled=True)
+        profiler.record("integration", 0.001)
+        profiler.record("integration", 0.003)
+        profiler.phase("hud")
+
+        json_path = os.path.join(self.path, "profile.json")
+        profiler.dump(json_path)
+        with open(json_path) as f:
+            data = json.load(f)
+        self.assertEqual(data["phases"]["integration"]["count"], 2)
+        self.assertAlmostEqual(data["phases"]["integration"]["p50"], 0.002)
+        self.assertIsNone(data["phases"]["hud"]["p50"])
+
+        csv_path = os.path.join(self.path, "profile.csv")
+        profiler.dump(csv_path)
+        profiler.dump(csv_path)
+        with open(csv_path) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual([row["phase"] for row in rows], ["integration", "hud"] * 2)
+        self.assertAlmostEqual(float(rows[0]["max"]), 0.003)
+
+    def test_attach(self):
+        base = offscreen_base()
+        dump_path = os.path.join(self.path, "profile.json")
+        profiler = FrameProfiler()
+        profiler.attach(base, overlay=True, dump_path=dump_path, dump_interval=0.)
+
+        base.taskMgr.step()
+        self.assertEqual(profiler.phases["render"].count, 0)
+        self.assertFalse(os.path.exists(dump_path))
+
+        profiler.enable()
+        for _ in range(3):
+            base.taskMgr.step()
+        self.assertEqual(profiler.phases["render"].count, 3)
+        self.assertEqual(profiler.phases["frame"].count, 2)
+        self.assertTrue(os.path.exists(dump_path))
+        self.assertIn("render", profiler.overlay.text.getText())
+
+        profiler.disable()
+        base.taskMgr.step()
+        self.assertEqual(profiler.phases["render"].count, 3)
+        self.assertTrue(profiler.overlay.text.isHidden())
+        profiler.overlay.text.destroy()
+
+
+if __name__ == '__main__':
+    unittest.main()
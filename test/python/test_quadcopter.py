@@ -14,23 +14,23 @@ import numpy.testing as npt
 class TestQuadcopter(unittest.TestCase):
     def test_state_vector(self):
         qc = Quadcopter([1, 2, 3])
-        npt.assert_allclose(qc.state_vector, [1, 2, 3, 0, 0, 0, 0, 0])
-        qc.state_vector = np.array([9., 8., 7., 6., 5., 4., 3., 2])
-        npt.assert_allclose(qc.state_vector, [9., 8., 7., 6., 5., 4., 3., 2])
+        npt.assert_allclose(qc.state_vector, [1, 2, 3, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0])
+        qc.state_vector = np.array([9., 8., 7., 6., 5., 4., 0., 0., 0., 1., 3., 2., 1.])
+        npt.assert_allclose(qc.state_vector, [9., 8., 7., 6., 5., 4., 0., 0., 0., 1., 3., 2., 1.])
         npt.assert_allclose(qc.x, np.array([9., 8., 7.]))
         npt.assert_allclose(qc.v_i, np.array([6., 5., 4.]))
-        self.assertAlmostEqual(qc.yaw, 3.)
-        self.assertAlmostEqual(qc.yaw_rate, 2.)
+        npt.assert_allclose(qc.q, np.array([0., 0., 0., 1.]))
+        npt.assert_allclose(qc.omega, np.array([3., 2., 1.]))
+        self.assertAlmostEqual(abs(qc.yaw), 180.)
 
     def test_state_vector_dot(self):
         qc = Quadcopter([1, 2, 3])
-        npt.assert_allclose(qc.state_vector_dot, [0, 0, 0, 0, 0, 0, 0, 0])
-        qc.state_vector_dot = np.array([9., 8., 7., 6., 5., 4., 3., 2])
-        npt.assert_allclose(qc.state_vector_dot, [9., 8., 7., 6., 5., 4., 3., 2])
-        npt.assert_allclose(qc.v_i, np.array([9., 8., 7.]))
-        npt.assert_allclose(qc.a_i, np.array([6., 5., 4.]))
-        self.assertAlmostEqual(qc.yaw_rate, 3.)
-        self.assertAlmostEqual(qc.yaw_acc, 2.)
+        npt.assert_allclose(qc.state_vector_dot, np.zeros((13,)))
+        qc.v_i = [9., 8., 7.]
+        qc.a_i = [6., 5., 4.]
+        qc.omega = [0., 0., 2.]
+        qc.omega_dot = [3., 2., 1.]
+        npt.assert_allclose(qc.state_vector_dot, [9., 8., 7., 6., 5., 4., 0., 0., 0., 1., 3., 2., 1.])
 
     def test_simple_simulation(self):
         qc = Quadcopter([0, 0, 0])
@@ -42,11 +42,12 @@ class TestQuadcopter(unittest.TestCase):
 
     def test_yaw_simulation(self):
         qc = Quadcopter([0, 0, 0])
-        qc.yaw_acc = 6 * pi
+        qc.omega_dot = [0, 0, pi]
         qc.step(0)
         qc.step(1)
-        self.assertAlmostEqual(qc.yaw, pi)
-        self.assertAlmostEqual(qc.yaw_rate, 6 * pi)
+        # Accelerating at pi rad/s^2 for a second turns the heading by pi / 2.
+        self.assertAlmostEqual(qc.yaw, 90., places=3)
+        npt.assert_allclose(qc.omega, [0, 0, pi])
 
 
 if __name__ == '__main__':
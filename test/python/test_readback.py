@@ -0,0 +1,67 @@
+from __future__ import absolute_import
+
+import unittest
+
+from panda3d.core import Texture
+
+from scaling_potato.readback import ReadbackPipeline, CameraReadback, ram_image_array
+from scaling_potato.headless import offscreen_base
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestReadback(unittest.TestCase):
+    def setUp(self):
+        self.base = offscreen_base()
+        self.buffer = self.base.win.makeTextureBuffer("readback_test", 32, 16)
+        self.buffer.setClearColor((1, 0, 0, 1))
+        self.base.makeCamera(self.buffer)
+
+    def tearDown(self):
+        self.base.graphicsEngine.removeWindow(self.buffer)
+
+    def render(self, camera, n):
+        for i in range(n):
+            self.base.graphicsEngine.renderFrame()
+            camera.update(i, i * 0.25)
+
+    def test_no_subscribers(self):
+        camera = CameraReadback(self.buffer)
+        self.render(camera, 5)
+        self.assertEqual(camera.n_triggered, 0)
+        self.assertFalse(camera.texture.hasRamImage())
+
+    def test_delivered_next_frame(self):
+        camera = CameraReadback(self.buffer)
+        frames = []
+        camera.subscribe(lambda frame: frames.append((frame.frame_number, frame.image.copy())))
+        self.render(camera, 6)
+        self.assertEqual([f for f, _ in frames], [1, 2, 3, 4, 5])
+        self.assertEqual(frames[0][1].shape[:2], (16, 32))
+        npt.assert_array_equal(frames[-1][1][0, 0, :3], [0, 0, 255])
+
+    def test_rate_and_once(self):
+        camera = CameraReadback(self.buffer, rate=2.)
+        frames = []
+        camera.subscribe(frames.append)
+        once = []
+        camera.subscribe(once.append, once=True)
+        self.render(camera, 12)
+        self.assertEqual(len(once), 1)
+        self.assertEqual(camera.n_triggered, 6)
+        self.assertEqual([frame.frame_number for frame in frames], [1, 3, 5, 7, 9, 11])
+        # The time is the clock time of the frame that was copied.
+        self.assertEqual([frame.time for frame in frames],
+                         [frame.frame_number * 0.25 for frame in frames])
+
+    def test_ram_image_array(self):
+        texture = Texture()
+        texture.setup2dTexture(2, 2, Texture.TUnsignedByte, Texture.FRgb8)
+        texture.setRamImage(bytes(bytearray(range(12))))
+        image = ram_image_array(texture)
+        npt.assert_array_equal(image[0, 0], [6, 7, 8])
+
+
+if __name__ == '__main__':
+    unittest.main()
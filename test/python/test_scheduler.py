@@ -0,0 +1,48 @@
+from __future__ import absolute_import
+
+import unittest
+
+from scaling_potato.scheduler import FixedRateScheduler
+from scaling_potato.quadcopter import Quadcopter
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestFixedRateScheduler(unittest.TestCase):
+    def test_substeps(self):
+        times = []
+        scheduler = FixedRateScheduler(1000.)
+        scheduler.add(times.append)
+        alpha = scheduler.advance(0.0105)
+        self.assertEqual(len(times), 10)
+        npt.assert_allclose(np.diff(times), 0.001)
+        self.assertAlmostEqual(alpha, 0.5)
+
+        scheduler.advance(0.0005)
+        self.assertEqual(len(times), 11)
+        self.assertAlmostEqual(scheduler.time, 0.011)
+
+    def test_slow_frame(self):
+        times = []
+        scheduler = FixedRateScheduler(100., max_substeps=5)
+        scheduler.add(times.append)
+        scheduler.advance(1.)
+        self.assertEqual(len(times), 5)
+        npt.assert_allclose(np.diff(times), 0.01)
+        self.assertAlmostEqual(scheduler.dropped_time, 0.95)
+
+    def test_interpolated_pose(self):
+        qc = Quadcopter([0, 0, 0])
+        qc.v_i = [1, 0, 0]
+        qc.omega = [0, 0, np.pi]
+        qc.step(0.)
+        qc.step(1.)
+        x, q = qc.interpolated_pose(0.5)
+        npt.assert_allclose(x, [0.5, 0, 0], atol=1e-9)
+        npt.assert_allclose(np.linalg.norm(q), 1.)
+        npt.assert_allclose(q, [np.cos(np.pi / 4), 0, 0, np.sin(np.pi / 4)], atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+from __future__ import absolute_import
+
+import multiprocessing
+import unittest
+
+from scaling_potato.shm_ring import FrameRingWriter, FrameRingReader
+
+import numpy as np
+import numpy.testing as npt
+
+
+def read_in_process(name, queue):
+    reader = FrameRingReader(name)
+    frame = reader.latest()
+    queue.put((frame.seq, frame.timestamp, int(frame.image.sum()), reader.valid(frame)))
+    del frame
+    reader.close()
+
+
+class TestFrameRing(unittest.TestCase):
+    def setUp(self):
+        self.writer = FrameRingWriter(None, (4, 6, 3), np.uint8, n_slots=3)
+        self.reader = FrameRingReader(self.writer.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+        self.writer.unlink()
+
+    def test_empty(self):
+        self.assertIsNone(self.reader.latest())
+        self.assertIsNone(self.reader.wait(timeout=0.01))
+
+    def test_write_read(self):
+        for i in range(5):
+            self.writer.write(np.full((4, 6, 3), i), timestamp=i * 0.1, frame_number=10 + i)
+
+        frame = self.reader.latest()
+        self.assertEqual((frame.seq, frame.frame_number), (4, 14))
+        self.assertAlmostEqual(frame.timestamp, 0.4)
+        npt.assert_array_equal(frame.image, 4)
+        self.assertFalse(frame.image.flags.writeable)
+
+        self.assertIsNone(self.reader.read(1))
+        self.assertEqual(self.reader.read(2).image[0, 0, 0], 2)
+
+        old = self.reader.read(2)
+        self.writer.write(np.zeros((4, 6, 3)), timestamp=0.5)
+        self.assertFalse(self.reader.valid(old))
+        self.assertTrue(self.reader.valid(frame))
+
+    def test_zero_copy(self):
+        self.writer.claim()[:] = 7
+        self.writer.commit(1.)
+        frame = self.reader.latest()
+        self.writer.images[0][0, 0, 0] = 8
+        self.assertEqual(frame.image[0, 0, 0], 8)
+
+    def test_other_process(self):
+        self.writer.write(np.ones((4, 6, 3)), timestamp=2.)
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=read_in_process, args=(self.writer.name, queue))
+        process.start()
+        result = queue.get(timeout=30)
+        process.join()
+        self.assertEqual(result, (0, 2., 72, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
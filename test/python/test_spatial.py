@@ -0,0 +1,134 @@
+from __future__ import absolute_import
+
+import unittest
+
+from scaling_potato.course import make_course
+from scaling_potato.spatial import ObstacleIndex
+
+import numpy as np
+import numpy.testing as npt
+
+
+def brute_force_pairs(points, positions, reach):
+    distance = np.hypot(*(points[:, np.newaxis, :2] - positions[np.newaxis]).transpose(2, 0, 1))
+    query, obstacle = np.nonzero(distance <= reach)
+    return query, obstacle, distance[query, obstacle]
+
+
+class TestObstacleIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.obstacles = rng.uniform(-50, 50, (500, 2))
+        self.radius = rng.uniform(0.1, 0.5, 500)
+        self.points = rng.uniform(-70, 70, (200, 3))
+        self.index = ObstacleIndex(self.obstacles, self.radius, cell_size=4.)
+
+    def assert_same_pairs(self, actual, expected):
+        actual = sorted(zip(*[a.tolist() for a in actual[:2]]))
+        expected = sorted(zip(*[e.tolist() for e in expected[:2]]))
+        self.assertEqual(actual, expected)
+
+    def test_radius_query(self):
+        for r in (0.5, 3., 12.):
+            result = self.index.radius_query(self.points, r)
+            expected = brute_force_pairs(self.points, self.obstacles, r + self.radius)
+            self.assert_same_pairs(result, expected)
+            self.assertTrue((np.diff(result[0]) >= 0).all())
+            npt.assert_allclose(result[2], np.hypot(*(self.points[result[0], :2] -
+                                                      self.obstacles[result[1]]).T))
+
+        colliding = self.index.collisions(self.points, 3.)
+        query, _, _ = brute_force_pairs(self.points, self.obstacles, 3. + self.radius)
+        npt.assert_array_equal(np.flatnonzero(colliding), np.unique(query))
+
+    def test_nearest(self):
+        nearest, distance = self.index.nearest(self.points)
+        all_distances = np.hypot(*(self.points[:, np.newaxis, :2] -
+                                   self.obstacles[np.newaxis]).transpose(2, 0, 1))
+        npt.assert_array_equal(nearest, all_distances.argmin(axis=1))
+        npt.assert_allclose(distance, all_distances.min(axis=1))
+
+        # Far outside the grid.
+        nearest, distance = self.index.nearest([[1000., 1000.]])
+        self.assertEqual(nearest[0], np.hypot(*(self.obstacles - 1000.).T).argmin())
+
+        empty = ObstacleIndex(np.zeros((0, 2)))
+        nearest, distance = empty.nearest(self.points[:2])
+        npt.assert_array_equal(nearest, [-1, -1])
+        npt.assert_array_equal(distance, [np.inf, np.inf])
+
+    def test_segment_query(self):
+        index = ObstacleIndex([[0., 0.], [5., 1.], [5., 3.]], radius=0.5, cell_size=2.)
+        start = np.array([[-5., 0.], [0., 2.], [4., 2.]])
+        end = np.array([[3., 0.], [10., 2.], [4.1, 2.]])
+        query, obstacle, t, distance = index.segment_query(start, end, r=0.6)
+        self.assertEqual(list(zip(query.tolist(), obstacle.tolist())), [(0, 0), (1, 1), (1, 2)])
+        npt.assert_allclose(t, [0.625, 0.5, 0.5])
+        npt.assert_allclose(distance, [0, 1, 1])
+
+        # Against brute force, with zero length segments as well.
+        rng = np.random.RandomState(1)
+        start = self.points[:, :2]
+        end = start + rng.uniform(-3, 3, start.shape) * (rng.rand(len(start), 1) > 0.1)
+        query, obstacle, t, distance = self.index.segment_query(start, end, r=0.2)
+        expected = []
+        for i in range(len(start)):
+            for j in range(len(self.obstacles)):
+                direction = end[i] - start[i]
+                length2 = direction.dot(direction)
+                s = 0. if length2 == 0 else np.clip((self.obstacles[j] - start[i]).dot(direction) / length2, 0, 1)
+                if np.linalg.norm(start[i] + s * direction - self.obstacles[j]) <= 0.2 + self.radius[j]:
+                    expected.append((i, j))
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(sorted(zip(query.tolist(), obstacle.tolist())), expected)
+
+    def test_large_windows(self):
+        # Windows with more cells than there are occupied cells, mixed with small ones.
+        start = np.vstack((self.points[:20, :2], [[-60., -60.], [-200., 10.]]))
+        end = np.vstack((self.points[:20, :2] + 1., [[60., 60.], [200., 10.]]))
+        query, obstacle, _, _ = self.index.segment_query(start, end, r=0.5)
+        direction = end - start
+        t = np.clip(((self.obstacles[np.newaxis] - start[:, np.newaxis]) *
+                     direction[:, np.newaxis]).sum(axis=2) /
+                    (direction ** 2).sum(axis=1)[:, np.newaxis], 0, 1)
+        closest = start[:, np.newaxis] + t[..., np.newaxis] * direction[:, np.newaxis]
+        distance = np.linalg.norm(closest - self.obstacles[np.newaxis], axis=2)
+        expected = np.nonzero(distance <= 0.5 + self.radius)
+        self.assert_same_pairs((query, obstacle), expected)
+        self.assertGreater(np.sum(query == 20), 0)
+
+        points = np.vstack((self.points[:, :2], [[3000., 3000.], [-3000., 20.]]))
+        nearest, distance = self.index.nearest(points)
+        all_distances = np.hypot(*(points[:, np.newaxis] -
+                                   self.obstacles[np.newaxis]).transpose(2, 0, 1))
+        npt.assert_array_equal(nearest, all_distances.argmin(axis=1))
+        npt.assert_allclose(distance, all_distances.min(axis=1))
+
+    def test_updates(self):
+        index = ObstacleIndex.from_course(make_course([0., 10.], [0., 0.]), cell_size=4.)
+        self.assertEqual(index.nearest([[9., 0.]])[0][0], 1)
+        n_rebuilds = index.n_rebuilds
+
+        # Moving within a cell doesn't need a rebuild.
+        index.update([1], [[11., 1.]])
+        npt.assert_allclose(index.nearest([[9., 0.]])[1], np.hypot(2, 1))
+        self.assertEqual(index.n_rebuilds, n_rebuilds)
+
+        index.update([1], [[-20., 0.]])
+        self.assertEqual(index.nearest([[9., 0.]])[0][0], 0)
+        self.assertEqual(index.n_rebuilds, n_rebuilds + 1)
+
+        new = index.add([[8., 0.]], radius=1.)
+        npt.assert_array_equal(new, [2])
+        self.assertEqual(index.nearest([[9., 0.]])[0][0], 2)
+        query, obstacle, _ = index.radius_query([[9.5, 0.]], 1.)
+        npt.assert_array_equal(obstacle, [2])
+
+        index.remove(new)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.nearest([[9., 0.]])[0][0], 0)
+        self.assertEqual(len(index.radius_query([[9.5, 0.]], 1.)[0]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+
+import os
+import tempfile
+import unittest
+
+from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.headless import HeadlessRunner
+from scaling_potato.sweep import (grid, random_cases, run_sweep, step_metrics, save_results,
+                                  StepProfile, Uniform)
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestSweep(unittest.TestCase):
+    def test_grid(self):
+        cases = grid(v_k_p=[10, 20], v_k_i=[0, 5, 10], profile=[0, 1])
+        self.assertEqual(len(cases), 12)
+        npt.assert_array_equal(cases["omega_k_p"], 5)
+        self.assertEqual(len(set(zip(cases["v_k_p"], cases["v_k_i"], cases["profile"]))), 12)
+        self.assertRaises(ValueError, grid, gain=[1])
+
+    def test_random_cases(self):
+        cases = random_cases(50, seed=3, v_k_p=Uniform(5, 50), profile=(0, 2),
+                             init_x=lambda rng, n: rng.normal(size=(n, 3)))
+        self.assertTrue(np.all((cases["v_k_p"] >= 5) & (cases["v_k_p"] < 50)))
+        self.assertEqual(set(cases["profile"]), {0, 2})
+        npt.assert_array_equal(cases, random_cases(50, seed=3, v_k_p=Uniform(5, 50),
+                                                   profile=(0, 2),
+                                                   init_x=lambda rng, n: rng.normal(size=(n, 3))))
+
+        # Integer fields include the upper bound.
+        cases = random_cases(100, seed=0, profile=Uniform(0, 2), init_x=Uniform(-1, 1))
+        self.assertEqual(set(cases["profile"]), {0, 1, 2})
+        self.assertTrue(np.all(np.abs(cases["init_x"]) <= 1))
+        self.assertGreater(len(np.unique(cases["init_x"])), 100)
+
+    def test_step_metrics(self):
+        time = np.arange(5.)
+        reference = np.array([[2., 0, 0], [0, 1, 0]])
+        velocity = np.array([[[0, 0, 0], [0, 0, 0]],
+                             [[1, 0, 0], [0, 2, 0]],
+                             [[2.5, 0, 0], [0, 1, 0]],
+                             [[2, 0, 0], [0, 1, 0]],
+                             [[2, 0, 0], [0, 2, 0]]], dtype=float)
+        metrics = step_metrics(time, reference - velocity, reference)
+        npt.assert_allclose(metrics["overshoot"], [0.25, 1.])
+        npt.assert_array_equal(metrics["settling_time"], [3., np.nan])
+        npt.assert_allclose(metrics["rms_error"][0], np.sqrt((4 + 1 + 0.25) / 5))
+
+    def test_matches_single_quadcopter(self):
+        cases = grid(v_k_p=[10, 20, 40])
+        profiles = [StepProfile((0, 1, 0))]
+        results = run_sweep(cases, profiles, duration=4., processes=1)
+
+        qc = Quadcopter([0, 0, 0])
+        runner = HeadlessRunner([qc], dt=0.01, command_source=profiles[0])
+        errors = []
+        runner.run(4., callback=lambda r: errors.append(qc.error.copy()))
+        metrics = step_metrics(np.arange(400) * 0.01, np.array(errors)[:, np.newaxis],
+                               np.array([[0, 1, 0]]))
+        npt.assert_allclose(results["rms_error"][1], metrics["rms_error"][0], rtol=1e-3)
+        self.assertLess(results["settling_time"][2], results["settling_time"][0])
+
+    def test_process_pool(self):
+        cases = random_cases(10, seed=0, v_k_p=Uniform(10, 30), profile=[0, 1])
+        profiles = [StepProfile((0, 1, 0)), StepProfile((1, 0, 0), start=0.5)]
+        serial = run_sweep(cases, profiles, duration=2., processes=1, batch_size=4)
+        parallel = run_sweep(cases, profiles, duration=2., processes=2, batch_size=4)
+        npt.assert_array_equal(parallel, serial)
+        npt.assert_array_equal(parallel["v_k_p"], cases["v_k_p"])
+
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        try:
+            save_results(path, parallel)
+            table = np.genfromtxt(path, delimiter=",", names=True)
+            self.assertEqual(len(table), 10)
+            npt.assert_allclose(table["init_x_1"], parallel["init_x"][:, 1])
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
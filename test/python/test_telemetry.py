@@ -0,0 +1,72 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from scaling_potato.quadcopter import Quadcopter
+from scaling_potato.headless import HeadlessRunner
+from scaling_potato.telemetry import TelemetryRecorder, TelemetryReader, quadcopter_columns
+
+import numpy as np
+import numpy.testing as npt
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_grow_and_slice(self):
+        recorder = TelemetryRecorder(self.path, {"x": (3,), "n": ()}, chunk_size=16)
+        for i in range(40):
+            recorder.append(i * 0.5, x=[i, 2 * i, 3 * i])
+        self.assertEqual(recorder.capacity, 48)
+
+        recorder.flush(wait=True)
+        reader = TelemetryReader(self.path)
+        self.assertEqual(len(reader), 40)
+        self.assertEqual(reader.time_range(2., 4.), slice(4, 8))
+
+        data = reader.slice(2., 4., columns=["time", "x"])
+        npt.assert_array_equal(data["time"], [2., 2.5, 3., 3.5])
+        npt.assert_array_equal(data["x"][:, 1], [8, 10, 12, 14])
+        npt.assert_array_equal(reader["n"], 0)
+        self.assertFalse(reader["x"].flags.writeable)
+
+        for i in range(40, 50):
+            recorder.append(i * 0.5)
+        recorder.close()
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "x.bin")), 50 * 3 * 8)
+
+        self.assertEqual(len(reader), 40)
+        reader.refresh()
+        self.assertEqual(len(reader), 50)
+        npt.assert_array_equal(reader.slice(24.)["x"], 0)
+
+    def test_empty(self):
+        with TelemetryRecorder(self.path, {"x": (3,)}):
+            reader = TelemetryReader(self.path)
+            self.assertEqual(reader["x"].shape, (0, 3))
+            self.assertEqual(reader.time_range(1., 2.), slice(0, 0))
+
+    def test_headless(self):
+        qcs = [Quadcopter([0, 0, 0]), Quadcopter([1, 0, 0])]
+        recorder = TelemetryRecorder(self.path, quadcopter_columns(2), chunk_size=64)
+        runner = HeadlessRunner(qcs, dt=0.01, recorder=recorder,
+                                command_source=lambda t, q: (np.array([0., 1., 0.]), np.zeros((3,))))
+        runner.run(1.)
+        recorder.close()
+
+        reader = TelemetryReader(self.path)
+        self.assertEqual(len(reader), 100)
+        npt.assert_array_equal(reader["v_command"][:, :, 1], 1)
+        npt.assert_allclose(reader["state"][-1, 1, :3], qcs[1].x)
+        npt.assert_allclose(reader["omega_dot"][-1, 0], qcs[0].omega_dot)
+
+
+if __name__ == '__main__':
+    unittest.main()
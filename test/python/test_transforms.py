@@ -0,0 +1,58 @@
+from __future__ import absolute_import
+
+import unittest
+
+from panda3d.core import NodePath, LQuaternionf, VBase3
+
+from scaling_potato.transforms import quat2tmat, to_body, to_inertial, tmat2hpr, RotationCache
+from scaling_potato.quadcopter import Quadcopter
+
+import numpy as np
+import numpy.testing as npt
+
+
+def random_quaternions(n, seed=0):
+    quat = np.random.RandomState(seed).randn(n, 4)
+    return quat / np.linalg.norm(quat, axis=1)[:, np.newaxis]
+
+
+class TestTransforms(unittest.TestCase):
+    def test_matches_panda3d(self):
+        node_path = NodePath("test")
+        v = np.array([1., 2., 3.])
+        for quat in random_quaternions(10):
+            node_path.setQuat(LQuaternionf(*quat))
+            tmat_ib = quat2tmat(quat)
+            npt.assert_allclose(to_inertial(tmat_ib, v),
+                                node_path.getMat().xformVec(VBase3(*v)), atol=1e-5)
+            npt.assert_allclose(tmat2hpr(tmat_ib), node_path.getHpr(), atol=1e-3)
+
+    def test_batch(self):
+        quat = random_quaternions(50)
+        v = np.random.RandomState(1).randn(50, 3)
+        tmat_ib = quat2tmat(quat)
+        self.assertEqual(tmat_ib.shape, (50, 3, 3))
+        npt.assert_allclose(to_inertial(tmat_ib[7], v[7]), to_inertial(tmat_ib, v)[7])
+        npt.assert_allclose(to_body(tmat_ib, to_inertial(tmat_ib, v)), v, atol=1e-12)
+
+    def test_rotation_cache(self):
+        cache = RotationCache()
+        quat = random_quaternions(1)[0]
+        tmat_ib = cache.tmat_ib(quat)
+        self.assertIs(cache.tmat_ib(quat), tmat_ib)
+        quat[:] = [1, 0, 0, 0]
+        npt.assert_allclose(cache.tmat_ib(quat), np.eye(3))
+        npt.assert_allclose(cache.hpr(quat), [0, 0, 0])
+
+    def test_quadcopter_body_frame(self):
+        qc = Quadcopter([0, 0, 0])
+        qc.q = [np.cos(np.pi / 4), 0, 0, np.sin(np.pi / 4)]
+        qc.v_i = [0, 1, 0]
+        npt.assert_allclose(qc.v_b, [1, 0, 0], atol=1e-12)
+        self.assertAlmostEqual(qc.yaw, 90.)
+        qc.a_b = [0, 1, 0]
+        npt.assert_allclose(qc.a_i, [-1, 0, 0], atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()